@@ -25,6 +25,7 @@ from watchdog.observers import Observer
 from magic_folder.config import Config
 from magic_folder.analyzer import AIAnalyzer
 from magic_folder.file_handler import FileHandler
+from magic_folder.service import InferenceServer
 from magic_folder.utils import log_activity
 
 def parse_arguments():
@@ -148,6 +149,12 @@ def main():
     observer.schedule(event_handler, config.drop_dir, recursive=False)
     observer.start()
     
+    # Serve the loaded model to other local frontends
+    inference_server = None
+    if config.enable_inference_service:
+        inference_server = InferenceServer(config, analyzer, event_handler.content_extractor)
+        inference_server.start()
+    
     print(f"\n========================== Magic Folder =========================")
     print(f"Watching: {config.drop_dir}")
     print(f"Organized files: {config.organized_dir}")
@@ -156,6 +163,7 @@ def main():
     print(f"\nActive Features:")
     print(f"- AI Model: {config.model_name}")
     print(f"- Deduplication: {'Enabled' if config.dedup_enabled else 'Disabled'}")
+    print(f"- Classifier Cascade: {'Enabled' if config.enable_cascade else 'Disabled'}")
     print(f"- Content Caching: {'Enabled' if config.enable_content_cache else 'Disabled'}")
     print(f"- User Feedback System: {'Enabled' if config.enable_feedback_system else 'Disabled'}")
     print(f"- Offline Mode: {'Enabled' if args.offline else 'Disabled'}")
@@ -185,10 +193,12 @@ def main():
             print(f"\nStarting web interface on http://{args.host}:{args.port}")
             print(f"Open a browser to this address to access the Magic Folder dashboard")
             
+            # Share this process's analyzer and file handler instead of loading a second model
             web_thread = threading.Thread(
                 target=run_web_interface,
                 args=(config_path,),
-                kwargs={'host': args.host, 'port': args.port, 'debug': False}
+                kwargs={'host': args.host, 'port': args.port, 'debug': False,
+                        'analyzer': analyzer, 'file_handler': event_handler}
             )
             web_thread.daemon = True
             web_thread.start()
@@ -204,8 +214,11 @@ def main():
             time.sleep(1)
     except KeyboardInterrupt:
         observer.stop()
+        if inference_server:
+            inference_server.stop()
     
     observer.join()
+    analyzer.save_learned_state()
     print("Magic Folder stopped.")
 
 if __name__ == "__main__":
@@ -5,11 +5,30 @@ AI analysis module for categorizing and naming files
 import os
 import re
 import pickle
+import threading
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime
 import numpy as np
-from magic_folder.utils import log_activity
+from magic_folder.utils import log_activity, synchronized
+from magic_folder.embeddings import sample_for_token_budget, chunk_token_ids, pool_embeddings
+from magic_folder.keyword_matcher import KeywordMatcher
+from magic_folder.vector_index import VectorIndex
+from magic_folder.static_embeddings import StaticEmbeddingModel, get_static_dir
+from magic_folder.linear_classifier import OnlineTextClassifier, SKLEARN_AVAILABLE
+from magic_folder.inference import InferenceExecutor, configure_torch_threads, plan_threads
+from magic_folder.model_bundle import ModelBundle, keyword_signature
+from magic_folder.embedding_store import save_embedding_table, load_embedding_table
+from magic_folder.document import Document, content_key
 
 # Check for optional dependencies and handle import errors
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+    torch = None
+
 try:
     from transformers import AutoTokenizer, AutoModel
     TRANSFORMERS_AVAILABLE = True
@@ -25,6 +44,14 @@ except ImportError:
     SENTENCE_TRANSFORMERS_AVAILABLE = False
     SentenceTransformer = None
 
+# User-corrected documents count for more in neighbour votes than
+# documents the analyzer labelled itself
+CORRECTION_WEIGHT = 3.0
+
+# Cascade tiers whose decisions are trusted as training labels for the
+# linear classifier (it never learns from its own predictions)
+LINEAR_TRAINING_TIERS = ("keyword", "transformer")
+
 class AIAnalyzer:
     """Uses embeddings to analyze file content and determine categories and naming"""
     
@@ -40,24 +67,68 @@ class AIAnalyzer:
         self.model_name = config.model_name
         self.categories = config.categories
         self.category_keywords = config.category_keywords
+        # Guards the caches, index, prototypes and linear model shared by the
+        # watcher, feedback, web and service threads; reentrant so locked methods
+        # can call each other. Model inference runs outside it, gated by the
+        # replica pool, so concurrent documents embed in parallel
+        self.lock = threading.RLock()
         self.embedding_model = None
         self.tokenizer = None
+        self.inference_executor = None
         self.category_embeddings = {}
+        self.category_keyword_signature = None
+        self.category_centroids = {}
+        self._category_prototypes = {}
+        self._keyword_matcher = None
+        self._keyword_signature = None
         self.cache_file = os.path.join(config.base_dir, "embeddings_cache.pkl")
+        self.category_vectors_file = os.path.join(config.base_dir, "category_embeddings")
+        self.centroid_vectors_file = os.path.join(config.base_dir, "category_centroids")
         self.content_cache = {}
+        self.index_file = os.path.join(config.base_dir, "document_index.npz")
+        self.document_index = None
+        self._unsaved_documents = 0
+        self._embeddings_outdated = False
         self.model_available = False
         self.offline_mode = offline_mode
         
+        # Optional cheap classifier consulted before the transformer. Must
+        # provide predict_proba(text) returning {category: probability}, or
+        # an empty dict when it cannot make a prediction yet.
+        self.linear_classifier = None
+        self.linear_model_file = os.path.join(config.base_dir, "linear_model.pkl.gz")
+        self._unsaved_linear_updates = 0
+        # Learned state is written by a timer a while after it changes, and at
+        # shutdown, instead of on the request path. The save lock serializes
+        # writers and is never taken while holding self.lock
+        self._save_timer = None
+        self._save_lock = threading.Lock()
+        self.tier_counts = Counter()
+        if config.linear_enabled and SKLEARN_AVAILABLE:
+            self.linear_classifier = OnlineTextClassifier.load(
+                self.linear_model_file, self.categories, min_examples=config.linear_min_examples
+            )
+        
         # Warn about model requirements
         self._warn_about_model_requirements()
         
         if not offline_mode:
             self.initialize_model()
+        elif self.linear_classifier is not None:
+            log_activity("Running in offline mode - using keyword and linear classification")
         else:
             log_activity("Running in offline mode - using keyword-only classification")
         
     def initialize_model(self):
         """Initialize the embedding model with comprehensive error handling"""
+        if self.config.embedding_backend == "static":
+            self._initialize_static_model()
+            return
+        
+        if self.config.model_bundle_dir:
+            self._initialize_bundle_model()
+            return
+        
         if not TRANSFORMERS_AVAILABLE and not SENTENCE_TRANSFORMERS_AVAILABLE:
             log_activity("Warning: Neither transformers nor sentence-transformers available. Using keyword-only classification.")
             self.model_available = False
@@ -97,12 +168,18 @@ class AIAnalyzer:
                     self.tokenizer = None
             
             if self.model_available:
+                self._start_inference_executor()
+                
                 # Load cached embeddings if available
                 self._load_cached_embeddings()
                 
                 # Generate category embeddings
                 self._generate_category_embeddings()
                 
+                # Load embeddings of previously classified documents
+                if self.config.knn_enabled:
+                    self._load_document_index()
+                
                 log_activity("AI model initialized successfully")
             else:
                 log_activity("AI model initialization failed. Falling back to keyword-only classification.")
@@ -114,6 +191,86 @@ class AIAnalyzer:
             self.tokenizer = None
             self.model_available = False
             
+    def _initialize_static_model(self):
+        """Load the static token-vector backend distilled from the configured model"""
+        static_dir = get_static_dir(self.config)
+        try:
+            self.embedding_model = StaticEmbeddingModel(static_dir)
+            if self.embedding_model.source_model != self.model_name:
+                log_activity(f"Static embeddings were distilled from {self.embedding_model.source_model}, "
+                             f"not the configured {self.model_name}")
+            self.model_available = True
+            log_activity(f"Loaded static embedding backend from {static_dir}")
+            self._start_inference_executor()
+        except Exception as e:
+            log_activity(f"Failed to load static embeddings from {static_dir}: {e}")
+            log_activity("Run 'python -m magic_folder.static_embeddings distill' to create them. "
+                         "Falling back to keyword-only classification.")
+            self.embedding_model = None
+            self.model_available = False
+            return
+        
+        self._load_cached_embeddings()
+        self._generate_category_embeddings()
+        if self.config.knn_enabled:
+            self._load_document_index()
+    
+    def _initialize_bundle_model(self):
+        """Load the model from a local bundle without contacting the model hub"""
+        bundle_dir = self.config.model_bundle_dir
+        try:
+            bundle = ModelBundle(bundle_dir)
+            if bundle.source_model != self.model_name:
+                log_activity(f"Model bundle was exported from {bundle.source_model}, "
+                             f"not the configured {self.model_name}")
+            self.embedding_model = bundle.model
+            self.tokenizer = bundle.tokenizer
+            self.model_available = True
+            log_activity(f"Loaded model bundle from {bundle_dir}")
+        except Exception as e:
+            log_activity(f"Failed to load model bundle from {bundle_dir}: {e}")
+            log_activity("Run 'python -m magic_folder.model_bundle export' to create it. "
+                         "Falling back to keyword-only classification.")
+            self.embedding_model = None
+            self.tokenizer = None
+            self.model_available = False
+            return
+        
+        self._start_inference_executor()
+        self._load_cached_embeddings()
+        if not self.category_embeddings:
+            # Precomputed at export time; only valid while the keywords are unchanged
+            self.category_embeddings = bundle.category_embeddings_for(self.categories, self.category_keywords)
+        self._generate_category_embeddings()
+        if self.config.knn_enabled:
+            self._load_document_index()
+    
+    def _start_inference_executor(self):
+        """Configure inference threads and the model replica pool"""
+        replicas = self.config.inference_replicas
+        if self.config.embedding_backend == "static":
+            # Copies would read the memory-mapped table into private memory
+            replicas = 1
+        else:
+            threads = plan_threads(replicas, self.config.inference_threads)
+            configure_torch_threads(threads, self.config.inference_interop_threads)
+            log_activity(f"Inference: {replicas} model replica(s) x {threads} thread(s)")
+        self.inference_executor = InferenceExecutor(self.embedding_model, self.tokenizer, replicas)
+    
+    @contextmanager
+    def _borrow_model(self):
+        """
+        Reserve a model replica for one inference call
+        
+        Yields:
+            tuple: (model, tokenizer) not used by any other thread meanwhile
+        """
+        if self.inference_executor is None:
+            yield self.embedding_model, self.tokenizer
+            return
+        with self.inference_executor.acquire() as replica:
+            yield replica
+    
     def _warn_about_model_requirements(self):
         """Warn users about model download and memory requirements"""
         model_info = {
@@ -133,16 +290,63 @@ class AIAnalyzer:
             
     def _load_cached_embeddings(self):
         """Load cached embeddings from disk"""
+        legacy_vectors = None
         if os.path.exists(self.cache_file):
             try:
                 with open(self.cache_file, 'rb') as f:
                     cache_data = pickle.load(f)
-                    self.category_embeddings = cache_data.get('category_embeddings', {})
                     self.content_cache = cache_data.get('content_cache', {})
+                    if 'category_embeddings' in cache_data:
+                        # Caches written before vectors moved to float16 stores
+                        legacy_vectors = cache_data
                     log_activity(f"Loaded {len(self.content_cache)} cached embeddings")
             except Exception as e:
                 log_activity(f"Error loading embeddings cache: {e}")
-                
+        
+        try:
+            embeddings, metadata = load_embedding_table(self.category_vectors_file)
+            if embeddings is None and legacy_vectors is not None:
+                embeddings = legacy_vectors.get('category_embeddings', {})
+                metadata = {'signature': legacy_vectors.get('embedding_signature')}
+            if embeddings is None:
+                return
+            
+            # Vectors from a different model or backend are not comparable
+            if metadata.get('signature') != self._embedding_signature():
+                self._embeddings_outdated = True
+                return
+            # Keyword-derived embeddings are regenerated when the keywords changed
+            if metadata.get('keywords') in (None, keyword_signature(self.categories, self.category_keywords)):
+                self.category_embeddings = {c: np.asarray(v, dtype=np.float32) for c, v in embeddings.items()}
+                self.category_keyword_signature = metadata.get('keywords')
+            
+            means, metadata = load_embedding_table(self.centroid_vectors_file)
+            if means is not None:
+                counts = metadata.get('counts', {})
+                self.category_centroids = {
+                    c: {'sum': np.asarray(mean, dtype=np.float32) * counts[c], 'count': counts[c]}
+                    for c, mean in means.items()
+                }
+            elif legacy_vectors is not None:
+                self.category_centroids = legacy_vectors.get('category_centroids', {})
+        except Exception as e:
+            log_activity(f"Error loading category embeddings: {e}")
+    
+    def _save_category_vectors(self):
+        """Save category embeddings and running centroids as float16 stores"""
+        try:
+            save_embedding_table(self.category_vectors_file, self.category_embeddings, {
+                'signature': self._embedding_signature(),
+                'keywords': self.category_keyword_signature
+            })
+            save_embedding_table(
+                self.centroid_vectors_file,
+                {c: centroid['sum'] / centroid['count'] for c, centroid in self.category_centroids.items()},
+                {'counts': {c: centroid['count'] for c, centroid in self.category_centroids.items()}}
+            )
+        except Exception as e:
+            log_activity(f"Error saving category embeddings: {e}")
+    
     def _save_cached_embeddings(self):
         """Save cached embeddings to disk"""
         try:
@@ -154,7 +358,6 @@ class AIAnalyzer:
                     del self.content_cache[key]
                     
             cache_data = {
-                'category_embeddings': self.category_embeddings,
                 'content_cache': self.content_cache
             }
             
@@ -163,6 +366,221 @@ class AIAnalyzer:
         except Exception as e:
             log_activity(f"Error saving embeddings cache: {e}")
     
+    def _embedding_signature(self):
+        """Identify the model that produced the stored vectors"""
+        return f"{self.config.embedding_backend}:{self.model_name}"
+    
+    def _load_document_index(self):
+        """Load the nearest-neighbour index of classified documents from disk"""
+        nlist = self.config.knn_ivf_lists
+        nprobe = self.config.knn_ivf_probe
+        pca_dims = self.config.knn_pca_dims
+        if os.path.exists(self.index_file) and not self._embeddings_outdated:
+            try:
+                self.document_index = VectorIndex.load(self.index_file, nlist=nlist, nprobe=nprobe, pca_dims=pca_dims)
+                log_activity(f"Loaded document index with {len(self.document_index)} embeddings")
+                return
+            except Exception as e:
+                log_activity(f"Error loading document index: {e}")
+        self.document_index = VectorIndex(nlist=nlist, nprobe=nprobe, pca_dims=pca_dims)
+    
+    def save_document_index(self):
+        """Save the document index to disk if it has unsaved changes"""
+        with self._save_lock:
+            # Only the snapshot is taken under the lock, not the write
+            with self.lock:
+                changes = self._unsaved_documents
+                if self.document_index is None or not changes:
+                    return
+                state = self.document_index.snapshot()
+                self._unsaved_documents = 0
+            try:
+                VectorIndex.write(state, self.index_file)
+            except Exception as e:
+                log_activity(f"Error saving document index: {e}")
+                with self.lock:
+                    self._unsaved_documents += changes
+    
+    def save_linear_classifier(self):
+        """Save the linear classifier to disk if it has unsaved updates"""
+        with self._save_lock:
+            # Only the compact snapshot is taken under the lock, not the write
+            with self.lock:
+                updates = self._unsaved_linear_updates
+                if self.linear_classifier is None or not updates:
+                    return
+                try:
+                    state = self.linear_classifier.snapshot()
+                except Exception as e:
+                    log_activity(f"Error saving linear classifier: {e}")
+                    return
+                self._unsaved_linear_updates = 0
+            try:
+                self.linear_classifier.write(state, self.linear_model_file)
+            except Exception as e:
+                log_activity(f"Error saving linear classifier: {e}")
+                with self.lock:
+                    self._unsaved_linear_updates += updates
+    
+    def save_learned_state(self):
+        """Save everything learned from classified and corrected documents"""
+        self.save_document_index()
+        self.save_linear_classifier()
+    
+    def _schedule_save(self):
+        """Save the learned state in the background once the save interval has passed"""
+        interval = self.config.learned_state_save_interval
+        if self._save_timer is not None or interval <= 0:
+            return
+        self._save_timer = threading.Timer(interval, self._save_in_background)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+    
+    def _save_in_background(self):
+        """Timer callback that saves the learned state"""
+        with self.lock:
+            self._save_timer = None
+        self.save_learned_state()
+    
+    def _train_linear_classifier(self, document, category, weight=1.0):
+        """
+        Update the linear classifier with one labelled document
+        
+        Args:
+            document (Document): The document
+            category (str): Category of the document
+            weight (float): Sample weight of the document
+        """
+        if not hasattr(self.linear_classifier, 'partial_fit'):
+            return
+        try:
+            self.linear_classifier.partial_fit(document.lower, category, weight=weight)
+            self._unsaved_linear_updates += 1
+            self._schedule_save()
+        except Exception as e:
+            log_activity(f"Error training linear classifier: {e}")
+    
+    def _remember_document(self, key, embedding, category, weight=1.0):
+        """
+        Store a document embedding in the nearest-neighbour index
+        
+        Args:
+            key (str): Content key of the document
+            embedding (np.ndarray): Document embedding
+            category (str): Category assigned to the document
+            weight (float): Vote weight of the document
+        """
+        if self.document_index is None:
+            return
+        self.document_index.add(key, embedding, category, weight=weight)
+        self._unsaved_documents += 1
+        self._schedule_save()
+    
+    def _knn_category(self, embedding):
+        """
+        Vote among the nearest previously classified documents
+        
+        Args:
+            embedding (np.ndarray): Document embedding
+            
+        Returns:
+            str: The winning category, or None if the vote is not decisive
+        """
+        index = self.document_index
+        if index is None or len(index) < self.config.knn_min_examples:
+            return None
+        
+        category, agreement = index.vote(embedding, k=self.config.knn_k)
+        if category in self.categories and agreement >= self.config.knn_min_agreement:
+            return category
+        return None
+    
+    def record_correction(self, content, category):
+        """
+        Learn from a user correction of a document's category
+        
+        Args:
+            content (str or Document): The extracted text content of the corrected file
+            category (str): The category chosen by the user
+        """
+        document = Document.wrap(content)
+        if not document:
+            return
+        
+        key = document.key
+        with self.lock:
+            # Forget the cached decision so the same content is not misfiled again
+            self.content_cache.pop(key, None)
+            
+            self._train_linear_classifier(document, category, weight=CORRECTION_WEIGHT)
+            
+            if self.embedding_model is None:
+                return
+            embedding = self.document_index.get(key) if self.document_index is not None else None
+        try:
+            if embedding is None:
+                embedding = self._embed_document(document)
+            with self.lock:
+                self._remember_document(key, embedding, category, weight=CORRECTION_WEIGHT)
+                self._update_category_prototype(category, embedding)
+                self._save_category_vectors()
+                self._save_cached_embeddings()
+        except Exception as e:
+            log_activity(f"Error learning from correction: {e}")
+    
+    def _update_category_prototype(self, category, embedding):
+        """
+        Add a confirmed document to the running centroid of its category
+        
+        Args:
+            category (str): The confirmed category
+            embedding (np.ndarray): Embedding of the confirmed document
+        """
+        unit = np.asarray(embedding, dtype=np.float32).ravel()
+        unit = unit / max(np.linalg.norm(unit), 1e-12)
+        
+        centroid = self.category_centroids.get(category)
+        if centroid is None:
+            centroid = {'sum': np.zeros_like(unit), 'count': 0}
+            self.category_centroids[category] = centroid
+        centroid['sum'] += unit
+        centroid['count'] += 1
+        self._category_prototypes.pop(category, None)
+    
+    def _get_category_prototypes(self):
+        """
+        Get the prototype vector of every category
+        
+        A prototype is the keyword-derived category embedding, used as a prior
+        worth ``prototype_prior_weight`` documents, averaged with the unit
+        embeddings of documents the user confirmed for that category.
+        
+        Returns:
+            dict: Mapping of category name to prototype vector
+        """
+        prior_weight = self.config.prototype_prior_weight
+        for category in set(self.category_embeddings) | set(self.category_centroids):
+            if category in self._category_prototypes:
+                continue
+            
+            prior = self.category_embeddings.get(category)
+            centroid = self.category_centroids.get(category)
+            if centroid is None:
+                prototype = prior
+            elif prior is None:
+                prototype = centroid['sum'] / centroid['count']
+            else:
+                prior = np.asarray(prior, dtype=np.float32).ravel()
+                prior = prior / max(np.linalg.norm(prior), 1e-12)
+                prototype = (prior_weight * prior + centroid['sum']) / (prior_weight + centroid['count'])
+            self._category_prototypes[category] = prototype
+        return self._category_prototypes
+    
+    @staticmethod
+    def _content_key(content):
+        """Stable key for a document's content, valid across processes"""
+        return content_key(content)
+    
     def _generate_category_embeddings(self):
         """Generate embeddings for each category based on keywords"""
         if self.embedding_model is None:
@@ -188,128 +606,461 @@ class AIAnalyzer:
                         
                         # Generate embedding
                         try:
-                            if hasattr(self.embedding_model, 'encode'):
-                                # SentenceTransformer approach
-                                embedding = self.embedding_model.encode(category_text)
-                            else:
-                                # Manual approach with AutoModel
-                                inputs = self.tokenizer(category_text, return_tensors="pt", padding=True, truncation=True)
-                                outputs = self.embedding_model(**inputs)
-                                embedding = outputs.last_hidden_state.mean(dim=1).detach().numpy()[0]
-                                
-                            self.category_embeddings[category] = embedding
+                            self.category_embeddings[category] = self._encode_text(category_text)
                         except Exception as e:
                             log_activity(f"Error generating embedding for {category}: {e}")
             
             # Save the generated embeddings
-            self._save_cached_embeddings()
+            self.category_keyword_signature = keyword_signature(self.categories, self.category_keywords)
+            self._save_category_vectors()
+        
+    @synchronized
+    def refresh_category_embeddings(self):
+        """Regenerate the keyword-derived category embeddings if the keywords changed"""
+        if self.category_keyword_signature == keyword_signature(self.categories, self.category_keywords):
+            return
+        self.category_embeddings = {}
+        self._category_prototypes = {}
+        self._generate_category_embeddings()
+    
+    def reclassify_contents(self, contents, batch_size=256):
+        """
+        Classify many documents against the current categories
+        
+        Stored document embeddings are reused, so only documents that were
+        never embedded go through the model. Embedding similarities are
+        computed as one matrix product per batch.
+        
+        Args:
+            contents (list): Extracted text (or Document) of each document
+            batch_size (int): Number of documents scored per matrix product
+            
+        Returns:
+            list: The category chosen for each document
+        """
+        self.refresh_category_embeddings()
+        documents = [Document.wrap(content) for content in contents]
+        results = [None] * len(documents)
+        keyword_scores = {}
+        pending = []
+        
+        with self.lock:
+            for i, document in enumerate(documents):
+                if not document:
+                    results[i] = "other"
+                    continue
+                entry = self.document_index.entry(document.key) if self.document_index is not None else None
+                if entry and entry[1] >= CORRECTION_WEIGHT and entry[0] in self.categories:
+                    # Keep categories the user chose explicitly
+                    results[i] = entry[0]
+                    continue
+                keyword_scores[i] = self._keyword_scores(document)
+                if self.config.enable_cascade:
+                    category, margin = self._top_with_margin(keyword_scores[i])
+                    if category and margin >= self.config.keyword_margin:
+                        results[i] = category
+                        continue
+                pending.append(i)
+            
+            prototypes = {c: p for c, p in self._get_category_prototypes().items() if c in self.categories}
+        if self.embedding_model is not None and prototypes and pending:
+            names = list(prototypes)
+            matrix = np.stack([np.asarray(prototypes[c], dtype=np.float32).ravel() for c in names])
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                keys = [documents[i].key for i in batch]
+                with self.lock:
+                    stored = [self.document_index.get(key) if self.document_index is not None else None for key in keys]
+                vectors = []
+                for i, vector in zip(batch, stored):
+                    if vector is None:
+                        vector = self._embed_document(documents[i])
+                    vectors.append(np.asarray(vector, dtype=np.float32).ravel())
+                
+                vectors = np.stack(vectors)
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                similarities = vectors @ matrix.T
+                best = np.argmax(similarities, axis=1)
+                
+                with self.lock:
+                    for row, (i, key) in enumerate(zip(batch, keys)):
+                        if similarities[row, best[row]] >= self.config.embedding_similarity_threshold:
+                            results[i] = names[best[row]]
+                        else:
+                            results[i] = self._best_keyword_category(keyword_scores[i])
+                        self._remember_document(key, vectors[row], results[i])
         
+        for i in pending:
+            if results[i] is None:
+                results[i] = self._best_keyword_category(keyword_scores[i])
+        return results
+    
     def analyze_content(self, content, file_path):
         """
         Analyze file content to determine category and suitable name
         
         Args:
-            content (str): The extracted text content from the file
+            content (str or Document): The extracted text content from the file
             file_path (str): Path to the original file
             
         Returns:
             tuple: (category, new_name) for the file
         """
-        if not content:
+        document = Document.wrap(content)
+        if not document:
             # If no content could be extracted, use filename and extension as fallback
             filename = os.path.basename(file_path)
             extension = os.path.splitext(filename)[1].lower()
             return "other", f"unprocessed_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
         
         # Check if we already have this content analyzed in cache
-        content_hash = hash(content[:1000])  # Use first 1000 chars to create a hash
-        if content_hash in self.content_cache:
-            return self.content_cache[content_hash]
+        content_hash = document.key
+        with self.lock:
+            if content_hash in self.content_cache:
+                return self.content_cache[content_hash]
             
-        # First attempt with embedding model if available
-        best_category = "other"
-        
-        if self.embedding_model is not None and self.category_embeddings:
-            try:
-                # Create embedding for content
-                if hasattr(self.embedding_model, 'encode'):
-                    content_embedding = self.embedding_model.encode(content[:5000])  # Limit to first 5000 chars
-                else:
-                    # Manual approach with AutoModel
-                    inputs = self.tokenizer(content[:5000], return_tensors="pt", padding=True, truncation=True)
-                    outputs = self.embedding_model(**inputs)
-                    content_embedding = outputs.last_hidden_state.mean(dim=1).detach().numpy()[0]
-                
-                # Calculate similarity to each category
-                similarities = {}
-                for category, category_embedding in self.category_embeddings.items():
-                    similarity = np.dot(content_embedding, category_embedding) / (
-                        np.linalg.norm(content_embedding) * np.linalg.norm(category_embedding)
-                    )
-                    similarities[category] = similarity
-                
-                # Find the best matching category
-                best_category, highest_similarity = max(similarities.items(), key=lambda x: x[1])
-                
-                # If similarity is too low, fallback to keyword approach
-                if highest_similarity < self.config.embedding_similarity_threshold:
-                    log_activity(f"Low similarity ({highest_similarity:.2f}), falling back to keyword matching")
-                    best_category = self._keyword_matching(content)
-            except Exception as e:
-                log_activity(f"Error using embeddings for classification: {e}")
-                best_category = self._keyword_matching(content)
-        else:
-            # Fallback to keyword matching
-            best_category = self._keyword_matching(content)
+        best_category, tier = self._classify(document, content_hash)
+        log_activity(f"Classified as {best_category} by {tier} tier")
             
         # Generate a descriptive name based on content
-        clean_title = self._extract_title_from_content(content)
+        clean_title = self._extract_title_from_content(document)
+        new_name = self._build_file_name(clean_title, best_category, file_path)
+        
+        # Save result to cache
+        result = (best_category, new_name)
+        with self.lock:
+            self.tier_counts[tier] += 1
+            if tier in LINEAR_TRAINING_TIERS:
+                self._train_linear_classifier(document, best_category)
+            self.content_cache[content_hash] = result
+            self._save_cached_embeddings()
+        
+        return result
+    
+    @synchronized
+    def analyze_metadata(self, metadata, file_path):
+        """
+        Try to classify a file from its metadata alone
+        
+        Only the keyword and linear tiers are consulted, and only a result
+        that meets their cascade margin is accepted, so the caller can skip
+        extracting the body of well-labelled documents. Nothing is decided
+        here when the cascade is disabled.
         
-        if not clean_title:
+        Args:
+            metadata (str): Metadata text from ContentExtractor.extract_metadata
+            file_path (str): Path to the original file
+            
+        Returns:
+            tuple: (category, new_name), or None if the metadata is not decisive
+        """
+        document = Document.wrap(metadata)
+        if not document or not self.config.enable_cascade:
+            return None
+        
+        category, margin = self._top_with_margin(self._keyword_scores(document))
+        if not (category and margin >= self.config.keyword_margin):
+            category = None
+            if self.linear_classifier is not None:
+                linear_category, margin = self._top_with_margin(self.linear_classifier.predict_proba(document.lower))
+                if linear_category in self.categories and margin >= self.config.linear_margin:
+                    category = linear_category
+        if category is None:
+            return None
+        
+        self.tier_counts["metadata"] += 1
+        log_activity(f"Classified as {category} by metadata tier")
+        
+        title = ""
+        for line in document.head_lines(20):
+            label, _, value = line.partition(':')
+            if label.strip().lstrip('/').lower() == 'title' and value.strip():
+                title = re.sub(r'\s+', '_', re.sub(r'[^\w\s-]', '', value).strip())
+                break
+        return category, self._build_file_name(title, category, file_path)
+    
+    @staticmethod
+    def _build_file_name(title, category, file_path):
+        """
+        Build the new file name from a title
+        
+        Args:
+            title (str): Cleaned title, may be empty
+            category (str): Category of the file, used when there is no title
+            file_path (str): Path to the original file
+            
+        Returns:
+            str: File name with a timestamp and the original extension
+        """
+        if not title:
             # If still no good title, use category and date
             date_str = datetime.now().strftime('%Y%m%d')
-            clean_title = f"{best_category}_{date_str}"
+            title = f"{category}_{date_str}"
         
         # Add date for uniqueness
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = os.path.basename(file_path)
         extension = os.path.splitext(filename)[1].lower()
-        new_name = f"{clean_title[:30]}_{timestamp}{extension}"
+        return f"{title[:30]}_{timestamp}{extension}"
+    
+    def _encode_text(self, text):
+        """
+        Embed a short text that fits in a single model window
         
-        # Save result to cache
-        result = (best_category, new_name)
-        self.content_cache[content_hash] = result
-        self._save_cached_embeddings()
+        Args:
+            text (str): The text to embed
+            
+        Returns:
+            np.ndarray: The embedding vector
+        """
+        with self._borrow_model() as (model, tokenizer):
+            return self._encode_with(model, tokenizer, text)
+    
+    @staticmethod
+    def _encode_with(model, tokenizer, text):
+        """Embed a short text with a specific model replica"""
+        if hasattr(model, 'encode'):
+            # SentenceTransformer approach
+            return model.encode(text)
         
-        return result
+        # Manual approach with AutoModel
+        inputs = tokenizer(text, return_tensors="pt", padding=True, truncation=True)
+        outputs = model(**inputs)
+        return outputs.last_hidden_state.mean(dim=1).detach().numpy()[0]
+    
+    @staticmethod
+    def _get_tokenizer(model, tokenizer):
+        """Return the tokenizer that belongs to a model replica"""
+        if hasattr(model, 'encode'):
+            return getattr(model, 'tokenizer', None)
+        return tokenizer
+    
+    def _model_window(self, tokenizer):
+        """
+        Get the maximum sequence length (including special tokens) of the model
+        
+        Args:
+            tokenizer: The model tokenizer
+            
+        Returns:
+            int: Maximum number of tokens per forward pass
+        """
+        if hasattr(self.embedding_model, 'encode'):
+            window = getattr(self.embedding_model, 'max_seq_length', None)
+        else:
+            window = getattr(self.embedding_model.config, 'max_position_embeddings', None)
+        
+        # Tokenizers without a configured limit report a huge sentinel value
+        tokenizer_limit = getattr(tokenizer, 'model_max_length', None) or 512
+        if tokenizer_limit > 100000:
+            tokenizer_limit = 512
+        return min(window or tokenizer_limit, tokenizer_limit)
+    
+    def _embed_document(self, content):
+        """
+        Embed a document of arbitrary length
+        
+        The text is tokenized once (up to the configured token budget), split
+        into model-window sized chunks that are embedded in a single batch,
+        and the chunk embeddings are pooled into one document vector.
+        
+        Args:
+            content (str or Document): The document text
+            
+        Returns:
+            np.ndarray: The document embedding
+        """
+        budget = self.config.max_document_tokens
+        text = sample_for_token_budget(Document.wrap(content), budget)
+        
+        with self._borrow_model() as (model, model_tokenizer):
+            tokenizer = self._get_tokenizer(model, model_tokenizer)
+            if tokenizer is None or not TORCH_AVAILABLE:
+                # Let the model truncate to its own window
+                return self._encode_with(model, model_tokenizer, text)
+            
+            window = self._model_window(tokenizer) - tokenizer.num_special_tokens_to_add()
+            token_ids = tokenizer(text, add_special_tokens=False, truncation=False, verbose=False)['input_ids']
+            chunks = chunk_token_ids(token_ids, window, budget)
+            if not chunks:
+                return self._encode_with(model, model_tokenizer, text)
+            
+            batch = tokenizer.pad(
+                {'input_ids': [tokenizer.build_inputs_with_special_tokens(chunk) for chunk in chunks]},
+                return_tensors="pt"
+            )
+            
+            with torch.no_grad():
+                if hasattr(model, 'encode'):
+                    # SentenceTransformer modules take the tokenized features directly
+                    features = {key: value.to(model.device) for key, value in batch.items()}
+                    chunk_embeddings = model(features)['sentence_embedding']
+                else:
+                    outputs = model(**batch)
+                    mask = batch['attention_mask'].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+                    chunk_embeddings = (outputs.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        
+        return pool_embeddings(
+            chunk_embeddings.cpu().numpy(),
+            method=self.config.chunk_pooling,
+            weights=[len(chunk) for chunk in chunks]
+        )
+    
+    def _classify(self, document, content_hash):
+        """
+        Run the classifier cascade, cheapest tier first
+        
+        The keyword automaton and the linear model short-circuit the
+        transformer when their top category leads the runner-up by the
+        configured margin. Only the cheap tiers run under the lock; the
+        transformer tier takes it just to read and update the shared state.
+        
+        Args:
+            document (Document): The document
+            content_hash (str): Content key of the document
+            
+        Returns:
+            tuple: (category, tier) where tier names the deciding classifier
+        """
+        linear_scores = None
+        with self.lock:
+            keyword_scores = self._keyword_scores(document)
+            
+            if self.config.enable_cascade:
+                category, margin = self._top_with_margin(keyword_scores)
+                if category and margin >= self.config.keyword_margin:
+                    return category, "keyword"
+                
+                if self.linear_classifier is not None:
+                    linear_scores = self.linear_classifier.predict_proba(document.lower)
+                    category, margin = self._top_with_margin(linear_scores)
+                    if category in self.categories and margin >= self.config.linear_margin:
+                        return category, "linear"
+            
+            use_embeddings = self.embedding_model is not None and (self.category_embeddings or self.category_centroids)
+        
+        # Embedding model if available
+        if use_embeddings:
+            try:
+                return self._transformer_category(document, content_hash, keyword_scores), "transformer"
+            except Exception as e:
+                log_activity(f"Error using embeddings for classification: {e}")
+        
+        with self.lock:
+            # Without an embedding model a trained linear classifier beats raw keyword counts
+            if linear_scores is None and self.linear_classifier is not None:
+                linear_scores = self.linear_classifier.predict_proba(document.lower)
+            if linear_scores:
+                category, _ = self._top_with_margin(linear_scores)
+                if category in self.categories:
+                    return category, "linear"
+            
+            # Fallback to keyword matching
+            return self._best_keyword_category(keyword_scores), "fallback"
     
-    def _keyword_matching(self, content):
+    def _transformer_category(self, document, content_hash, keyword_scores):
         """
-        Perform keyword matching to find the best category
+        Classify content by embedding similarity
         
         Args:
-            content (str): The text content
+            document (Document): The document
+            content_hash (str): Content key of the document
+            keyword_scores (dict): Keyword match counts, used when similarity is too low
             
         Returns:
             str: The best matching category
         """
-        content_lower = content.lower()
+        # Create embedding for content; the replica pool, not the lock, gates inference
+        content_embedding = self._embed_document(document)
         
-        # Simple keyword matching for categories
-        category_matches = {category: 0 for category in self.categories}
+        with self.lock:
+            # Calculate similarity to each configured category; prototypes of
+            # removed categories stay stored but must not be chosen
+            prototypes = self._get_category_prototypes()
+            similarities = {}
+            for category in self.categories:
+                category_embedding = prototypes.get(category)
+                if category_embedding is None:
+                    continue
+                similarity = np.dot(content_embedding, category_embedding) / (
+                    np.linalg.norm(content_embedding) * np.linalg.norm(category_embedding)
+                )
+                similarities[category] = similarity
+            
+            # Find the best matching category
+            best_category, highest_similarity = max(similarities.items(), key=lambda x: x[1], default=(None, -1.0))
+            
+            # Similar past documents outvote the keyword-derived category embeddings
+            knn_category = self._knn_category(content_embedding)
+            if knn_category:
+                best_category = knn_category
+            # If similarity is too low, fallback to keyword approach
+            elif highest_similarity < self.config.embedding_similarity_threshold:
+                log_activity(f"Low similarity ({highest_similarity:.2f}), falling back to keyword matching")
+                best_category = self._best_keyword_category(keyword_scores)
+            
+            self._remember_document(content_hash, content_embedding, best_category)
+        return best_category
+    
+    @staticmethod
+    def _top_with_margin(scores):
+        """
+        Get the top-scoring category and its lead over the runner-up
         
-        # Get the category keywords from configuration
-        if not self.category_keywords:
-            # If not in config, set up defaults
-            self._setup_default_keywords()
+        Args:
+            scores (dict): Mapping of category to score
+            
+        Returns:
+            tuple: (category, margin), or (None, 0) if nothing scored
+        """
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        if not ranked or ranked[0][1] <= 0:
+            return None, 0
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0
+        return ranked[0][0], ranked[0][1] - runner_up
+    
+    @synchronized
+    def get_cascade_stats(self):
+        """
+        Get how many files each classifier tier decided
+        
+        Returns:
+            dict: Mapping of tier name to {'count', 'percentage'}
+        """
+        total = sum(self.tier_counts.values())
+        return {
+            tier: {
+                'count': count,
+                'percentage': round(count / total * 100, 1) if total else 0
+            }
+            for tier, count in self.tier_counts.items()
+        }
+    
+    def _keyword_scores(self, content):
+        """
+        Count distinct keyword matches for each category
         
-        # Count keyword matches
-        for category, keywords in self.category_keywords.items():
-            if category in self.categories:  # Only match categories we're using
-                for keyword in keywords:
-                    if keyword.lower() in content_lower:
-                        category_matches[category] += 1
+        Args:
+            content (str or Document): The text content
+            
+        Returns:
+            dict: Mapping of category to number of matching keywords
+        """
+        # Count whole-word keyword matches for the categories we're using
+        return self._get_keyword_matcher().count_matches(Document.wrap(content).lower)
+    
+    def _best_keyword_category(self, category_matches):
+        """
+        Pick the category with the most keyword matches
         
+        Args:
+            category_matches (dict): Mapping of category to match count
+            
+        Returns:
+            str: The best matching category
+        """
         # Determine the best category
         best_category = max(category_matches.items(), key=lambda x: x[1])
         
@@ -319,17 +1070,42 @@ class AIAnalyzer:
             
         return best_category[0]
     
+    def _get_keyword_matcher(self):
+        """
+        Get the compiled keyword matcher, rebuilding it if the keywords changed
+        
+        Returns:
+            KeywordMatcher: Matcher for the current category keywords
+        """
+        # Get the category keywords from configuration
+        if not self.category_keywords:
+            # If not in config, set up defaults
+            self._setup_default_keywords()
+        
+        # Feedback only ever appends keywords, so the per-category counts are
+        # enough to notice a change without rescanning every keyword
+        signature = (
+            id(self.category_keywords),
+            tuple(self.categories),
+            tuple((category, len(keywords)) for category, keywords in self.category_keywords.items())
+        )
+        if self._keyword_matcher is None or signature != self._keyword_signature:
+            self._keyword_matcher = KeywordMatcher(self.category_keywords, self.categories)
+            self._keyword_signature = signature
+        return self._keyword_matcher
+    
     def _extract_title_from_content(self, content):
         """
         Extract a potential title from content
         
         Args:
-            content (str): The text content
+            content (str or Document): The text content
             
         Returns:
             str: A cleaned potential title
         """
-        lines = content.split('\n')
+        # Only the first few lines are ever considered
+        lines = Document.wrap(content).head_lines(5)
         potential_title = lines[0] if lines else ""
         
         if len(potential_title) < 5 or len(potential_title) > 50:
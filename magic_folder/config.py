@@ -23,6 +23,14 @@ class Config:
         self.log_file_name = "activity_log.txt"
         self.model_name = "distilbert-base-uncased"
         self.sample_length = 1000
+        self.max_document_tokens = 2048
+        self.chunk_pooling = "mean"  # mean, max, attention
+        self.embedding_backend = "transformer"  # transformer, static
+        self.static_model_dir = None  # Defaults to <base_dir>/static_embeddings
+        self.model_bundle_dir = None  # Local bundle loaded instead of the model hub
+        self.inference_replicas = 1  # Model copies; 1 serializes concurrent callers
+        self.inference_threads = 0  # Intra-op threads per replica (0 = cores / replicas)
+        self.inference_interop_threads = 0  # 0 = torch default
         self.categories = ["financial", "identity", "medical", 
                           "work", "education", "legal", 
                           "correspondence", "other"]
@@ -41,7 +49,17 @@ class Config:
         self.enable_audio_analysis = True
         self.enable_video_analysis = True
         self.enable_archive_inspection = True
+        self.pdf_backend = "auto"  # auto, pypdfium2, pdftotext, pypdf2
+        self.csv_spread_rows = 0  # CSV rows sampled from across the file besides the first rows
         self.ocr_languages = ["eng"]
+        self.ocr_script_detection = True
+        self.ocr_text_threshold = 0.003  # Minimum text likelihood to OCR an image (0 = always)
+        self.ocr_target_dpi = 300
+        self.ocr_binarize = False
+        self.ocr_workers = 2  # Long-lived Tesseract workers
+        self.ocr_pdf_pages = 5  # Leading pages of scanned PDFs to OCR
+        self.ocr_cache_enabled = True
+        self.ocr_cache_distance = 10  # Differing bits (of 256) still treated as the same page
         
         # New settings for performance and feedback
         self.enable_content_cache = True
@@ -52,9 +70,32 @@ class Config:
         self.enable_embedding_cache = True
         self.embedding_cache_size = 1000
         
+        # Nearest-neighbour classification settings
+        self.knn_enabled = True
+        self.knn_k = 7
+        self.knn_min_examples = 20
+        self.knn_min_agreement = 0.6
+        self.knn_ivf_lists = 0  # 0 = exact search
+        self.knn_ivf_probe = 8
+        self.knn_pca_dims = 0  # 0 = store full-dimension vectors
+        self.prototype_prior_weight = 5.0
+        
+        # Classifier cascade settings
+        self.enable_cascade = True
+        self.keyword_margin = 3
+        self.linear_margin = 0.5
+        self.linear_enabled = True
+        self.linear_min_examples = 10
+        self.metadata_first = False  # Classify PDFs/Office files from metadata before parsing the body
+        self.learned_state_save_interval = 60  # Seconds; 0 = save only at shutdown
+        
         # Web interface settings
         self.secret_key = None
         
+        # Shared inference service settings
+        self.enable_inference_service = True
+        self.service_socket_name = "inference.sock"
+        
         # Load from file if provided
         if config_path:
             self.load_config(config_path)
@@ -143,6 +184,14 @@ class Config:
             model_config = config.get('model', {})
             self.model_name = model_config.get('name', self.model_name)
             self.sample_length = model_config.get('sample_length', self.sample_length)
+            self.max_document_tokens = model_config.get('max_document_tokens', self.max_document_tokens)
+            self.chunk_pooling = model_config.get('chunk_pooling', self.chunk_pooling)
+            self.embedding_backend = model_config.get('backend', self.embedding_backend)
+            self.static_model_dir = model_config.get('static_dir', self.static_model_dir)
+            self.model_bundle_dir = model_config.get('bundle_dir', self.model_bundle_dir)
+            self.inference_replicas = model_config.get('inference_replicas', self.inference_replicas)
+            self.inference_threads = model_config.get('inference_threads', self.inference_threads)
+            self.inference_interop_threads = model_config.get('inference_interop_threads', self.inference_interop_threads)
             
             # Categories and keywords
             self.categories = config.get('categories', self.categories)
@@ -168,7 +217,17 @@ class Config:
             self.enable_audio_analysis = file_types.get('enable_audio_analysis', self.enable_audio_analysis)
             self.enable_video_analysis = file_types.get('enable_video_analysis', self.enable_video_analysis)
             self.enable_archive_inspection = file_types.get('enable_archive_inspection', self.enable_archive_inspection)
+            self.pdf_backend = file_types.get('pdf_backend', self.pdf_backend)
+            self.csv_spread_rows = file_types.get('csv_spread_rows', self.csv_spread_rows)
             self.ocr_languages = file_types.get('ocr_languages', self.ocr_languages)
+            self.ocr_script_detection = file_types.get('ocr_script_detection', self.ocr_script_detection)
+            self.ocr_text_threshold = file_types.get('ocr_text_threshold', self.ocr_text_threshold)
+            self.ocr_target_dpi = file_types.get('ocr_target_dpi', self.ocr_target_dpi)
+            self.ocr_binarize = file_types.get('ocr_binarize', self.ocr_binarize)
+            self.ocr_workers = file_types.get('ocr_workers', self.ocr_workers)
+            self.ocr_pdf_pages = file_types.get('ocr_pdf_pages', self.ocr_pdf_pages)
+            self.ocr_cache_enabled = file_types.get('ocr_cache_enabled', self.ocr_cache_enabled)
+            self.ocr_cache_distance = file_types.get('ocr_cache_distance', self.ocr_cache_distance)
             
             # Performance and feedback settings
             performance = config.get('performance', {})
@@ -182,10 +241,35 @@ class Config:
             self.feedback_dir_name = feedback.get('feedback_dir_name', self.feedback_dir_name)
             self.embedding_similarity_threshold = feedback.get('embedding_similarity_threshold', self.embedding_similarity_threshold)
             
+            # Nearest-neighbour classification settings
+            classification = config.get('classification', {})
+            self.knn_enabled = classification.get('knn_enabled', self.knn_enabled)
+            self.knn_k = classification.get('knn_k', self.knn_k)
+            self.knn_min_examples = classification.get('knn_min_examples', self.knn_min_examples)
+            self.knn_min_agreement = classification.get('knn_min_agreement', self.knn_min_agreement)
+            self.knn_ivf_lists = classification.get('knn_ivf_lists', self.knn_ivf_lists)
+            self.knn_ivf_probe = classification.get('knn_ivf_probe', self.knn_ivf_probe)
+            self.knn_pca_dims = classification.get('knn_pca_dims', self.knn_pca_dims)
+            self.prototype_prior_weight = classification.get('prototype_prior_weight', self.prototype_prior_weight)
+            self.enable_cascade = classification.get('enable_cascade', self.enable_cascade)
+            self.keyword_margin = classification.get('keyword_margin', self.keyword_margin)
+            self.linear_margin = classification.get('linear_margin', self.linear_margin)
+            self.linear_enabled = classification.get('linear_enabled', self.linear_enabled)
+            self.linear_min_examples = classification.get('linear_min_examples', self.linear_min_examples)
+            self.metadata_first = classification.get('metadata_first', self.metadata_first)
+            self.learned_state_save_interval = classification.get(
+                'learned_state_save_interval', self.learned_state_save_interval
+            )
+            
             # Web interface settings
             web = config.get('web', {})
             self.secret_key = web.get('secret_key', self.secret_key)
             
+            # Shared inference service settings
+            service = config.get('service', {})
+            self.enable_inference_service = service.get('enabled', self.enable_inference_service)
+            self.service_socket_name = service.get('socket_name', self.service_socket_name)
+            
         except Exception as e:
             print(f"Error loading config from {config_path}: {e}")
             print("Using default configuration")
@@ -202,7 +286,15 @@ class Config:
             'log_file': self.log_file_name,
             'model': {
                 'name': self.model_name,
-                'sample_length': self.sample_length
+                'sample_length': self.sample_length,
+                'max_document_tokens': self.max_document_tokens,
+                'chunk_pooling': self.chunk_pooling,
+                'backend': self.embedding_backend,
+                'static_dir': self.static_model_dir,
+                'bundle_dir': self.model_bundle_dir,
+                'inference_replicas': self.inference_replicas,
+                'inference_threads': self.inference_threads,
+                'inference_interop_threads': self.inference_interop_threads
             },
             'categories': self.categories,
             'category_keywords': self.category_keywords,
@@ -221,7 +313,17 @@ class Config:
                 'enable_audio_analysis': self.enable_audio_analysis,
                 'enable_video_analysis': self.enable_video_analysis,
                 'enable_archive_inspection': self.enable_archive_inspection,
-                'ocr_languages': self.ocr_languages
+                'pdf_backend': self.pdf_backend,
+                'csv_spread_rows': self.csv_spread_rows,
+                'ocr_languages': self.ocr_languages,
+                'ocr_script_detection': self.ocr_script_detection,
+                'ocr_text_threshold': self.ocr_text_threshold,
+                'ocr_target_dpi': self.ocr_target_dpi,
+                'ocr_binarize': self.ocr_binarize,
+                'ocr_workers': self.ocr_workers,
+                'ocr_pdf_pages': self.ocr_pdf_pages,
+                'ocr_cache_enabled': self.ocr_cache_enabled,
+                'ocr_cache_distance': self.ocr_cache_distance
             },
             'performance': {
                 'enable_content_cache': self.enable_content_cache,
@@ -234,8 +336,29 @@ class Config:
                 'feedback_dir_name': self.feedback_dir_name,
                 'embedding_similarity_threshold': self.embedding_similarity_threshold
             },
+            'classification': {
+                'knn_enabled': self.knn_enabled,
+                'knn_k': self.knn_k,
+                'knn_min_examples': self.knn_min_examples,
+                'knn_min_agreement': self.knn_min_agreement,
+                'knn_ivf_lists': self.knn_ivf_lists,
+                'knn_ivf_probe': self.knn_ivf_probe,
+                'knn_pca_dims': self.knn_pca_dims,
+                'prototype_prior_weight': self.prototype_prior_weight,
+                'enable_cascade': self.enable_cascade,
+                'keyword_margin': self.keyword_margin,
+                'linear_margin': self.linear_margin,
+                'linear_enabled': self.linear_enabled,
+                'linear_min_examples': self.linear_min_examples,
+                'metadata_first': self.metadata_first,
+                'learned_state_save_interval': self.learned_state_save_interval
+            },
             'web': {
                 'secret_key': self.secret_key
+            },
+            'service': {
+                'enabled': self.enable_inference_service,
+                'socket_name': self.service_socket_name
             }
         }
         
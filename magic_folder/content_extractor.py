@@ -9,18 +9,27 @@ import platform
 import magic
 import pickle
 import hashlib
-import PyPDF2
-import docx
-import csv
 import json
 import zipfile
 import tarfile
 import tempfile
+import threading
 import subprocess
 import pandas as pd
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ExifTags
 from xml.etree import ElementTree
-from magic_folder.utils import log_activity
+from magic_folder.utils import log_activity, synchronized
+from magic_folder.text_store import DocumentTextStore
+from magic_folder.pdf_text import read_pdf_metadata, iter_pdf_pages, select_backend
+from magic_folder.tabular import sample_csv, sample_workbook, OPENPYXL_AVAILABLE, OPENPYXL_EXTENSIONS
+from magic_folder.streaming_text import (
+    sample_json, sample_xml, sample_html, sample_docx, sample_pptx, sample_epub
+)
+from magic_folder.ocr import (
+    LanguageSelector, TextPresenceDetector, OcrWorkerPool, OcrCache, OcrTimings, preprocess_for_ocr, decode_preview,
+    binarize, dhash, TESSEROCR_AVAILABLE
+)
 
 # Check for optional dependencies
 try:
@@ -37,6 +46,25 @@ except ImportError:
     TEXTRACT_AVAILABLE = False
     textract = None
 
+# Office Open XML formats keep their properties in docProps/*.xml
+OOXML_EXTENSIONS = ('.docx', '.xlsx', '.xlsm', '.pptx')
+
+# Document properties worth classifying on, by XML element name
+OFFICE_PROPERTIES = {
+    'title': 'Title',
+    'subject': 'Subject',
+    'keywords': 'Keywords',
+    'description': 'Description',
+    'category': 'Category',
+    'creator': 'Author',
+    'Company': 'Company',
+    'Application': 'Application',
+}
+
+# Scanned PDF pages each OCR worker takes per round; larger batches spread
+# Tesseract's startup over more pages, smaller ones stop sooner
+OCR_PAGES_PER_WORKER = 2
+
 class ContentExtractor:
     """Extracts content from various file types"""
     
@@ -49,10 +77,18 @@ class ContentExtractor:
         """
         self.config = config
         self.sample_length = config.sample_length
+        # Guards the content cache when several threads extract files
+        self.lock = threading.RLock()
         self.ocr_languages = "+".join(config.ocr_languages)
+        self.language_selector = LanguageSelector(
+            config.ocr_languages,
+            enabled=config.ocr_script_detection
+        )
+        self.text_detector = TextPresenceDetector(config.ocr_text_threshold)
         self.enable_audio = config.enable_audio_analysis
         self.enable_video = config.enable_video_analysis
         self.enable_archives = config.enable_archive_inspection
+        self.pdf_backend = select_backend(config.pdf_backend)
         
         # Check Tesseract availability
         self.tesseract_available = False
@@ -76,11 +112,29 @@ class ContentExtractor:
                 log_activity("Tesseract OCR detected and ready")
             except Exception as e:
                 log_activity(f"Tesseract OCR not found - OCR features disabled. Error: {e}")
+        if not self.tesseract_available and TESSEROCR_AVAILABLE:
+            # tesserocr links libtesseract directly and needs no executable
+            self.tesseract_available = True
+            log_activity("Tesseract OCR available through tesserocr")
+        
+        self.ocr_pool = None
+        if self.tesseract_available:
+            self.ocr_pool = OcrWorkerPool(config.ocr_workers, dpi=config.ocr_target_dpi)
+        
+        self.ocr_cache = None
+        if config.ocr_cache_enabled:
+            self.ocr_cache = OcrCache(
+                os.path.join(config.base_dir, "ocr_cache.pkl"),
+                max_distance=config.ocr_cache_distance,
+                max_entries=config.content_cache_size
+            )
         
         # Initialize content cache
         self.cache_file = os.path.join(config.base_dir, "content_cache.pkl")
         self.content_cache = {}
         self._load_cache()
+        # Unbounded, so organized files can be rescored without extracting them again
+        self.text_store = DocumentTextStore(config)
     
     def _load_cache(self):
         """Load the content extraction cache from disk"""
@@ -107,6 +161,9 @@ class ContentExtractor:
                 pickle.dump(self.content_cache, f)
         except Exception as e:
             log_activity(f"Error saving content cache: {e}")
+        
+        if self.ocr_cache is not None:
+            self.ocr_cache.save()
     
     def _calculate_file_hash(self, file_path, chunk_size=8192):
         """
@@ -143,6 +200,7 @@ class ContentExtractor:
             log_activity(f"Error calculating file hash: {e}")
             return None
     
+    @synchronized
     def extract_text(self, file_path):
         """
         Extract text content from a file based on its type
@@ -164,6 +222,11 @@ class ContentExtractor:
         if file_hash and file_hash in self.content_cache:
             log_activity(f"Using cached content for {os.path.basename(file_path)}")
             return self.content_cache[file_hash]
+        if file_hash:
+            content = self.text_store.get(file_hash)
+            if content is not None:
+                log_activity(f"Using stored content for {os.path.basename(file_path)}")
+                return content
         
         mime = magic.Magic(mime=True)
         file_type = mime.from_file(file_path)
@@ -180,7 +243,7 @@ class ContentExtractor:
                 content = self._extract_from_pdf(file_path)
             
             # Microsoft Office documents
-            elif any(typ in file_type for typ in ['officedocument', 'msword', 'vnd.ms-']) or file_extension in ['.docx', '.doc', '.pptx', '.ppt', '.xlsx', '.xls']:
+            elif any(typ in file_type for typ in ['officedocument', 'msword', 'vnd.ms-']) or file_extension in ['.docx', '.doc', '.pptx', '.ppt', '.xlsx', '.xlsm', '.xls']:
                 content = self._extract_from_office(file_path, file_extension)
             
             # Image files - use OCR
@@ -220,6 +283,7 @@ class ContentExtractor:
             if file_hash and content:
                 self.content_cache[file_hash] = content
                 self._save_cache()
+                self.text_store.put(file_hash, content)
                 
             return content
                 
@@ -250,20 +314,24 @@ class ContentExtractor:
         try:
             # JSON files
             if extension == '.json' or 'application/json' in file_type:
+                # Tokenized in chunks up to the sample length instead of loading the whole document
+                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    return sample_json(f, self.sample_length)
+            
+            # HTML files
+            elif extension in ['.html', '.htm'] or 'html' in file_type:
                 with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    data = json.load(f)
-                return json.dumps(data, indent=2)[:self.sample_length]
+                    return sample_html(f, self.sample_length)
             
-            # XML/HTML files
-            elif extension in ['.xml', '.html', '.htm'] or 'xml' in file_type or 'html' in file_type:
+            # XML files
+            elif extension == '.xml' or 'xml' in file_type:
                 try:
-                    tree = ElementTree.parse(file_path)
-                    # Get text content (simplified approach)
-                    text = ElementTree.tostring(tree.getroot(), encoding='unicode', method='text')
-                    return text[:self.sample_length]
+                    # Streams element text without building the tree
+                    with open(file_path, 'rb') as f:
+                        return sample_xml(f, self.sample_length)
                 except (ElementTree.ParseError, OSError, UnicodeDecodeError) as e:
                     # Fallback to regular text extraction if parsing fails
-                    log_activity(f"XML/HTML parsing failed for {file_path}: {e}")
+                    log_activity(f"XML parsing failed for {file_path}: {e}")
                     with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
                         return f.read(self.sample_length)
             
@@ -305,75 +373,44 @@ class ContentExtractor:
         Returns:
             str: Extracted text content
         """
-        text = ""
         try:
-            with open(file_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                
-                # Extract metadata
-                info = pdf_reader.metadata
-                if info:
-                    text += "PDF Metadata:\n"
-                    for key in info:
-                        if info[key]:
-                            text += f"{key}: {info[key]}\n"
-                    text += "\n"
-                
-                # Extract first few pages (limit based on file size)
-                file_size = os.path.getsize(file_path)
-                max_pages = 3 if file_size > 50 * 1024 * 1024 else 5  # Fewer pages for large files
-                
-                text += "Content:\n"
-                for page_num in range(min(max_pages, len(pdf_reader.pages))):
-                    page = pdf_reader.pages[page_num]
-                    text += f"--- Page {page_num + 1} ---\n"
-                    
-                    # Extract text in chunks to manage memory
-                    try:
-                        page_text = page.extract_text()
-                        # Limit individual page text to prevent memory bloat
-                        if len(page_text) > 5000:
-                            page_text = page_text[:5000] + "... [truncated]"
-                        text += page_text + "\n"
-                    except Exception as e:
-                        log_activity(f"Error extracting page {page_num + 1}: {e}")
-                        text += f"[Page {page_num + 1} extraction failed]\n"
+            parts = []
+            
+            # Extract metadata
+            parts.append(self._format_pdf_metadata(read_pdf_metadata(file_path)))
+            
+            # Extract first few pages (limit based on file size)
+            file_size = os.path.getsize(file_path)
+            max_pages = 3 if file_size > 50 * 1024 * 1024 else 5  # Fewer pages for large files
+            
+            parts.append("Content:\n")
+            collected = sum(len(part) for part in parts)
+            pages = iter_pdf_pages(file_path, max_pages, self.pdf_backend)
+            try:
+                for page_num, page_text in enumerate(pages):
+                    # Limit individual page text to prevent memory bloat
+                    if len(page_text) > 5000:
+                        page_text = page_text[:5000] + "... [truncated]"
+                    header = f"--- Page {page_num + 1} ---\n"
+                    parts.append(header)
+                    parts.append(page_text + "\n")
+                    collected += len(header) + len(page_text) + 1
                     
-                    if len(text) > self.sample_length:
+                    # Later pages are never parsed once the sample is full
+                    if collected > self.sample_length:
                         break
+            finally:
+                pages.close()
+            text = "".join(parts)
             
             # If very little text was extracted, PDF might be scanned
-            if len(text.strip()) < 100:
+            if len(text.strip()) < 100 and self.tesseract_available:
                 try:
                     # Try OCR if pdf has few text but has images
                     log_activity(f"PDF may be scanned, attempting OCR")
-                    
-                    # Convert first page to image using external tools if available
-                    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_image:
-                        temp_path = temp_image.name
-                    
-                    # Try using pdftoppm (from poppler) if available
-                    try:
-                        subprocess.run(['pdftoppm', '-png', '-singlefile', '-f', '1', '-l', '1', 
-                                      file_path, temp_path[:-4]], 
-                                      capture_output=True, timeout=30)
-                        
-                        # Now OCR the resulting image
-                        ocr_text = pytesseract.image_to_string(
-                            Image.open(f"{temp_path[:-4]}.png"), 
-                            lang=self.ocr_languages
-                        )
+                    ocr_text = self._ocr_scanned_pdf(file_path)
+                    if ocr_text:
                         text += "\nOCR Results:\n" + ocr_text
-                    except Exception as e:
-                        log_activity(f"OCR on PDF failed or pdftoppm not available: {e}")
-                    
-                    # Clean up
-                    try:
-                        os.unlink(temp_path)
-                        os.unlink(f"{temp_path[:-4]}.png")
-                    except Exception as e:
-                        log_activity(f"Cleanup error: {e}")
-                        
                 except Exception as e:
                     log_activity(f"PDF OCR error: {e}")
             
@@ -382,6 +419,130 @@ class ContentExtractor:
             log_activity(f"PDF extraction error: {e}")
             return ""
     
+    @staticmethod
+    def _format_pdf_metadata(metadata):
+        """Format a PDF information dictionary as extracted text"""
+        if not metadata:
+            return ""
+        return "PDF Metadata:\n" + "".join(f"{key}: {value}\n" for key, value in metadata.items()) + "\n"
+    
+    @synchronized
+    def extract_metadata(self, file_path):
+        """
+        Read only the metadata of a PDF or Office file
+        
+        This is much cheaper than extracting the body and is often enough to
+        classify well-labelled documents.
+        
+        Args:
+            file_path (str): Path to the file
+            
+        Returns:
+            str: Metadata as text, empty for other file types or without metadata
+        """
+        extension = os.path.splitext(file_path)[1].lower()
+        try:
+            if extension == '.pdf':
+                return self._format_pdf_metadata(read_pdf_metadata(file_path))
+            if extension in OOXML_EXTENSIONS:
+                return self._read_office_properties(file_path)
+        except Exception as e:
+            log_activity(f"Metadata extraction error for {os.path.basename(file_path)}: {e}")
+        return ""
+    
+    def _read_office_properties(self, file_path):
+        """
+        Read the document properties of an Office Open XML file
+        
+        Only docProps/core.xml and docProps/app.xml are read from the archive.
+        
+        Args:
+            file_path (str): Path to the .docx, .xlsx or .pptx file
+            
+        Returns:
+            str: Properties as text, empty if none are set
+        """
+        lines = []
+        with zipfile.ZipFile(file_path) as archive:
+            names = set(archive.namelist())
+            for part in ('docProps/core.xml', 'docProps/app.xml'):
+                if part not in names:
+                    continue
+                root = ElementTree.fromstring(archive.read(part))
+                for element in root:
+                    # Drop the XML namespace from the tag name
+                    tag = element.tag.rsplit('}', 1)[-1]
+                    if tag in OFFICE_PROPERTIES and element.text and element.text.strip():
+                        lines.append(f"{OFFICE_PROPERTIES[tag]}: {element.text.strip()}")
+        if not lines:
+            return ""
+        return "Document Properties:\n" + "\n".join(lines) + "\n"
+    
+    def _ocr_scanned_pdf(self, file_path):
+        """
+        OCR the first pages of a scanned PDF in parallel
+        
+        All pages are rendered by one pdftoppm call into a temporary directory
+        that is removed afterwards. Pages are then OCRed in rounds of a few
+        pages per worker through the batched worker pool, and no further
+        round is started once enough text for the sample has been recognized.
+        
+        Args:
+            file_path (str): Path to the PDF file
+            
+        Returns:
+            str: Recognized text with page markers, empty if rendering failed
+        """
+        name = os.path.basename(file_path)
+        dpi = self.config.ocr_target_dpi
+        max_pages = self.config.ocr_pdf_pages
+        timings = OcrTimings()
+        
+        with tempfile.TemporaryDirectory(prefix="magic_folder_pdf_") as temp_dir:
+            # Render straight to grayscale PGM at the OCR resolution
+            with timings.stage('render'):
+                try:
+                    subprocess.run(['pdftoppm', '-gray', '-r', str(dpi), '-f', '1', '-l', str(max_pages),
+                                    file_path, os.path.join(temp_dir, 'page')],
+                                   capture_output=True, timeout=30 * max_pages, check=True)
+                except (OSError, subprocess.SubprocessError) as e:
+                    log_activity(f"OCR on PDF failed or pdftoppm not available: {e}")
+                    return ""
+            
+            # pdftoppm zero-pads page numbers, so name order is page order
+            page_paths = [os.path.join(temp_dir, filename) for filename in sorted(os.listdir(temp_dir))]
+            
+            pages = []
+            collected = 0
+            round_size = self.ocr_pool.workers * OCR_PAGES_PER_WORKER
+            for start in range(0, len(page_paths), round_size):
+                images = [self._load_pdf_page(path, timings) for path in page_paths[start:start + round_size]]
+                for page_text in self._ocr_pages(images, timings):
+                    pages.append(f"--- Page {len(pages) + 1} ---\n{page_text}")
+                    collected += len(page_text)
+                    if collected >= self.sample_length:
+                        break
+                if collected >= self.sample_length:
+                    break
+        
+        log_activity(f"OCR of {len(pages)}/{len(page_paths)} PDF pages for {name}: {timings.summary()}")
+        return "\n".join(pages)
+    
+    def _load_pdf_page(self, path, timings):
+        """
+        Load one rendered PDF page ready for OCR
+        
+        Args:
+            path (str): Path to the page image rendered at the target DPI
+            timings (OcrTimings): Collects the time per stage
+            
+        Returns:
+            PIL.Image.Image: The preprocessed page
+        """
+        dpi = self.config.ocr_target_dpi
+        with Image.open(path) as image:
+            return preprocess_for_ocr(image, dpi, dpi=dpi, timings=timings)
+    
     def _extract_from_office(self, file_path, extension):
         """
         Extract text from Microsoft Office documents
@@ -397,9 +558,8 @@ class ContentExtractor:
             # Word documents
             if extension in ['.docx', '.doc']:
                 if extension == '.docx':
-                    doc = docx.Document(file_path)
-                    text = "\n".join([para.text for para in doc.paragraphs])
-                    return text[:self.sample_length]
+                    # Streams word/document.xml from the archive up to the sample length
+                    return sample_docx(file_path, self.sample_length)
                 else:  # .doc format
                     if TEXTRACT_AVAILABLE:
                         try:
@@ -411,11 +571,14 @@ class ContentExtractor:
                         return f"DOC file: {os.path.basename(file_path)} (textract not available for .doc files)"
                     
             # Excel files
-            elif extension in ['.xlsx', '.xls', '.csv']:
+            elif extension in ['.xlsx', '.xlsm', '.xls', '.csv']:
                 return self._extract_from_spreadsheet(file_path)
                 
             # PowerPoint
-            elif extension in ['.pptx', '.ppt']:
+            elif extension == '.pptx':
+                return sample_pptx(file_path, self.sample_length)
+            
+            elif extension == '.ppt':
                 if TEXTRACT_AVAILABLE:
                     try:
                         text = textract.process(file_path).decode('utf-8')
@@ -455,35 +618,45 @@ class ContentExtractor:
         extension = os.path.splitext(file_path)[1].lower()
         try:
             if extension == '.csv':
-                with open(file_path, 'r', newline='', errors='ignore') as f:
-                    reader = csv.reader(f)
-                    rows = list(reader)
-                    headers = rows[0] if rows else []
-                    # Sample the first 10 data rows
-                    sample_rows = rows[1:min(11, len(rows))]
-                    
-                    text = "Headers: " + ", ".join(headers) + "\n"
-                    text += "Data Sample:\n"
-                    for row in sample_rows:
-                        text += " | ".join(row) + "\n"
-                    
-                    return text[:self.sample_length]
-            else:  # Excel files
-                # Try to extract sheet names and a sample from each
-                text = "Excel File Summary:\n"
-                xl = pd.ExcelFile(file_path)
+                # Sample the first 10 data rows without reading the rest of the file
+                sample = sample_csv(file_path, head_rows=10, spread_rows=self.config.csv_spread_rows)
                 
-                # Get sheet names
-                text += f"Sheets: {', '.join(xl.sheet_names)}\n\n"
+                parts = ["Headers: " + ", ".join(sample['header']) + "\n", "Data Sample:\n"]
+                parts.extend(" | ".join(row) + "\n" for row in sample['rows'])
+                if sample['spread']:
+                    parts.append("Rows From Across The File:\n")
+                    parts.extend(" | ".join(row) + "\n" for row in sample['spread'])
                 
-                # Sample from each sheet (up to first 3 sheets)
-                for sheet in xl.sheet_names[:3]:
-                    text += f"Sheet: {sheet}\n"
-                    df = pd.read_excel(file_path, sheet_name=sheet, nrows=5)
-                    text += str(df.head()) + "\n\n"
-                    
-                    if len(text) > self.sample_length:
+                return "".join(parts)[:self.sample_length]
+            elif extension in OPENPYXL_EXTENSIONS and OPENPYXL_AVAILABLE:
+                # Stream the header and 5 rows of the first 3 sheets from one read-only open
+                workbook = sample_workbook(file_path, max_sheets=3, max_rows=6)
+                
+                parts = ["Excel File Summary:\n", f"Sheets: {', '.join(workbook['sheets'])}\n\n"]
+                collected = sum(len(part) for part in parts)
+                for sheet, rows in workbook['samples']:
+                    block = f"Sheet: {sheet}\n" + "".join(" | ".join(row) + "\n" for row in rows) + "\n"
+                    parts.append(block)
+                    collected += len(block)
+                    if collected > self.sample_length:
                         break
+                
+                return "".join(parts)[:self.sample_length]
+            else:  # Legacy Excel files
+                # Try to extract sheet names and a sample from each
+                text = "Excel File Summary:\n"
+                with pd.ExcelFile(file_path) as xl:
+                    # Get sheet names
+                    text += f"Sheets: {', '.join(xl.sheet_names)}\n\n"
+                    
+                    # Sample from each sheet (up to first 3 sheets), reusing the open workbook
+                    for sheet in xl.sheet_names[:3]:
+                        text += f"Sheet: {sheet}\n"
+                        df = xl.parse(sheet_name=sheet, nrows=5)
+                        text += str(df.head()) + "\n\n"
+                        
+                        if len(text) > self.sample_length:
+                            break
                         
                 return text[:self.sample_length]
         except Exception as e:
@@ -511,8 +684,20 @@ class ContentExtractor:
             
             # Only attempt OCR if Tesseract is available
             if self.tesseract_available:
+                name = os.path.basename(file_path)
+                exif = self._image_exif(image)
+                timings = OcrTimings()
                 try:
-                    text = pytesseract.image_to_string(image, lang=self.ocr_languages)
+                    # Checked before preprocessing, so photos are never resampled for OCR
+                    with timings.stage('detect'):
+                        has_text = self._image_has_text(image, file_path)
+                    if not has_text:
+                        # Photos without text are described by their metadata alone
+                        return metadata + exif + "[No text detected - OCR skipped]"
+                    
+                    page = preprocess_for_ocr(image, self.config.ocr_target_dpi, timings=timings)
+                    text = self._ocr_image(page, timings)
+                    log_activity(f"OCR timings for {name}: {timings.summary()}")
                     return metadata + "OCR Text:\n" + text[:self.sample_length]
                 except Exception as e:
                     log_activity(f"OCR failed for {os.path.basename(file_path)}: {str(e)[:50]}")
@@ -525,6 +710,151 @@ class ContentExtractor:
             log_activity(f"Image processing error: {e}")
             return f"Image file: {os.path.basename(file_path)}"
     
+    def _image_has_text(self, image, file_path):
+        """
+        Check a freshly opened image for text on a cheap preview
+        
+        Args:
+            image (PIL.Image.Image): The opened, not yet decoded image
+            file_path (str): Path to the image file
+            
+        Returns:
+            bool: True if the image should be OCRed
+        """
+        name = os.path.basename(file_path)
+        if self.text_detector.threshold <= 0:
+            return True
+        if image.format != 'JPEG':
+            # Decoded once; preprocessing reuses the pixels if the image passes
+            return self.text_detector.should_ocr(decode_preview(image), name)
+        # Draft decoding is one-shot, so the preview gets its own handle and
+        # the OCR decode can still pick its own scale
+        with Image.open(file_path) as preview:
+            return self.text_detector.should_ocr(decode_preview(preview), name)
+    
+    def _image_exif(self, image):
+        """
+        Describe the EXIF tags of an image that help classify it
+        
+        Args:
+            image (PIL.Image.Image): The image
+            
+        Returns:
+            str: EXIF summary, empty if the image has none
+        """
+        try:
+            exif = image.getexif()
+        except Exception:
+            return ""
+        
+        lines = []
+        for tag_id, value in exif.items():
+            tag = ExifTags.TAGS.get(tag_id)
+            if tag in ('Make', 'Model', 'Software', 'DateTime', 'ImageDescription', 'Artist'):
+                lines.append(f"{tag}: {str(value).strip()}")
+        if not lines:
+            return ""
+        return "EXIF:\n" + "\n".join(lines) + "\n\n"
+    
+    def _ocr_image(self, image, timings=None):
+        """
+        Run OCR on a preprocessed image with the languages matching its script
+        
+        Args:
+            image (PIL.Image.Image): Grayscale image at the target DPI
+            timings (OcrTimings): Collects the time per stage
+            
+        Returns:
+            str: Recognized text
+        """
+        return self._ocr_pages([image], timings)[0]
+    
+    def _ocr_pages(self, images, timings=None):
+        """
+        Run OCR on a batch of preprocessed pages through the worker pool
+        
+        Pages that look like an already OCRed page reuse its text, as do
+        identical pages within the batch. The rest are grouped by the
+        languages they need and split into one batch per worker, so each
+        worker OCRs several pages with a single Tesseract invocation and the
+        workers run concurrently.
+        
+        Args:
+            images (list): Grayscale images at the target DPI
+            timings (OcrTimings): Collects the time per stage
+            
+        Returns:
+            list: Recognized text of each page, in order
+        """
+        timings = timings or OcrTimings()
+        texts = [None] * len(images)
+        
+        # Cached results are keyed by the configured languages, which fully
+        # determine the per-page language choice
+        cache_languages = self.language_selector.all_languages
+        hashes = []
+        if self.ocr_cache is not None:
+            with timings.stage('cache'):
+                hashes = [dhash(image) for image in images]
+                for number, key in enumerate(hashes):
+                    texts[number] = self.ocr_cache.lookup(key, cache_languages)
+        
+        pending = [number for number, text in enumerate(texts) if text is None]
+        if not pending:
+            return texts
+        
+        # Identical pages (such as blank separator sheets) are OCRed once
+        duplicates = {}
+        if hashes:
+            first_with_hash = {}
+            for number in pending:
+                first = first_with_hash.setdefault(hashes[number], number)
+                if first != number:
+                    duplicates[number] = first
+            pending = [number for number in pending if number not in duplicates]
+        
+        pages = {number: images[number] for number in pending}
+        if self.config.ocr_binarize:
+            with timings.stage('binarize'):
+                pages = {number: binarize(image) for number, image in pages.items()}
+        
+        batches = {}
+        with timings.stage('osd'):
+            for number, image in pages.items():
+                languages = self.language_selector.languages_for(image)
+                batches.setdefault(languages, []).append(number)
+        
+        chunks = []
+        for languages, numbers in batches.items():
+            count = min(self.ocr_pool.workers, len(numbers))
+            size = -(-len(numbers) // count)
+            chunks.extend((languages, numbers[start:start + size]) for start in range(0, len(numbers), size))
+        
+        def recognize(chunk):
+            languages, numbers = chunk
+            return numbers, self.ocr_pool.recognize([pages[number] for number in numbers], languages)
+        
+        with timings.stage('ocr'):
+            if len(chunks) == 1:
+                results = [recognize(chunks[0])]
+            else:
+                with ThreadPoolExecutor(max_workers=self.ocr_pool.workers) as executor:
+                    results = list(executor.map(recognize, chunks))
+        
+        for numbers, chunk_texts in results:
+            for number, text in zip(numbers, chunk_texts):
+                texts[number] = text
+                if self.ocr_cache is not None:
+                    self.ocr_cache.add(hashes[number], cache_languages, text)
+        for number, first in duplicates.items():
+            texts[number] = texts[first]
+        return texts
+    
+    def close(self):
+        """Release the OCR workers"""
+        if self.ocr_pool is not None:
+            self.ocr_pool.close()
+    
     def _extract_from_audio(self, file_path):
         """
         Extract metadata from audio files
@@ -745,25 +1075,19 @@ class ContentExtractor:
             str: Extracted text content
         """
         try:
-            # Try to use textract for EPUB files
+            # EPUB chapters are streamed from the archive in spine order
             if extension == '.epub':
-                if TEXTRACT_AVAILABLE:
-                    try:
-                        text = textract.process(file_path).decode('utf-8')
-                        
-                        # Extract a reasonable sample
-                        if len(text) > 1000:
-                            # Get the first ~1000 chars and another sample from the middle
-                            beginning = text[:1000]
-                            middle = text[len(text)//2:len(text)//2 + 1000]
-                            return f"EPUB Content (beginning):\n{beginning}\n\nEPUB Content (middle sample):\n{middle}"
-                        else:
-                            return text
-                    except Exception as e:
-                        log_activity(f"Textract extraction for EPUB failed: {e}")
-                        return f"EPUB file: {os.path.basename(file_path)} (textract extraction failed)"
-                else:
-                    return f"EPUB file: {os.path.basename(file_path)} (textract not available)"
+                try:
+                    sample = sample_epub(file_path, self.sample_length)
+                except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+                    log_activity(f"EPUB extraction failed for {file_path}: {e}")
+                    return f"EPUB file: {os.path.basename(file_path)} (extraction failed)"
+                
+                if sample['middle']:
+                    # The beginning and a sample from the middle of the book
+                    return (f"EPUB Content (beginning):\n{sample['beginning']}\n\n"
+                            f"EPUB Content (middle sample):\n{sample['middle']}")
+                return sample['beginning'] or f"EPUB file: {os.path.basename(file_path)} (no text found)"
             
             # For other ebook formats, try common extraction tools or fallback to basic info
             else:
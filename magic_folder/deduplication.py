@@ -189,6 +189,30 @@ class DeduplicationManager:
         except Exception as e:
             log_activity(f"Error adding file record to database: {e}")
     
+    def update_file_path(self, old_path, new_path, category):
+        """
+        Point the records of a moved file at its new location
+        
+        Args:
+            old_path (str): Previous path of the file
+            new_path (str): New path of the file
+            category (str): Category of the file at its new location
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE file_hashes SET file_path = ?, file_name = ?, category = ?
+                WHERE file_path = ?
+            ''', (new_path, os.path.basename(new_path), category, old_path))
+            
+            conn.commit()
+            conn.close()
+            
+        except Exception as e:
+            log_activity(f"Error updating file record in database: {e}")
+    
     def handle_duplicate(self, file_path, original_path):
         """
         Handle a duplicate file according to the configured policy
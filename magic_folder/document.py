@@ -0,0 +1,125 @@
+"""
+Extracted document text with derived views computed once
+
+Keyword matching, title extraction, the linear classifier and embedding all
+need slightly different views of the same text. A Document builds each view
+lazily on first use and shares it between them, instead of every consumer
+lowercasing, splitting or slicing its own copy of the full text.
+"""
+
+import re
+import hashlib
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def content_key(text):
+    """
+    Compute the stable cache key of a text
+
+    Args:
+        text (str): Document text
+
+    Returns:
+        str: Hex digest identifying the text
+    """
+    return hashlib.md5(text.encode('utf-8', errors='ignore')).hexdigest()
+
+
+class Document:
+    """Extracted text and lazily computed views of it"""
+
+    def __init__(self, text):
+        """
+        Wrap extracted text
+
+        Args:
+            text (str): The extracted text content
+        """
+        self.text = text or ""
+        self._lower = None
+        self._key = None
+        self._token_spans = None
+        self._samples = {}
+
+    @classmethod
+    def wrap(cls, content):
+        """
+        Get a Document for content that may already be one
+
+        Args:
+            content (str or Document): Extracted text content
+
+        Returns:
+            Document: The wrapped content
+        """
+        if isinstance(content, cls):
+            return content
+        return cls(content)
+
+    def __bool__(self):
+        return bool(self.text)
+
+    def __len__(self):
+        return len(self.text)
+
+    @property
+    def lower(self):
+        """Lowercased text, as used for keyword matching and hashed features"""
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+    @property
+    def key(self):
+        """Stable cache key of the text"""
+        if self._key is None:
+            self._key = content_key(self.text)
+        return self._key
+
+    @property
+    def token_spans(self):
+        """(start, end) offsets of every word in the text"""
+        if self._token_spans is None:
+            self._token_spans = [match.span() for match in _WORD_PATTERN.finditer(self.lower)]
+        return self._token_spans
+
+    def words(self):
+        """
+        Iterate over the lowercased words of the text
+
+        Yields:
+            str: Each word in order
+        """
+        lower = self.lower
+        for start, end in self.token_spans:
+            yield lower[start:end]
+
+    def head_lines(self, count):
+        """
+        Get the first lines of the text without splitting all of it
+
+        Args:
+            count (int): Number of lines to return
+
+        Returns:
+            list: Up to ``count`` leading lines
+        """
+        return self.text.split('\n', count)[:count]
+
+    def sample(self, max_chars):
+        """
+        Get the leading part of the text, shared between callers with the same limit
+
+        Args:
+            max_chars (int): Maximum number of characters
+
+        Returns:
+            str: The text truncated to ``max_chars``
+        """
+        if len(self.text) <= max_chars:
+            return self.text
+        sample = self._samples.get(max_chars)
+        if sample is None:
+            sample = self._samples[max_chars] = self.text[:max_chars]
+        return sample
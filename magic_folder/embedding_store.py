@@ -0,0 +1,86 @@
+"""
+Compact on-disk storage for embedding vectors
+
+Vectors are written as one contiguous float16 .npy array, which halves the
+size of float32 pickles and has no per-object overhead, and are loaded back
+as a copy-on-write memory map instead of being read into RAM. Keys and other
+metadata live in a small JSON file next to the array.
+"""
+
+import os
+import json
+import numpy as np
+
+VECTOR_DTYPE = np.float16
+
+
+def save_vectors(path, vectors):
+    """
+    Write a matrix of vectors as a float16 .npy file
+
+    Args:
+        path (str): Destination .npy path
+        vectors (np.ndarray): Matrix of shape (n, dim)
+    """
+    temp_path = path + ".tmp.npy"
+    np.save(temp_path, np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE))
+    os.replace(temp_path, path)
+
+
+def load_vectors(path):
+    """
+    Map a float16 .npy vector file without reading it into memory
+
+    Args:
+        path (str): Path to the .npy file
+
+    Returns:
+        np.ndarray: Copy-on-write memory-mapped matrix
+    """
+    vectors = np.load(path, mmap_mode='c')
+    if vectors.size == 0:
+        # Empty arrays cannot be memory-mapped meaningfully
+        return np.asarray(vectors)
+    return vectors
+
+
+def save_embedding_table(path, table, metadata=None):
+    """
+    Save a mapping of key to vector
+
+    Args:
+        path (str): Path prefix; writes ``<path>.npy`` and ``<path>.json``
+        table (dict): Mapping of key to vector (all of the same dimension)
+        metadata (dict): Extra JSON-serializable data stored with the keys
+    """
+    keys = list(table)
+    if keys:
+        vectors = np.stack([np.asarray(table[key], dtype=np.float32).ravel() for key in keys])
+    else:
+        vectors = np.empty((0, 0), dtype=VECTOR_DTYPE)
+    save_vectors(path + ".npy", vectors)
+
+    temp_path = path + ".json.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'keys': keys, 'metadata': metadata or {}}, f)
+    os.replace(temp_path, path + ".json")
+
+
+def load_embedding_table(path):
+    """
+    Load a mapping of key to vector saved by ``save_embedding_table``
+
+    Args:
+        path (str): Path prefix used when saving
+
+    Returns:
+        tuple: (table, metadata), or (None, None) if nothing is stored
+    """
+    if not (os.path.exists(path + ".npy") and os.path.exists(path + ".json")):
+        return None, None
+
+    with open(path + ".json", 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    vectors = load_vectors(path + ".npy")
+    table = {key: vectors[i] for i, key in enumerate(index['keys'])}
+    return table, index.get('metadata', {})
@@ -0,0 +1,88 @@
+"""
+Helpers for turning long documents into a single embedding vector
+"""
+
+import numpy as np
+
+POOLING_METHODS = ("mean", "max", "attention")
+
+# Rough upper bound of characters per sub-word token, used to avoid
+# tokenizing text that would be thrown away by the token budget anyway
+CHARS_PER_TOKEN = 8
+
+
+def sample_for_token_budget(text, max_tokens):
+    """
+    Cut text down to the characters that can fit in the token budget
+
+    Args:
+        text (str or Document): The document text
+        max_tokens (int): Maximum number of tokens to embed
+
+    Returns:
+        str: The leading part of the text worth tokenizing
+    """
+    if hasattr(text, 'sample'):
+        # Documents share one truncated copy between callers
+        return text.sample(max_tokens * CHARS_PER_TOKEN)
+    return text[:max_tokens * CHARS_PER_TOKEN]
+
+
+def chunk_token_ids(token_ids, window, max_tokens):
+    """
+    Split a token id sequence into model-window sized chunks
+
+    Args:
+        token_ids (list): Token ids without special tokens
+        window (int): Maximum number of content tokens per chunk
+        max_tokens (int): Total token budget for the document
+
+    Returns:
+        list: List of token id lists, each at most ``window`` long
+    """
+    if window <= 0:
+        raise ValueError("Chunk window must be positive")
+
+    token_ids = list(token_ids[:max_tokens])
+    return [token_ids[i:i + window] for i in range(0, len(token_ids), window)]
+
+
+def pool_embeddings(chunk_embeddings, method="mean", weights=None):
+    """
+    Pool per-chunk embeddings into a single document embedding
+
+    Args:
+        chunk_embeddings (np.ndarray): Array of shape (n_chunks, dim)
+        method (str): One of "mean", "max" or "attention"
+        weights (list, optional): Per-chunk weights (e.g. token counts) for mean pooling
+
+    Returns:
+        np.ndarray: Pooled embedding of shape (dim,)
+    """
+    chunk_embeddings = np.asarray(chunk_embeddings, dtype=np.float32)
+    if chunk_embeddings.ndim == 1:
+        return chunk_embeddings
+    if len(chunk_embeddings) == 1:
+        return chunk_embeddings[0]
+
+    if method == "max":
+        return chunk_embeddings.max(axis=0)
+
+    if weights is None:
+        weights = np.ones(len(chunk_embeddings), dtype=np.float32)
+    weights = np.asarray(weights, dtype=np.float32)
+
+    if method == "attention":
+        # Score each chunk against the document centroid so that chunks
+        # on the document's main topic dominate boilerplate pages
+        norms = np.linalg.norm(chunk_embeddings, axis=1, keepdims=True)
+        unit = chunk_embeddings / np.maximum(norms, 1e-12)
+        centroid = np.average(unit, axis=0, weights=weights)
+        centroid /= max(np.linalg.norm(centroid), 1e-12)
+        scores = unit @ centroid * np.sqrt(unit.shape[1])
+        scores = np.exp(scores - scores.max()) * weights
+        weights = scores
+    elif method != "mean":
+        raise ValueError(f"Unknown pooling method: {method}")
+
+    return np.average(chunk_embeddings, axis=0, weights=weights)
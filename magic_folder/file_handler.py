@@ -3,7 +3,6 @@ File handling and processing logic
 """
 
 import os
-import re
 import time
 import json
 import shutil
@@ -13,6 +12,7 @@ from datetime import datetime
 from watchdog.events import FileSystemEventHandler
 
 from magic_folder.content_extractor import ContentExtractor
+from magic_folder.document import Document
 from magic_folder.utils import log_activity
 from magic_folder.deduplication import DeduplicationManager
 
@@ -140,9 +140,11 @@ class FileHandler(FileSystemEventHandler):
                                 
                                 # Extract content and update keywords
                                 try:
-                                    content = self.content_extractor.extract_text(file_path)
-                                    if content:
-                                        self._update_keywords(content, category)
+                                    document = Document(self.content_extractor.extract_text(file_path))
+                                    if document:
+                                        self._update_keywords(document, category)
+                                        if hasattr(self.analyzer, 'record_correction'):
+                                            self.analyzer.record_correction(document, category)
                                 except Exception as e:
                                     log_activity(f"Error extracting content for feedback: {e}")
                                 
@@ -181,14 +183,15 @@ class FileHandler(FileSystemEventHandler):
         Update keywords for a category based on content
         
         Args:
-            content (str): The text content
+            content (str or Document): The text content
             category (str): The category to update
         """
         if category not in self.feedback_data["keywords"]:
             self.feedback_data["keywords"][category] = {}
             
-        # Simple word frequency analysis
-        words = re.findall(r'\b[a-zA-Z]{3,15}\b', content.lower())
+        # Simple word frequency analysis over the document's shared word spans
+        words = [word for word in Document.wrap(content).words()
+                 if 3 <= len(word) <= 15 and word.isascii() and word.isalpha()]
         
         # Update word counts
         for word in words:
@@ -200,8 +203,9 @@ class FileHandler(FileSystemEventHandler):
         """Apply feedback data to improve the analyzer model"""
         # Update category keywords in the analyzer based on feedback
         if self.feedback_data["keywords"]:
-            # Thread-safe keyword updates
-            with self.keyword_update_lock:
+            # Thread-safe keyword updates; the analyzer lock keeps classification
+            # from reading the keyword lists while they change
+            with self.keyword_update_lock, self.analyzer.lock:
                 # For each category with feedback
                 for category, words in self.feedback_data["keywords"].items():
                     if category in self.analyzer.category_keywords:
@@ -212,11 +216,9 @@ class FileHandler(FileSystemEventHandler):
                         for word, count in top_words:
                             if count >= 2 and word not in existing_keywords:  # Only add if seen at least twice
                                 self.analyzer.category_keywords[category].append(word)
-                            
-            # Regenerate embeddings with new keywords
-            if hasattr(self.analyzer, '_generate_category_embeddings'):
-                self.analyzer._generate_category_embeddings()
-                
+            
+            # Category prototypes are updated incrementally by record_correction,
+            # so nothing needs to be re-embedded here
             log_activity("Applied user feedback to improve category recognition")
         
     def on_created(self, event):
@@ -280,6 +282,12 @@ class FileHandler(FileSystemEventHandler):
             self.processing_queue.join()
         except Exception as e:
             log_activity(f"Error during shutdown: {e}")
+        
+        self.content_extractor.close()
+        
+        # Persist what the analyzer learned from classified documents
+        if hasattr(self.analyzer, 'save_learned_state'):
+            self.analyzer.save_learned_state()
     
     def _process_file(self, file_path):
         """
@@ -312,14 +320,24 @@ class FileHandler(FileSystemEventHandler):
                     if self.dedup_manager.handle_duplicate(file_path, original_path):
                         return  # File was handled according to dedup policy
             
-            # Extract content
             filename = os.path.basename(file_path)
-            log_activity(f"Extracting content from {filename}")
-            content = self.content_extractor.extract_text(file_path)
+            result = None
+            if self.config.metadata_first and hasattr(self.analyzer, 'analyze_metadata'):
+                # Well-labelled documents are classified without parsing their body
+                metadata = self.content_extractor.extract_metadata(file_path)
+                if metadata:
+                    result = self.analyzer.analyze_metadata(metadata, file_path)
             
-            # Analyze with AI
-            log_activity(f"Analyzing {filename}")
-            category, new_name = self.analyzer.analyze_content(content, file_path)
+            if result:
+                category, new_name = result
+            else:
+                # Extract content
+                log_activity(f"Extracting content from {filename}")
+                content = self.content_extractor.extract_text(file_path)
+                
+                # Analyze with AI
+                log_activity(f"Analyzing {filename}")
+                category, new_name = self.analyzer.analyze_content(Document(content), file_path)
             
             # Ensure the category directory exists
             category_dir = os.path.join(self.config.organized_dir, category)
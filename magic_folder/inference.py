@@ -0,0 +1,226 @@
+"""
+Inference threading control for the embedding model
+
+PyTorch runs every forward pass on all cores by default, so concurrent
+callers oversubscribe the CPU. The executor here hands out a fixed number of
+model replicas, one caller per replica, and torch's intra-op thread count is
+set so that replicas x threads matches the cores available for inference.
+
+Usage:
+    python -m magic_folder.inference benchmark [--config CONFIG] [--cores N] [--limit N]
+"""
+
+import os
+import copy
+import shutil
+import time
+import queue
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+from magic_folder.utils import log_activity, load_sample_texts
+
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+    torch = None
+
+
+def available_cores():
+    """
+    Get the number of CPU cores this process may run on
+
+    Returns:
+        int: Number of usable cores
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def configure_torch_threads(intra_op_threads, inter_op_threads=0):
+    """
+    Set torch's thread pools for inference
+
+    Args:
+        intra_op_threads (int): Threads used inside one operator (0 leaves the default)
+        inter_op_threads (int): Threads used across independent operators (0 leaves the default)
+    """
+    if not TORCH_AVAILABLE:
+        return
+
+    if intra_op_threads > 0:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads > 0:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            # Only allowed once, before any inter-op parallel work has started
+            log_activity("Inter-op thread count already fixed for this process - keeping it")
+
+
+def plan_threads(replicas, intra_op_threads=0, cores=None):
+    """
+    Work out how many intra-op threads each replica gets
+
+    Args:
+        replicas (int): Number of model replicas
+        intra_op_threads (int): Configured threads per replica (0 = share cores evenly)
+        cores (int): Cores available for inference (defaults to all usable cores)
+
+    Returns:
+        int: Intra-op threads per replica
+    """
+    if intra_op_threads > 0:
+        return intra_op_threads
+    cores = cores or available_cores()
+    return max(1, cores // max(1, replicas))
+
+
+class InferenceExecutor:
+    """Hands out model replicas so each forward pass has its cores to itself"""
+
+    def __init__(self, model, tokenizer=None, replicas=1):
+        """
+        Initialize the executor
+
+        Args:
+            model: The loaded embedding model
+            tokenizer: Tokenizer used with the model (None for SentenceTransformer)
+            replicas (int): Number of model copies; 1 serializes all callers on one model
+        """
+        self.replicas = max(1, replicas)
+        self._pool = queue.Queue()
+        self._pool.put((model, tokenizer))
+        for _ in range(self.replicas - 1):
+            # Tokenizers carry mutable truncation/padding state, so each replica gets its own
+            self._pool.put((copy.deepcopy(model), copy.deepcopy(tokenizer)))
+
+    @contextmanager
+    def acquire(self):
+        """
+        Borrow a model replica for the duration of a with-block
+
+        Yields:
+            tuple: (model, tokenizer) reserved for the caller
+        """
+        replica = self._pool.get()
+        try:
+            yield replica
+        finally:
+            self._pool.put(replica)
+
+
+def benchmark_split(encode, texts, replicas):
+    """
+    Measure throughput with a number of concurrent callers
+
+    Args:
+        encode (callable): Function that processes one text
+        texts (list): Sample documents
+        replicas (int): Number of concurrent callers
+
+    Returns:
+        float: Documents per second
+    """
+    work = queue.Queue()
+    for text in texts:
+        work.put(text)
+
+    def worker():
+        while True:
+            try:
+                text = work.get_nowait()
+            except queue.Empty:
+                return
+            encode(text)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(replicas)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(texts) / max(time.perf_counter() - start, 1e-9)
+
+
+def candidate_splits(cores):
+    """
+    List the (replicas, threads per replica) splits worth trying
+
+    Args:
+        cores (int): Cores available for inference
+
+    Returns:
+        list: (replicas, threads) tuples that use all cores
+    """
+    return [(replicas, cores // replicas) for replicas in range(1, cores + 1) if cores % replicas == 0]
+
+
+def main():
+    """Benchmark replica/thread splits and print the best configuration"""
+    from magic_folder.config import Config
+    from magic_folder.analyzer import AIAnalyzer
+
+    parser = argparse.ArgumentParser(description="Magic Folder inference threading benchmark")
+    parser.add_argument("command", choices=["benchmark"])
+    parser.add_argument("--config", type=str, default=None, help="Path to custom configuration file")
+    parser.add_argument("--cores", type=int, default=None, help="Cores to use for inference (default: all)")
+    parser.add_argument("--limit", type=int, default=64, help="Sample documents per run")
+    args = parser.parse_args()
+
+    if not TORCH_AVAILABLE:
+        print("PyTorch is not installed - nothing to benchmark.")
+        return
+
+    config = Config(args.config)
+    cores = args.cores or available_cores()
+    texts = load_sample_texts(config, args.limit)
+    if not texts:
+        print("No extracted documents found in the content cache to benchmark with.")
+        return
+
+    # Load once without replicas; each split builds its own executor. Every
+    # document goes through the transformer tier, as the slowest real path
+    config.inference_replicas = 1
+    config.enable_cascade = False
+    analyzer = AIAnalyzer(config)
+    if not analyzer.model_available:
+        print("Embedding model could not be loaded.")
+        return
+
+    # Keep the documents the benchmark classifies out of the learned state
+    scratch_dir = tempfile.mkdtemp(prefix="magic_folder_benchmark_")
+    for attribute in ('cache_file', 'index_file', 'linear_model_file',
+                      'category_vectors_file', 'centroid_vectors_file'):
+        setattr(analyzer, attribute, os.path.join(scratch_dir, os.path.basename(getattr(analyzer, attribute))))
+
+    def classify(text):
+        analyzer.analyze_content(text, "benchmark.txt")
+
+    results = []
+    try:
+        # Warm up lazy initialization so it is not counted against the first split
+        classify(texts[0])
+
+        for replicas, threads in candidate_splits(cores):
+            configure_torch_threads(threads)
+            analyzer.inference_executor = InferenceExecutor(analyzer.embedding_model, analyzer.tokenizer, replicas)
+            # Classify every sample again rather than answering from the cache
+            analyzer.content_cache.clear()
+            docs_per_second = benchmark_split(classify, texts, replicas)
+            results.append((docs_per_second, replicas, threads))
+            print(f"{replicas:>3} replica(s) x {threads:>3} thread(s): {docs_per_second:8.1f} docs/s")
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    docs_per_second, replicas, threads = max(results)
+    print(f"\nBest split for {cores} cores: {replicas} replica(s) x {threads} thread(s) ({docs_per_second:.1f} docs/s)")
+    print(f'Set "inference_replicas": {replicas} and "inference_threads": {threads} in the "model" section of your configuration.')
+
+
+if __name__ == "__main__":
+    main()
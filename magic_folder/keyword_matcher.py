@@ -0,0 +1,135 @@
+"""
+Multi-keyword matching for category detection using an Aho-Corasick automaton
+"""
+
+from collections import deque
+
+
+def _is_word_char(char):
+    """Check whether a character is part of a word for boundary detection"""
+    return char.isalnum() or char == '_'
+
+
+class KeywordMatcher:
+    """Matches all category keywords against a text in a single linear pass"""
+
+    def __init__(self, category_keywords, categories=None):
+        """
+        Compile the keywords of every category into one automaton
+
+        Args:
+            category_keywords (dict): Mapping of category name to list of keywords
+            categories (list, optional): Only compile keywords for these categories
+        """
+        self.categories = list(categories) if categories is not None else list(category_keywords)
+        self.keyword_count = 0
+
+        # Trie represented as parallel lists indexed by node id
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        # Pattern id -> (keyword, categories that own it)
+        self._patterns = []
+        pattern_ids = {}
+
+        allowed = set(self.categories)
+        for category, keywords in category_keywords.items():
+            if category not in allowed:
+                continue
+            for keyword in keywords:
+                keyword = keyword.strip().lower()
+                if not keyword:
+                    continue
+                if keyword in pattern_ids:
+                    owners = self._patterns[pattern_ids[keyword]][1]
+                    if category not in owners:
+                        owners.append(category)
+                    continue
+                pattern_ids[keyword] = len(self._patterns)
+                self._patterns.append((keyword, [category]))
+                self._insert(keyword, pattern_ids[keyword])
+
+        self.keyword_count = len(self._patterns)
+        self._build_failure_links()
+
+    def _insert(self, keyword, pattern_id):
+        """Add a keyword to the trie"""
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = next_node
+            node = next_node
+        self._output[node].append(pattern_id)
+
+    def _build_failure_links(self):
+        """Compute failure links breadth-first and merge outputs along them"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_keywords(self, text):
+        """
+        Find every keyword that occurs in the text as a whole word
+
+        Args:
+            text (str): Lowercased text to scan
+
+        Returns:
+            set: Pattern ids of the keywords found
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        patterns = self._patterns
+        length = len(text)
+
+        found = set()
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if not output[node]:
+                continue
+
+            # Only accept matches that are not part of a longer word
+            if end + 1 < length and _is_word_char(text[end + 1]):
+                continue
+            for pattern_id in output[node]:
+                if pattern_id in found:
+                    continue
+                start = end - len(patterns[pattern_id][0]) + 1
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                found.add(pattern_id)
+        return found
+
+    def count_matches(self, text):
+        """
+        Count distinct keyword matches for each category
+
+        Args:
+            text (str): Lowercased text to scan
+
+        Returns:
+            dict: Mapping of category name to number of distinct keywords found
+        """
+        counts = {category: 0 for category in self.categories}
+        for pattern_id in self.find_keywords(text):
+            for category in self._patterns[pattern_id][1]:
+                counts[category] += 1
+        return counts
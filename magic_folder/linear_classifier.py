@@ -0,0 +1,209 @@
+"""
+Online linear text classifier over hashed word features
+
+The hashing vectorizer is stateless, so there is no vocabulary to fit or
+store and the model can be updated one document at a time with partial_fit.
+Prediction is a sparse dot product and needs no model download.
+"""
+
+import os
+import copy
+import gzip
+import pickle
+import numpy as np
+from magic_folder.utils import log_activity
+
+try:
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import SGDClassifier
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+    HashingVectorizer = None
+    SGDClassifier = None
+
+# 2^18 hashed unigram/bigram features keep collisions rare for document vocabularies
+HASH_FEATURES = 2 ** 18
+
+# Only the beginning of long documents is used for features
+MAX_FEATURE_CHARS = 20000
+
+# Saved weights are mostly incompressible floats, so gzip only needs to be fast
+SAVE_COMPRESSLEVEL = 1
+
+
+class OnlineTextClassifier:
+    """Logistic regression trained incrementally on hashed word n-grams"""
+
+    def __init__(self, categories, min_examples=10):
+        """
+        Initialize an untrained classifier
+
+        Args:
+            categories (list): Category names the classifier can predict
+            min_examples (int): Training documents required before predicting
+        """
+        if not SKLEARN_AVAILABLE:
+            raise ImportError("scikit-learn is required for the linear classifier")
+
+        self.categories = list(categories)
+        self.min_examples = min_examples
+        self.vectorizer = HashingVectorizer(
+            n_features=HASH_FEATURES,
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm='l2',
+            # Callers pass the document's shared lowercase view
+            lowercase=False
+        )
+        self.model = SGDClassifier(loss='log_loss', alpha=1e-5)
+        self.examples = 0
+        self.seen_categories = set()
+
+    def _features(self, text):
+        """Hash a document into a sparse feature row"""
+        return self.vectorizer.transform([text[:MAX_FEATURE_CHARS]])
+
+    @property
+    def ready(self):
+        """Whether the classifier has seen enough examples to predict"""
+        return self.examples >= self.min_examples and len(self.seen_categories) >= 2
+
+    def partial_fit(self, text, category, weight=1.0):
+        """
+        Update the model with one labelled document
+
+        Args:
+            text (str): The lowercased document text
+            category (str): The document's category
+            weight (float): Sample weight (e.g. higher for user corrections)
+        """
+        if not text or category not in self.categories:
+            return
+        self.model.partial_fit(
+            self._features(text), [category],
+            classes=self.categories, sample_weight=[weight]
+        )
+        self.examples += 1
+        self.seen_categories.add(category)
+
+    def predict_proba(self, text):
+        """
+        Predict category probabilities for a document
+
+        Args:
+            text (str): The lowercased document text
+
+        Returns:
+            dict: Mapping of category to probability, or an empty dict if the
+                classifier is not trained yet
+        """
+        if not text or not self.ready:
+            return {}
+
+        # Sparse dot product instead of sklearn's validated predict_proba
+        scores = self._features(text) @ self.model.coef_.T + self.model.intercept_
+        scores = np.asarray(scores).ravel()
+        if len(scores) == 1:
+            # Binary models keep a single weight vector for the second class
+            probability = 1.0 / (1.0 + np.exp(-scores[0]))
+            return {self.model.classes_[0]: 1.0 - probability, self.model.classes_[1]: probability}
+
+        # One-vs-rest sigmoids normalized like sklearn's log-loss SGD
+        probabilities = 1.0 / (1.0 + np.exp(-scores))
+        total = probabilities.sum()
+        if total <= 0:
+            return {}
+        return {category: float(p / total) for category, p in zip(self.model.classes_, probabilities)}
+
+    def snapshot(self):
+        """
+        Capture the classifier's state in a compact form
+
+        Only the hashed features that carry a weight are kept, as float32, so
+        the snapshot is a small fraction of the dense coefficient matrix. It
+        is cheap to take and can be written by ``write`` after later updates.
+
+        Returns:
+            dict: State to pass to ``write``
+        """
+        model = copy.copy(self.model)
+        coef = getattr(self.model, 'coef_', None)
+        state = {
+            'categories': list(self.categories),
+            'examples': self.examples,
+            'seen_categories': sorted(self.seen_categories),
+            'model': model
+        }
+        if coef is not None:
+            columns = np.flatnonzero(np.any(coef != 0, axis=0)).astype(np.int32)
+            model.coef_ = None
+            state['coef_shape'] = coef.shape
+            state['coef_columns'] = columns
+            state['coef_values'] = coef[:, columns].astype(np.float32)
+            state['intercept'] = np.array(self.model.intercept_)
+            model.intercept_ = None
+        return state
+
+    @staticmethod
+    def write(state, path):
+        """
+        Write a snapshot to a gzip-compressed pickle
+
+        Args:
+            state (dict): State returned by ``snapshot``
+            path (str): Destination file path
+        """
+        temp_path = path + ".tmp"
+        with gzip.open(temp_path, 'wb', compresslevel=SAVE_COMPRESSLEVEL) as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    def save(self, path):
+        """
+        Save the classifier to a gzip-compressed pickle
+
+        Args:
+            path (str): Destination file path
+        """
+        self.write(self.snapshot(), path)
+
+    @classmethod
+    def load(cls, path, categories, min_examples=10):
+        """
+        Load a saved classifier, or start a new one if it is missing or stale
+
+        Args:
+            path (str): Path to the saved classifier
+            categories (list): Currently configured categories
+            min_examples (int): Training documents required before predicting
+
+        Returns:
+            OnlineTextClassifier: The classifier
+        """
+        classifier = cls(categories, min_examples)
+        if not os.path.exists(path):
+            return classifier
+
+        try:
+            with gzip.open(path, 'rb') as f:
+                state = pickle.load(f)
+        except Exception as e:
+            log_activity(f"Error loading linear classifier: {e}")
+            return classifier
+
+        # The model's output classes are fixed at the first partial_fit
+        if state.get('categories') != classifier.categories:
+            log_activity("Categories changed - retraining the linear classifier from scratch")
+            return classifier
+
+        model = state['model']
+        if 'coef_columns' in state:
+            # Sparse float32 weights; partial_fit continues on a dense float64 matrix
+            model.coef_ = np.zeros(state['coef_shape'], dtype=np.float64)
+            model.coef_[:, state['coef_columns']] = state['coef_values']
+            model.intercept_ = state['intercept']
+        classifier.model = model
+        classifier.examples = state.get('examples', 0)
+        classifier.seen_categories = set(state.get('seen_categories', []))
+        return classifier
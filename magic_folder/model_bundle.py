@@ -0,0 +1,279 @@
+"""
+Self-contained model bundles loaded through memory mapping
+
+A bundle directory holds everything the analyzer needs to embed documents
+without touching the Hugging Face hub: the model config and tokenizer, the
+weights as a safetensors file, and the category embeddings computed for the
+keywords the bundle was exported with. The weights are mapped copy-on-write,
+so worker processes loading the same bundle share its physical pages and
+startup does not read the whole file.
+
+Usage:
+    python -m magic_folder.model_bundle export [--config CONFIG] [--output DIR]
+"""
+
+import os
+import json
+import struct
+import hashlib
+import argparse
+import numpy as np
+from magic_folder.utils import log_activity
+
+try:
+    import torch
+    from transformers import AutoConfig, AutoModel, AutoTokenizer
+    TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    TRANSFORMERS_AVAILABLE = False
+    torch = None
+    AutoConfig = None
+    AutoModel = None
+    AutoTokenizer = None
+
+WEIGHTS_FILE = "model.safetensors"
+CATEGORY_FILE = "category_embeddings.npz"
+METADATA_FILE = "bundle.json"
+
+# safetensors dtype codes and their numpy equivalents
+SAFETENSORS_DTYPES = {
+    'F64': np.float64,
+    'F32': np.float32,
+    'F16': np.float16,
+    'I64': np.int64,
+    'I32': np.int32,
+    'I16': np.int16,
+    'I8': np.int8,
+    'U8': np.uint8,
+    'BOOL': np.bool_,
+}
+NUMPY_DTYPES = {np.dtype(value): key for key, value in SAFETENSORS_DTYPES.items()}
+
+
+def get_bundle_dir(config):
+    """
+    Get the directory a bundle is exported to by default
+
+    Args:
+        config (Config): The application configuration
+
+    Returns:
+        str: Path to the bundle directory
+    """
+    return config.model_bundle_dir or os.path.join(config.base_dir, "model_bundle")
+
+
+def keyword_signature(categories, category_keywords):
+    """
+    Fingerprint the category definitions that category embeddings depend on
+
+    Args:
+        categories (list): Category names
+        category_keywords (dict): Keywords per category
+
+    Returns:
+        str: Hex digest of the categories and their keywords
+    """
+    definition = [[category, list(category_keywords.get(category, []))] for category in categories]
+    return hashlib.md5(json.dumps(definition).encode('utf-8')).hexdigest()
+
+
+def write_safetensors(path, tensors):
+    """
+    Write arrays to a safetensors file
+
+    Args:
+        path (str): Destination file path
+        tensors (dict): Mapping of tensor name to numpy array
+    """
+    header = {}
+    offset = 0
+    arrays = []
+    for name, array in tensors.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype not in NUMPY_DTYPES:
+            raise ValueError(f"Unsupported dtype {array.dtype} for tensor {name}")
+        header[name] = {
+            'dtype': NUMPY_DTYPES[array.dtype],
+            'shape': list(array.shape),
+            'data_offsets': [offset, offset + array.nbytes]
+        }
+        offset += array.nbytes
+        arrays.append(array)
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    # Pad so the data section (and every tensor in it) is 8-byte aligned
+    header_bytes += b' ' * (-len(header_bytes) % 8)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for array in arrays:
+            f.write(array.tobytes())
+    os.replace(temp_path, path)
+
+
+def read_safetensors(path):
+    """
+    Map a safetensors file into memory without reading it
+
+    Args:
+        path (str): Path to the safetensors file
+
+    Returns:
+        dict: Mapping of tensor name to a copy-on-write memory-mapped array
+    """
+    with open(path, 'rb') as f:
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_size).decode('utf-8'))
+    header.pop('__metadata__', None)
+
+    data_start = 8 + header_size
+    if os.path.getsize(path) == data_start:
+        return {name: np.zeros(info['shape'], dtype=SAFETENSORS_DTYPES[info['dtype']]) for name, info in header.items()}
+
+    # Copy-on-write: pages stay shared between processes unless written to
+    data = np.memmap(path, dtype=np.uint8, mode='c', offset=data_start)
+    tensors = {}
+    for name, info in header.items():
+        if info['dtype'] not in SAFETENSORS_DTYPES:
+            raise ValueError(f"Unsupported dtype {info['dtype']} for tensor {name}")
+        start, end = info['data_offsets']
+        tensors[name] = data[start:end].view(SAFETENSORS_DTYPES[info['dtype']]).reshape(info['shape'])
+    return tensors
+
+
+def export_bundle(analyzer, output_dir):
+    """
+    Write the analyzer's loaded model, tokenizer and category embeddings as a bundle
+
+    Args:
+        analyzer (AIAnalyzer): Analyzer with a loaded transformer model
+        output_dir (str): Directory to write the bundle to
+    """
+    model = analyzer.embedding_model
+    if hasattr(model, 'encode'):
+        # SentenceTransformer: the first module wraps the Hugging Face model
+        transformer = model[0].auto_model
+        tokenizer = model.tokenizer
+    else:
+        transformer = model
+        tokenizer = analyzer.tokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    transformer.config.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+
+    tensors = {}
+    seen = set()
+    for name, tensor in transformer.state_dict().items():
+        # Tied weights are stored once and restored when the model is built
+        if tensor.data_ptr() in seen:
+            continue
+        seen.add(tensor.data_ptr())
+        if tensor.dtype == torch.bfloat16:
+            tensor = tensor.float()
+        tensors[name] = tensor.detach().cpu().numpy()
+    write_safetensors(os.path.join(output_dir, WEIGHTS_FILE), tensors)
+
+    categories = [c for c in analyzer.categories if c in analyzer.category_embeddings]
+    np.savez(
+        os.path.join(output_dir, CATEGORY_FILE),
+        categories=np.array(categories, dtype=str),
+        embeddings=np.stack([analyzer.category_embeddings[c] for c in categories]) if categories else np.empty((0, 0))
+    )
+
+    with open(os.path.join(output_dir, METADATA_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'source_model': analyzer.model_name,
+            'keyword_signature': keyword_signature(analyzer.categories, analyzer.category_keywords)
+        }, f, indent=4)
+
+    log_activity(f"Exported model bundle for {analyzer.model_name} to {output_dir}")
+
+
+class ModelBundle:
+    """A model bundle loaded from disk"""
+
+    def __init__(self, bundle_dir):
+        """
+        Load a bundle without network access
+
+        Args:
+            bundle_dir (str): Directory written by ``export_bundle``
+        """
+        if not TRANSFORMERS_AVAILABLE:
+            raise ImportError("transformers is required to load a model bundle")
+
+        with open(os.path.join(bundle_dir, METADATA_FILE), 'r', encoding='utf-8') as f:
+            self.metadata = json.load(f)
+        self.source_model = self.metadata.get('source_model')
+
+        model_config = AutoConfig.from_pretrained(bundle_dir, local_files_only=True)
+        self.tokenizer = AutoTokenizer.from_pretrained(bundle_dir, local_files_only=True)
+        self.model = AutoModel.from_config(model_config)
+
+        # Parameters become views of the mapped file instead of copies
+        state = {name: torch.from_numpy(array) for name, array in
+                 read_safetensors(os.path.join(bundle_dir, WEIGHTS_FILE)).items()}
+        missing, unexpected = self.model.load_state_dict(state, strict=False, assign=True)
+        if hasattr(self.model, 'tie_weights'):
+            self.model.tie_weights()
+        if unexpected:
+            log_activity(f"Model bundle has unexpected weights: {', '.join(unexpected[:5])}")
+        self.model.eval()
+
+        self.category_embeddings = {}
+        self._category_signature = None
+        category_path = os.path.join(bundle_dir, CATEGORY_FILE)
+        if os.path.exists(category_path):
+            with np.load(category_path) as data:
+                self.category_embeddings = dict(zip(data['categories'].tolist(), data['embeddings']))
+            self._category_signature = self.metadata.get('keyword_signature')
+
+    def category_embeddings_for(self, categories, category_keywords):
+        """
+        Get the precomputed category embeddings if they match the current keywords
+
+        Args:
+            categories (list): Configured category names
+            category_keywords (dict): Configured keywords per category
+
+        Returns:
+            dict: Mapping of category to embedding, empty if the keywords changed
+        """
+        if self._category_signature != keyword_signature(categories, category_keywords):
+            return {}
+        return dict(self.category_embeddings)
+
+
+def main():
+    """Export the configured model as a bundle"""
+    from magic_folder.config import Config
+    from magic_folder.analyzer import AIAnalyzer
+
+    parser = argparse.ArgumentParser(description="Magic Folder model bundles")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--config", type=str, default=None, help="Path to custom configuration file")
+    parser.add_argument("--output", type=str, default=None, help="Bundle directory (overrides config setting)")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    output_dir = args.output or get_bundle_dir(config)
+
+    # Load through the hub the usual way, never from an existing bundle
+    config.model_bundle_dir = None
+    config.embedding_backend = "transformer"
+    analyzer = AIAnalyzer(config)
+    if not analyzer.model_available:
+        print("Embedding model could not be loaded.")
+        return
+
+    export_bundle(analyzer, output_dir)
+    print(f"Exported {config.model_name} to {output_dir}")
+    print(f'Set "bundle_dir": "{output_dir}" in the "model" section of your configuration to use it.')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,733 @@
+"""
+OCR helpers shared by image and scanned-PDF extraction
+
+Tesseract's run time grows with every language pack it loads, so instead of
+OCRing each image with all configured languages a cheap orientation and
+script detection (OSD) pass picks the packs that match the image's script.
+Photos without any text are recognized beforehand from a downscaled copy and
+not OCRed at all.
+
+Images are normalized before OCR: JPEGs are decoded directly at reduced
+scale and in grayscale, then resampled to the DPI Tesseract is tuned for.
+
+Recognition goes through a pool of long-lived workers. With tesserocr each
+worker keeps a loaded Tesseract engine per language set and is handed
+images in memory; otherwise each batch of pages is OCRed by a single
+tesseract process reading a list file.
+
+Recognized text is cached by a perceptual hash of the page, so a rescan of
+the same paper reuses the earlier OCR result even though its bytes differ.
+"""
+
+import os
+import time
+import pickle
+import queue
+import threading
+import tempfile
+import subprocess
+from contextlib import contextmanager
+import numpy as np
+from PIL import Image
+from magic_folder.utils import log_activity
+
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    TESSERACT_AVAILABLE = False
+    pytesseract = None
+
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+    tesserocr = None
+
+# Writing script of Tesseract language packs, as reported by OSD
+SCRIPT_LANGUAGES = {
+    'Latin': ['eng', 'deu', 'fra', 'spa', 'ita', 'por', 'nld', 'swe', 'nor', 'dan',
+              'fin', 'pol', 'ces', 'slk', 'hun', 'ron', 'hrv', 'slv', 'tur', 'vie',
+              'ind', 'msa', 'cat', 'lit', 'lav', 'est', 'isl', 'gle', 'afr', 'eus'],
+    'Cyrillic': ['rus', 'ukr', 'bel', 'bul', 'srp', 'mkd', 'kaz', 'kir', 'mon', 'tgk'],
+    'Greek': ['ell', 'grc'],
+    'Arabic': ['ara', 'fas', 'urd', 'pus', 'uig'],
+    'Hebrew': ['heb', 'yid'],
+    'Devanagari': ['hin', 'mar', 'nep', 'san'],
+    'Bengali': ['ben', 'asm'],
+    'Tamil': ['tam'],
+    'Thai': ['tha'],
+    'Han': ['chi_sim', 'chi_tra'],
+    'Japanese': ['jpn', 'jpn_vert'],
+    'Katakana': ['jpn', 'jpn_vert'],
+    'Hiragana': ['jpn', 'jpn_vert'],
+    'Hangul': ['kor', 'kor_vert'],
+    'Georgian': ['kat'],
+    'Armenian': ['hye'],
+}
+
+# OSD script guesses below this confidence are ignored
+MIN_SCRIPT_CONFIDENCE = 1.0
+
+# Images without a usable DPI are assumed to show a page this many inches long
+ASSUMED_PAGE_INCHES = 11.0
+
+# Small images are enlarged at most this much to reach the target DPI
+MAX_UPSCALE = 2.0
+
+# Tesseract's multi-page text output separates pages with a form feed
+PAGE_SEPARATOR = '\f'
+
+# Perceptual hashes compare adjacent pixels of a (HASH_SIZE + 1) x HASH_SIZE thumbnail
+HASH_SIZE = 16
+
+# A full OCR cache is trimmed to this share of its size, so the BK-trees are
+# rebuilt once per batch of new pages rather than on every insert
+CACHE_TRIM_RATIO = 0.9
+
+# Text detection works on a grayscale copy at most this many pixels wide/high,
+# split into square tiles of this size
+TEXT_CHECK_SIZE = 768
+TEXT_TILE = 12
+
+# A tile looks like glyphs when it has high contrast, mostly near-black and
+# near-white pixels, and several sharp horizontal transitions
+TILE_MIN_CONTRAST = 96
+TILE_MIN_EXTREME_FRACTION = 0.85
+TILE_EDGE_STEP = 48
+TILE_MIN_EDGES = 6
+
+
+class OcrTimings:
+    """Accumulates the time spent in each OCR stage of one document"""
+
+    def __init__(self):
+        self.stages = {}
+        # Pages of one document may be OCRed on several threads
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a block of work as part of a stage
+
+        Args:
+            name (str): Stage name, e.g. 'decode' or 'ocr'
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    @property
+    def total(self):
+        """Total seconds across all stages"""
+        return sum(self.stages.values())
+
+    def summary(self):
+        """
+        Format the breakdown for the activity log
+
+        Returns:
+            str: Milliseconds per stage in the order the stages ran
+        """
+        parts = [f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.stages.items()]
+        return ", ".join(parts) + f" (total {self.total * 1000:.0f}ms)"
+
+
+def estimate_dpi(image):
+    """
+    Get the resolution of a scan, estimating it when the file does not say
+
+    Many cameras write a placeholder 72 DPI, which is treated as unknown.
+
+    Args:
+        image (PIL.Image.Image): The image
+
+    Returns:
+        float: Dots per inch
+    """
+    try:
+        dpi = float(image.info.get('dpi', (0, 0))[0])
+    except (TypeError, ValueError, IndexError):
+        dpi = 0.0
+    if dpi > 72:
+        return dpi
+    return max(image.size) / ASSUMED_PAGE_INCHES
+
+
+def preprocess_for_ocr(image, target_dpi=300, dpi=None, timings=None):
+    """
+    Decode an image as grayscale at the resolution OCR needs
+
+    Must be called before the image is loaded so JPEGs can use draft mode,
+    which decodes at 1/2, 1/4 or 1/8 scale straight into grayscale.
+
+    Args:
+        image (PIL.Image.Image): A freshly opened image
+        target_dpi (int): Resolution to resample to
+        dpi (float): Known resolution of the image, estimated if None
+        timings (OcrTimings): Collects the time per stage
+
+    Returns:
+        PIL.Image.Image: Grayscale image at the target resolution
+    """
+    timings = timings or OcrTimings()
+    scale = min(target_dpi / (dpi or estimate_dpi(image)), MAX_UPSCALE)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+
+    with timings.stage('decode'):
+        if image.format == 'JPEG' and scale < 1:
+            # The draft is at least as large as requested, so no detail is lost
+            image.draft('L', size)
+        image.load()
+
+    with timings.stage('grayscale'):
+        if image.mode != 'L':
+            image = image.convert('L')
+
+    with timings.stage('resample'):
+        if image.size != size:
+            image = image.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+
+    return image
+
+
+def binarize(image):
+    """
+    Convert a grayscale image to black and white with Otsu's threshold
+
+    Args:
+        image (PIL.Image.Image): Grayscale image
+
+    Returns:
+        PIL.Image.Image: Image containing only 0 and 255 pixels
+    """
+    histogram = np.asarray(image.histogram()[:256], dtype=np.float64)
+    total = histogram.sum()
+    if total == 0:
+        return image
+
+    # Pick the threshold maximizing the between-class variance
+    levels = np.arange(256)
+    weight = np.cumsum(histogram)
+    cumulative_mean = np.cumsum(histogram * levels)
+    background = weight / total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (cumulative_mean[-1] * background - cumulative_mean) ** 2 / (weight * (total - weight))
+    threshold = int(np.nanargmax(variance)) if np.isfinite(variance).any() else 127
+
+    return image.point(lambda value: 255 if value > threshold else 0)
+
+
+def detect_script(image):
+    """
+    Detect the writing script of an image with Tesseract's OSD mode
+
+    Args:
+        image (PIL.Image.Image): The image to inspect
+
+    Returns:
+        tuple: (script, confidence), or (None, 0.0) if detection failed
+    """
+    if not TESSERACT_AVAILABLE:
+        return None, 0.0
+    try:
+        osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
+    except Exception:
+        # OSD needs osd.traineddata and enough text to be confident
+        return None, 0.0
+    return osd.get('script'), float(osd.get('script_conf', 0.0))
+
+
+def select_languages(script, languages):
+    """
+    Pick the configured languages written in a script
+
+    Every configured language of the script is kept: OSD cannot tell them
+    apart, so dropping one would misread every page written in it.
+
+    Args:
+        script (str): Script name reported by OSD
+        languages (list): Configured Tesseract languages, most preferred first
+
+    Returns:
+        list: The selected languages, or all configured languages if none
+            match the script
+    """
+    candidates = SCRIPT_LANGUAGES.get(script, [])
+    selected = [language for language in languages if language in candidates]
+    if not selected:
+        return list(languages)
+    return selected
+
+
+def decode_preview(image, size=TEXT_CHECK_SIZE):
+    """
+    Decode a freshly opened image just well enough for ``text_likelihood``
+
+    JPEGs are decoded in draft mode, straight into grayscale at the smallest
+    scale that still covers ``size``. Other formats are decoded as they are;
+    ``text_likelihood`` box-reduces them before converting.
+
+    Args:
+        image (PIL.Image.Image): A freshly opened image
+        size (int): Longest side the preview needs
+
+    Returns:
+        PIL.Image.Image: The decoded image
+    """
+    scale = size / max(image.size)
+    if image.format == 'JPEG' and scale < 1:
+        image.draft('L', (max(1, round(image.width * scale)), max(1, round(image.height * scale))))
+    image.load()
+    return image
+
+
+def text_likelihood(image):
+    """
+    Estimate how likely an image is to contain printed text
+
+    Glyphs produce high-contrast, two-tone tiles with many sharp transitions,
+    and lines of text put several such tiles next to each other. Photo edges
+    rarely do both, so the score is the fraction of tiles that sit in a
+    horizontal run of at least three text-like tiles.
+
+    Args:
+        image (PIL.Image.Image): The image to inspect
+
+    Returns:
+        float: Score between 0 and 1; printed pages score around 0.1 or more
+    """
+    # Box-reduce before converting so large photos are never converted at full size
+    factor = max(image.width, image.height) // TEXT_CHECK_SIZE
+    gray = (image.reduce(factor) if factor > 1 else image).convert('L')
+    gray.thumbnail((TEXT_CHECK_SIZE, TEXT_CHECK_SIZE))
+    pixels = np.asarray(gray, dtype=np.float32)
+
+    rows, cols = pixels.shape[0] // TEXT_TILE, pixels.shape[1] // TEXT_TILE
+    if rows < 1 or cols < 3:
+        # Too small to judge - let OCR decide
+        return 1.0
+
+    tiles = pixels[:rows * TEXT_TILE, :cols * TEXT_TILE]
+    tiles = tiles.reshape(rows, TEXT_TILE, cols, TEXT_TILE).transpose(0, 2, 1, 3)
+    low = tiles.min(axis=(2, 3), keepdims=True)
+    high = tiles.max(axis=(2, 3), keepdims=True)
+    contrast = (high - low)[..., 0, 0]
+
+    relative = (tiles - low) / np.maximum(high - low, 1.0)
+    extreme = ((relative < 0.25) | (relative > 0.75)).mean(axis=(2, 3))
+    edges = (np.abs(np.diff(tiles, axis=3)) > TILE_EDGE_STEP).sum(axis=(2, 3))
+
+    text_like = (
+        (contrast >= TILE_MIN_CONTRAST)
+        & (extreme >= TILE_MIN_EXTREME_FRACTION)
+        & (edges >= TILE_MIN_EDGES)
+    )
+    runs = text_like[:, :-2] & text_like[:, 1:-1] & text_like[:, 2:]
+    return float(runs.sum()) / text_like.size
+
+
+class TextPresenceDetector:
+    """Decides whether an image is worth OCRing and tracks the skip rate"""
+
+    def __init__(self, threshold=0.003):
+        """
+        Initialize the detector
+
+        Args:
+            threshold (float): Minimum text likelihood for OCR (0 = always OCR)
+        """
+        self.threshold = threshold
+        self.checked = 0
+        self.skipped = 0
+
+    def should_ocr(self, image, name=""):
+        """
+        Check whether an image likely contains text
+
+        Args:
+            image (PIL.Image.Image): The image to inspect
+            name (str): File name used in log messages
+
+        Returns:
+            bool: True if the image should be OCRed
+        """
+        if self.threshold <= 0:
+            return True
+
+        score = text_likelihood(image)
+        self.checked += 1
+        if score >= self.threshold:
+            return True
+
+        self.skipped += 1
+        log_activity(
+            f"No text detected in {name or 'image'} (score {score:.4f}) - skipping OCR "
+            f"({self.skipped} of {self.checked} images skipped, {self.skip_rate:.0%})"
+        )
+        return False
+
+    @property
+    def skip_rate(self):
+        """Fraction of checked images that were not OCRed"""
+        return self.skipped / self.checked if self.checked else 0.0
+
+
+class LanguageSelector:
+    """Chooses the Tesseract languages to load for each image"""
+
+    def __init__(self, languages, enabled=True):
+        """
+        Initialize the selector
+
+        Args:
+            languages (list): Configured Tesseract languages, most preferred first
+            enabled (bool): Whether to run script detection at all
+        """
+        self.languages = list(languages) or ["eng"]
+        self.all_languages = "+".join(self.languages)
+
+        # Detection only pays off when the languages span several scripts
+        self.enabled = enabled and TESSERACT_AVAILABLE and (
+            len({self._script_of(language) for language in self.languages}) > 1
+        )
+        self.detections = 0
+        self.narrowed = 0
+        self._reported_scripts = set()
+
+    @staticmethod
+    def _script_of(language):
+        """Get the script a language pack belongs to"""
+        for script, languages in SCRIPT_LANGUAGES.items():
+            if language in languages:
+                return script
+        return language
+
+    def languages_for(self, image):
+        """
+        Get the Tesseract language string to OCR an image with
+
+        Args:
+            image (PIL.Image.Image): The image about to be OCRed
+
+        Returns:
+            str: Languages joined with '+', as expected by Tesseract
+        """
+        if not self.enabled:
+            return self.all_languages
+
+        script, confidence = detect_script(image)
+        self.detections += 1
+        if not script or confidence < MIN_SCRIPT_CONFIDENCE:
+            return self.all_languages
+
+        selected = select_languages(script, self.languages)
+        if len(selected) < len(self.languages):
+            self.narrowed += 1
+            if script not in self._reported_scripts:
+                self._reported_scripts.add(script)
+                dropped = [language for language in self.languages if language not in selected]
+                log_activity(f"OCR: {script} script detected - skipping {', '.join(dropped)} for such images")
+        if self.detections % 100 == 0:
+            log_activity(f"OCR script detection narrowed languages for {self.narrowed} of {self.detections} images")
+        return "+".join(selected)
+
+
+class OcrWorkerPool:
+    """Long-lived Tesseract workers that OCR batches of page images"""
+
+    def __init__(self, workers=1, dpi=300, timeout=120, tesseract_cmd=None):
+        """
+        Initialize the pool
+
+        Args:
+            workers (int): Number of pages OCRed concurrently
+            dpi (int): Resolution of the images passed in
+            timeout (int): Seconds allowed per page for the tesseract command
+            tesseract_cmd (str): Tesseract executable; forces the command-line backend
+        """
+        self.workers = max(1, workers)
+        self.dpi = dpi
+        self.timeout = timeout
+        self.backend = 'tesserocr' if TESSEROCR_AVAILABLE and not tesseract_cmd else 'cli'
+        if not tesseract_cmd:
+            tesseract_cmd = pytesseract.pytesseract.tesseract_cmd if TESSERACT_AVAILABLE else 'tesseract'
+        self.tesseract_cmd = tesseract_cmd
+
+        # Each slot holds one worker's engines, keyed by language string
+        self._slots = queue.Queue()
+        for _ in range(self.workers):
+            self._slots.put({})
+
+        # Concurrent workers already use the cores - keep Tesseract single-threaded
+        self._environment = dict(os.environ)
+        if self.workers > 1:
+            self._environment.setdefault('OMP_THREAD_LIMIT', '1')
+        log_activity(f"OCR worker pool started with {self.workers} {self.backend} workers")
+
+    @contextmanager
+    def _worker(self):
+        """Reserve a worker slot for the duration of a with-block"""
+        engines = self._slots.get()
+        try:
+            yield engines
+        finally:
+            self._slots.put(engines)
+
+    def recognize(self, images, languages):
+        """
+        OCR a batch of pages with one worker
+
+        Args:
+            images (list): PIL images, preprocessed for OCR
+            languages (str): Tesseract languages joined with '+'
+
+        Returns:
+            list: Recognized text of each page, in order
+        """
+        if not images:
+            return []
+        with self._worker() as engines:
+            if self.backend == 'tesserocr':
+                return self._recognize_in_memory(engines, images, languages)
+            return self._recognize_with_list_file(images, languages)
+
+    def _recognize_in_memory(self, engines, images, languages):
+        """OCR pages with a worker's persistent tesserocr engine"""
+        engine = engines.get(languages)
+        if engine is None:
+            # Language models are loaded once per worker and language set
+            engine = engines[languages] = tesserocr.PyTessBaseAPI(lang=languages)
+
+        texts = []
+        for image in images:
+            engine.SetImage(image)
+            engine.SetSourceResolution(self.dpi)
+            texts.append(engine.GetUTF8Text())
+        return texts
+
+    def _recognize_with_list_file(self, images, languages):
+        """OCR pages with one tesseract process reading a list of page files"""
+        with tempfile.TemporaryDirectory(prefix="magic_folder_ocr_") as temp_dir:
+            paths = []
+            for number, image in enumerate(images):
+                # Uncompressed PNM is the cheapest format for both PIL and Leptonica
+                path = os.path.join(temp_dir, f"page_{number:04d}.pnm")
+                image.save(path, format='PPM')
+                paths.append(path)
+
+            list_path = os.path.join(temp_dir, "pages.txt")
+            with open(list_path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(paths) + "\n")
+
+            result = subprocess.run(
+                [self.tesseract_cmd, list_path, 'stdout', '-l', languages, '--dpi', str(self.dpi)],
+                capture_output=True, timeout=self.timeout * len(images), env=self._environment
+            )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode('utf-8', errors='ignore').strip()[:200])
+
+        pages = result.stdout.decode('utf-8', errors='ignore').split(PAGE_SEPARATOR)
+        pages = pages[:len(images)]
+        return pages + [""] * (len(images) - len(pages))
+
+    def close(self):
+        """Release the Tesseract engines loaded by idle workers"""
+        idle = []
+        while True:
+            try:
+                idle.append(self._slots.get_nowait())
+            except queue.Empty:
+                break
+        for engines in idle:
+            for engine in engines.values():
+                engine.End()
+            engines.clear()
+            self._slots.put(engines)
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """
+    Compute the difference hash of an image
+
+    Each bit says whether a pixel of a small grayscale thumbnail is brighter
+    than its right neighbour, which survives recompression, rescaling and
+    small exposure changes.
+
+    Args:
+        image (PIL.Image.Image): The image
+        hash_size (int): Thumbnail rows; the hash has hash_size ** 2 bits
+
+    Returns:
+        int: The hash
+    """
+    thumbnail = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+
+def hamming_distance(first, second):
+    """Number of differing bits between two hashes"""
+    return bin(first ^ second).count('1')
+
+
+class BKTree:
+    """Burkhard-Keller tree for nearest-hash lookups under Hamming distance"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, key, value):
+        """
+        Insert a hash, replacing the value of an identical one
+
+        Args:
+            key (int): The hash
+            value: Value stored with the hash
+        """
+        self.size += 1
+        if self.root is None:
+            self.root = [key, value, {}]
+            return
+
+        node = self.root
+        while True:
+            distance = hamming_distance(key, node[0])
+            if distance == 0:
+                node[1] = value
+                self.size -= 1
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, value, {}]
+                return
+            node = child
+
+    def nearest(self, key, max_distance):
+        """
+        Find the closest stored hash within a distance
+
+        Args:
+            key (int): The hash to look up
+            max_distance (int): Largest accepted Hamming distance
+
+        Returns:
+            tuple: (distance, value) of the closest match, or None
+        """
+        best = None
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(key, node[0])
+            if distance <= max_distance and (best is None or distance < best[0]):
+                best = (distance, node[1])
+                if distance == 0:
+                    break
+
+            # Triangle inequality: only children within the search radius can match
+            radius = best[0] if best is not None else max_distance
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return best
+
+
+class OcrCache:
+    """OCR results keyed by perceptual page hash and language set"""
+
+    def __init__(self, path, max_distance=10, max_entries=1000):
+        """
+        Initialize the cache and load saved results
+
+        Args:
+            path (str): File the cache is saved to
+            max_distance (int): Largest Hamming distance treated as the same page
+            max_entries (int): Number of results kept, oldest dropped first
+        """
+        self.path = path
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.entries = []
+        self.trees = {}
+        self.hits = 0
+        self.dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Load saved results from disk"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                self.entries = pickle.load(f)
+        except Exception as e:
+            log_activity(f"Error loading OCR cache: {e}")
+            self.entries = []
+        self._rebuild()
+
+    def _rebuild(self):
+        """Index the entries in one BK-tree per language set"""
+        self.trees = {}
+        for languages, key, text in self.entries:
+            self.trees.setdefault(languages, BKTree()).add(key, text)
+
+    def lookup(self, key, languages):
+        """
+        Get the OCR text of a near-identical page
+
+        Args:
+            key (int): Perceptual hash of the page
+            languages (str): Language set the page would be OCRed with
+
+        Returns:
+            str: The cached text, or None
+        """
+        with self._lock:
+            tree = self.trees.get(languages)
+            match = tree.nearest(key, self.max_distance) if tree is not None else None
+            if match is None:
+                return None
+            self.hits += 1
+            return match[1]
+
+    def add(self, key, languages, text):
+        """
+        Remember the OCR text of a page
+
+        Args:
+            key (int): Perceptual hash of the page
+            languages (str): Language set the page was OCRed with
+            text (str): Recognized text
+        """
+        with self._lock:
+            self.entries.append((languages, key, text))
+            self.trees.setdefault(languages, BKTree()).add(key, text)
+            if len(self.entries) > self.max_entries:
+                # BK-trees cannot delete, so drop the oldest entries and reindex
+                keep = int(self.max_entries * CACHE_TRIM_RATIO)
+                self.entries = self.entries[-keep:] if keep else []
+                self._rebuild()
+            self.dirty = True
+
+    def save(self):
+        """Save the cache if it changed"""
+        with self._lock:
+            if not self.dirty:
+                return
+            try:
+                temp_path = self.path + ".tmp"
+                with open(temp_path, 'wb') as f:
+                    pickle.dump(self.entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, self.path)
+                self.dirty = False
+            except Exception as e:
+                log_activity(f"Error saving OCR cache: {e}")
@@ -0,0 +1,163 @@
+"""
+PDF text extraction backends
+
+PyPDF2's pure-Python text extraction is slow on large documents, so page text
+comes from the fastest backend available: pypdfium2 if installed, then
+poppler's pdftotext command, with PyPDF2 as the fallback. Every backend
+yields pages one at a time so callers can stop as soon as they have enough
+text.
+"""
+
+import shutil
+import subprocess
+import PyPDF2
+from magic_folder.utils import log_activity
+
+try:
+    import pypdfium2
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+    pypdfium2 = None
+
+PDF_BACKENDS = ("pypdfium2", "pdftotext", "pypdf2")
+
+# Bytes read from pdftotext's output at a time
+PDFTOTEXT_CHUNK = 65536
+
+# Pages are separated by a form feed in pdftotext output
+PAGE_SEPARATOR = '\f'
+
+
+def available_backends():
+    """
+    List the PDF backends usable on this system
+
+    Returns:
+        list: Backend names in order of preference
+    """
+    backends = []
+    if PDFIUM_AVAILABLE:
+        backends.append("pypdfium2")
+    if shutil.which("pdftotext"):
+        backends.append("pdftotext")
+    backends.append("pypdf2")
+    return backends
+
+
+def select_backend(preferred="auto"):
+    """
+    Choose the backend used for page text
+
+    Args:
+        preferred (str): A backend name, or "auto" for the fastest available
+
+    Returns:
+        str: The backend name
+    """
+    backends = available_backends()
+    if preferred in backends:
+        return preferred
+    if preferred != "auto":
+        log_activity(f"PDF backend {preferred} not available - using {backends[0]}")
+    return backends[0]
+
+
+def read_pdf_metadata(file_path):
+    """
+    Read the document information dictionary of a PDF
+
+    Args:
+        file_path (str): Path to the PDF file
+
+    Returns:
+        dict: Metadata keys (such as '/Title' or '/Producer') to non-empty values
+    """
+    with open(file_path, 'rb') as f:
+        info = PyPDF2.PdfReader(f).metadata
+        if not info:
+            return {}
+        return {key: str(info[key]) for key in info if info[key]}
+
+
+def iter_pdf_pages(file_path, max_pages, backend="auto"):
+    """
+    Yield the text of the first pages of a PDF
+
+    Stop iterating (or close the generator) once enough text has been read;
+    the remaining pages are never parsed.
+
+    Args:
+        file_path (str): Path to the PDF file
+        max_pages (int): Maximum number of pages to read
+        backend (str): Backend name, or "auto"
+
+    Yields:
+        str: Text of each page in order
+    """
+    backend = select_backend(backend)
+    if backend == "pypdfium2":
+        yield from _pdfium_pages(file_path, max_pages)
+    elif backend == "pdftotext":
+        yield from _pdftotext_pages(file_path, max_pages)
+    else:
+        yield from _pypdf2_pages(file_path, max_pages)
+
+
+def _pdfium_pages(file_path, max_pages):
+    """Yield page text with PDFium"""
+    document = pypdfium2.PdfDocument(file_path)
+    try:
+        for page_number in range(min(max_pages, len(document))):
+            page = document[page_number]
+            text_page = page.get_textpage()
+            try:
+                yield text_page.get_text_range()
+            finally:
+                text_page.close()
+                page.close()
+    finally:
+        document.close()
+
+
+def _pdftotext_pages(file_path, max_pages):
+    """Yield page text from a streaming pdftotext process"""
+    process = subprocess.Popen(
+        ['pdftotext', '-q', '-f', '1', '-l', str(max_pages), '-enc', 'UTF-8', file_path, '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    pending = []
+    try:
+        while True:
+            chunk = process.stdout.read1(PDFTOTEXT_CHUNK)
+            if not chunk:
+                break
+            pending.append(chunk)
+            if b'\f' not in chunk:
+                continue
+            # Hand out every complete page as soon as it arrives
+            pages = b''.join(pending).split(b'\f')
+            pending = [pages.pop()]
+            for page in pages:
+                yield page.decode('utf-8', errors='ignore')
+        tail = b''.join(pending)
+        if tail.strip():
+            yield tail.decode('utf-8', errors='ignore')
+    finally:
+        # Stop rendering pages nobody will read
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+def _pypdf2_pages(file_path, max_pages):
+    """Yield page text with PyPDF2"""
+    with open(file_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        for page_number in range(min(max_pages, len(reader.pages))):
+            try:
+                yield reader.pages[page_number].extract_text()
+            except Exception as e:
+                log_activity(f"Error extracting page {page_number + 1}: {e}")
+                yield f"[Page {page_number + 1} extraction failed]"
@@ -0,0 +1,311 @@
+"""
+Re-sort the organized tree after categories or keywords change
+
+Files already in the organized folder are rescored in batches with their
+stored extracted text and embeddings, and moved to the category they would
+get today.
+
+Usage:
+    python -m magic_folder.reclassify [--config CONFIG] [--output PLAN.json] [--apply]
+"""
+
+import os
+import json
+import uuid
+import shutil
+import argparse
+import threading
+from magic_folder.utils import log_activity
+from magic_folder.deduplication import DeduplicationManager
+
+
+def collect_organized_files(config):
+    """
+    List the files in the organized folder with their current category
+
+    Args:
+        config (Config): The application configuration
+
+    Returns:
+        list: (file_path, category) tuples
+    """
+    files = []
+    if not os.path.isdir(config.organized_dir):
+        return files
+
+    for category in sorted(os.listdir(config.organized_dir)):
+        category_dir = os.path.join(config.organized_dir, category)
+        if not os.path.isdir(category_dir):
+            continue
+        for root, _, filenames in os.walk(category_dir):
+            for filename in sorted(filenames):
+                extension = os.path.splitext(filename)[1].lower()
+                if (filename in config.excluded_files or extension in config.excluded_extensions
+                        or filename.startswith('.')):
+                    continue
+                files.append((os.path.join(root, filename), category))
+    return files
+
+
+def extracted_batches(config, content_extractor, batch_size=256):
+    """
+    Read the organized files' texts one batch at a time
+
+    Args:
+        config (Config): The application configuration
+        content_extractor (ContentExtractor): Extractor whose text store provides the file texts
+        batch_size (int): Files per batch
+
+    Yields:
+        tuple: (files, contents) where files are (file_path, category) tuples
+    """
+    files = collect_organized_files(config)
+    for start in range(0, len(files), batch_size):
+        batch = files[start:start + batch_size]
+        yield batch, [content_extractor.extract_text(path) for path, _ in batch]
+
+
+def plan_batch(analyzer, files, contents):
+    """
+    Work out which files of one batch belong in a different category now
+
+    Args:
+        analyzer (AIAnalyzer): Analyzer used to rescore the files
+        files (list): (file_path, category) tuples
+        contents (list): Extracted text of each file
+
+    Returns:
+        list: {'source', 'from', 'to'} entries for the files that change category
+    """
+    categories = analyzer.reclassify_contents(contents, batch_size=len(files))
+    return [
+        {'source': path, 'from': current, 'to': category}
+        for (path, current), category in zip(files, categories)
+        if category != current
+    ]
+
+
+def plan_reclassification(config, analyzer, content_extractor, batch_size=256):
+    """
+    Work out which organized files belong in a different category now
+
+    Args:
+        config (Config): The application configuration
+        analyzer (AIAnalyzer): Analyzer used to rescore the files
+        content_extractor (ContentExtractor): Extractor whose text store provides the file texts
+        batch_size (int): Files extracted and scored per batch
+
+    Returns:
+        dict: 'scanned' file count and 'moves', a list of
+            {'source', 'from', 'to'} entries
+    """
+    scanned = 0
+    moves = []
+    for files, contents in extracted_batches(config, content_extractor, batch_size):
+        scanned += len(files)
+        moves.extend(plan_batch(analyzer, files, contents))
+    log_activity(f"Reclassification: {len(moves)} of {scanned} organized files would change category")
+    return {'scanned': scanned, 'moves': moves}
+
+
+def _relink_recent(config, source, destination, old_category, new_category):
+    """
+    Point the feedback entry of a moved file at its new location
+
+    Entries in the feedback 'recent' folder are named
+    ``<category>--<file name>`` and link (or, without symlink support, are
+    copies of) the organized file, so both the name and the target change.
+
+    Args:
+        config (Config): The application configuration
+        source (str): Previous path of the file
+        destination (str): New path of the file
+        old_category (str): Category the file was moved out of
+        new_category (str): Category the file was moved into
+    """
+    recent_dir = os.path.join(config.feedback_dir, "recent")
+    if not os.path.isdir(recent_dir):
+        return
+
+    copy_name = f"{old_category}--{os.path.basename(source)}"
+    new_entry = os.path.join(recent_dir, f"{new_category}--{os.path.basename(destination)}")
+    for name in os.listdir(recent_dir):
+        entry = os.path.join(recent_dir, name)
+        try:
+            if os.path.islink(entry):
+                if os.readlink(entry) != source:
+                    continue
+                os.remove(entry)
+                os.symlink(destination, new_entry)
+            elif name == copy_name:
+                os.replace(entry, new_entry)
+        except OSError as e:
+            log_activity(f"Error updating feedback entry {name}: {e}")
+
+
+def apply_plan(config, plan, dedup_manager=None):
+    """
+    Move files as described by a reclassification plan
+
+    The deduplication records and feedback entries of each moved file are
+    updated to its new path.
+
+    Args:
+        config (Config): The application configuration
+        plan (dict): Plan returned by ``plan_reclassification``
+        dedup_manager (DeduplicationManager, optional): Manager whose records
+            follow the moved files; created from the config if deduplication
+            is enabled
+
+    Returns:
+        int: Number of files moved
+    """
+    if dedup_manager is None and config.dedup_enabled:
+        dedup_manager = DeduplicationManager(config)
+
+    moved = 0
+    for move in plan['moves']:
+        source = move['source']
+        if not os.path.exists(source):
+            continue
+
+        category_dir = os.path.join(config.organized_dir, move['to'])
+        os.makedirs(category_dir, exist_ok=True)
+
+        # Ensure destination filename is unique
+        filename = os.path.basename(source)
+        base_name, extension = os.path.splitext(filename)
+        destination = os.path.join(category_dir, filename)
+        counter = 1
+        while os.path.exists(destination):
+            destination = os.path.join(category_dir, f"{base_name}_{counter}{extension}")
+            counter += 1
+
+        try:
+            shutil.move(source, destination)
+            moved += 1
+        except Exception as e:
+            log_activity(f"Error moving {filename} to {move['to']}: {e}")
+            continue
+
+        if dedup_manager is not None:
+            dedup_manager.update_file_path(source, destination, move['to'])
+        _relink_recent(config, source, destination, move['from'], move['to'])
+
+    log_activity(f"Reclassification moved {moved} files")
+    return moved
+
+
+class ReclassifyJob:
+    """Plans (and optionally applies) a reclassification in a background thread"""
+
+    def __init__(self, config, analyzer, content_extractor, apply=False, dedup_manager=None):
+        """
+        Initialize the job
+
+        Args:
+            config (Config): The application configuration
+            analyzer (AIAnalyzer): Analyzer used to rescore the files
+            content_extractor (ContentExtractor): Extractor whose text store provides the file texts
+            apply (bool): Whether to move the files or only plan the moves
+            dedup_manager (DeduplicationManager, optional): Manager whose records follow moved files
+        """
+        self.config = config
+        self.analyzer = analyzer
+        self.content_extractor = content_extractor
+        self.apply = apply
+        self.dedup_manager = dedup_manager
+        self.id = uuid.uuid4().hex
+        self.status = "pending"
+        self.result = None
+        self.error = None
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+
+    @property
+    def running(self):
+        """Whether the job has not finished yet"""
+        return self.status in ("pending", "running")
+
+    def start(self):
+        """Start the job in the background"""
+        self.thread.start()
+
+    def _run(self):
+        """Plan and apply the moves batch by batch"""
+        self.status = "running"
+        try:
+            if self.dedup_manager is None and self.config.dedup_enabled:
+                self.dedup_manager = DeduplicationManager(self.config)
+
+            result = {'scanned': 0, 'moves': []}
+            if self.apply:
+                result['moved'] = 0
+            for files, contents in extracted_batches(self.config, self.content_extractor):
+                # Texts are read without the analyzer lock; it is held only while
+                # a batch is rescored and moved, so the watcher is not stalled
+                # behind the whole tree
+                with self.analyzer.lock:
+                    moves = plan_batch(self.analyzer, files, contents)
+                    if self.apply:
+                        result['moved'] += apply_plan(self.config, {'moves': moves}, self.dedup_manager)
+                result['scanned'] += len(files)
+                result['moves'].extend(
+                    {'file': os.path.relpath(move['source'], self.config.organized_dir),
+                     'from': move['from'], 'to': move['to']}
+                    for move in moves
+                )
+            verb = "changed" if self.apply else "would change"
+            log_activity(f"Reclassification: {len(result['moves'])} of {result['scanned']} "
+                         f"organized files {verb} category")
+            self.result = result
+            self.status = "finished"
+        except Exception as e:
+            log_activity(f"Reclassification failed: {e}")
+            self.error = str(e)
+            self.status = "failed"
+
+    def to_dict(self):
+        """
+        Describe the job for the web API
+
+        Returns:
+            dict: 'job', 'status', 'apply' and, once done, 'result' or 'error'
+        """
+        return {'job': self.id, 'status': self.status, 'apply': self.apply,
+                'result': self.result, 'error': self.error}
+
+
+def main():
+    """Command line entry point for re-sorting the organized folder"""
+    from magic_folder.config import Config
+    from magic_folder.analyzer import AIAnalyzer
+    from magic_folder.content_extractor import ContentExtractor
+
+    parser = argparse.ArgumentParser(description="Re-sort already organized files into the current categories")
+    parser.add_argument("--config", type=str, default=None, help="Path to custom configuration file")
+    parser.add_argument("--output", type=str, default=None, help="Write the move plan to this JSON file")
+    parser.add_argument("--apply", action="store_true", help="Move the files instead of only printing the plan")
+    parser.add_argument("--offline", action="store_true", help="Run without downloading AI models")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    analyzer = AIAnalyzer(config, offline_mode=args.offline)
+    plan = plan_reclassification(config, analyzer, ContentExtractor(config))
+
+    for move in plan['moves']:
+        print(f"{move['from']} -> {move['to']}: {os.path.relpath(move['source'], config.organized_dir)}")
+    print(f"\n{len(plan['moves'])} of {plan['scanned']} files would change category")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, indent=4)
+        print(f"Plan written to {args.output}")
+
+    if args.apply:
+        print(f"Moved {apply_plan(config, plan)} files")
+    analyzer.save_learned_state()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Local inference service shared by the file watcher and the web interface
+
+One process owns the AI model and the content extractor and serves requests
+over a Unix domain socket, so other Magic Folder frontends on the same host
+don't load a second copy of the model or write to the same cache files.
+"""
+
+import os
+import json
+import socket
+import threading
+import socketserver
+from magic_folder.utils import log_activity
+
+SERVICE_AVAILABLE = hasattr(socket, 'AF_UNIX')
+
+
+def get_socket_path(config):
+    """
+    Get the path of the inference service socket
+
+    Args:
+        config (Config): The application configuration
+
+    Returns:
+        str: Path to the Unix domain socket
+    """
+    return os.path.join(config.base_dir, config.service_socket_name)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Handles newline-delimited JSON requests on one client connection"""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line.decode('utf-8'))
+                result = self.server.service.dispatch(request.get('op'), request.get('params', {}))
+                response = {'ok': True, 'result': result}
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b"\n")
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class InferenceServer:
+    """Serves an analyzer and content extractor to other local processes"""
+
+    def __init__(self, config, analyzer, content_extractor):
+        """
+        Initialize the inference server
+
+        Args:
+            config (Config): The application configuration
+            analyzer (AIAnalyzer): The analyzer that owns the model
+            content_extractor (ContentExtractor): The extractor that owns the content cache
+        """
+        self.config = config
+        self.analyzer = analyzer
+        self.content_extractor = content_extractor
+        self.socket_path = get_socket_path(config)
+        self.server = None
+        self.thread = None
+
+    def dispatch(self, op, params):
+        """
+        Run a single service operation
+
+        Args:
+            op (str): Operation name
+            params (dict): Operation parameters
+
+        Returns:
+            JSON-serializable result of the operation
+        """
+        if op == 'ping':
+            return {'pid': os.getpid(), 'model_available': self.analyzer.model_available}
+        # The analyzer and extractor hold their own locks, shared with the
+        # watcher, feedback and web threads of this process
+        elif op == 'analyze':
+            category, new_name = self.analyzer.analyze_content(params.get('content'), params['file_path'])
+            return [category, new_name]
+        elif op == 'analyze_metadata':
+            result = self.analyzer.analyze_metadata(params['metadata'], params['file_path'])
+            return list(result) if result else None
+        elif op == 'stats':
+            return self.analyzer.get_cascade_stats()
+        elif op == 'extract':
+            return self.content_extractor.extract_text(params['file_path'])
+        raise ValueError(f"Unknown operation: {op}")
+
+    def start(self):
+        """
+        Start serving in a background thread
+
+        Returns:
+            bool: True if the server is running, False if it could not be started
+        """
+        if not SERVICE_AVAILABLE:
+            log_activity("Inference service not supported on this platform")
+            return False
+
+        if os.path.exists(self.socket_path):
+            if InferenceClient(self.socket_path).ping():
+                log_activity(f"Inference service already running at {self.socket_path}")
+                return False
+            # Stale socket from a previous run
+            os.unlink(self.socket_path)
+
+        try:
+            self.server = _UnixServer(self.socket_path, _RequestHandler)
+            os.chmod(self.socket_path, 0o600)
+        except OSError as e:
+            log_activity(f"Could not start inference service: {e}")
+            self.server = None
+            return False
+
+        self.server.service = self
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        log_activity(f"Inference service listening on {self.socket_path}")
+        return True
+
+    def stop(self):
+        """Stop serving and remove the socket file"""
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+class InferenceClient:
+    """Client for a running inference service"""
+
+    def __init__(self, socket_path, timeout=300):
+        """
+        Initialize the client
+
+        Args:
+            socket_path (str): Path to the service socket
+            timeout (float): Seconds to wait for a response
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self._sock = None
+        self._file = None
+
+    def _connect(self):
+        """Open the connection to the service"""
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(self.timeout)
+        self._sock.connect(self.socket_path)
+        self._file = self._sock.makefile('rb')
+
+    def close(self):
+        """Close the connection to the service"""
+        if self._sock is not None:
+            try:
+                self._file.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._file = None
+
+    def call(self, op, **params):
+        """
+        Call a service operation
+
+        Args:
+            op (str): Operation name
+            **params: Operation parameters
+
+        Returns:
+            The operation result
+        """
+        payload = json.dumps({'op': op, 'params': params}).encode('utf-8') + b"\n"
+        with self.lock:
+            # Retry once on a fresh connection if the service was restarted
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    self._sock.sendall(payload)
+                    line = self._file.readline()
+                    if not line:
+                        raise ConnectionError("Inference service closed the connection")
+                    break
+                except (OSError, ConnectionError):
+                    self.close()
+                    if attempt:
+                        raise
+
+        response = json.loads(line.decode('utf-8'))
+        if not response.get('ok'):
+            raise RuntimeError(f"Inference service error: {response.get('error')}")
+        return response.get('result')
+
+    def ping(self):
+        """
+        Check whether the service is reachable
+
+        Returns:
+            bool: True if the service answered
+        """
+        try:
+            self.call('ping')
+            return True
+        except Exception:
+            return False
+
+
+class RemoteAnalyzer:
+    """Analyzer stand-in that forwards analysis to the inference service"""
+
+    def __init__(self, config, client):
+        """
+        Initialize the remote analyzer
+
+        Args:
+            config (Config): The application configuration
+            client (InferenceClient): Connected service client
+        """
+        self.config = config
+        self.client = client
+        self.categories = config.categories
+        self.category_keywords = config.category_keywords
+        self.model_available = client.call('ping').get('model_available', False)
+        self.offline_mode = False
+
+    def analyze_content(self, content, file_path):
+        """
+        Analyze file content in the service process
+
+        Args:
+            content (str): The extracted text content from the file
+            file_path (str): Path to the original file
+
+        Returns:
+            tuple: (category, new_name) for the file
+        """
+        # Documents are sent as their plain text
+        content = getattr(content, 'text', content)
+        category, new_name = self.client.call('analyze', content=content, file_path=file_path)
+        return category, new_name
+
+    def analyze_metadata(self, metadata, file_path):
+        """
+        Try to classify a file from its metadata in the service process
+
+        Args:
+            metadata (str): Metadata text of the file
+            file_path (str): Path to the original file
+
+        Returns:
+            tuple: (category, new_name), or None if the metadata is not decisive
+        """
+        result = self.client.call('analyze_metadata', metadata=metadata, file_path=file_path)
+        return tuple(result) if result else None
+
+    def get_cascade_stats(self):
+        """
+        Get how many files each classifier tier decided in the service process
+
+        Returns:
+            dict: Mapping of tier name to {'count', 'percentage'}
+        """
+        return self.client.call('stats')
+
+
+def connect_to_service(config):
+    """
+    Connect to a running inference service if there is one
+
+    Args:
+        config (Config): The application configuration
+
+    Returns:
+        InferenceClient: Connected client, or None if no service is running
+    """
+    if not SERVICE_AVAILABLE or not config.enable_inference_service:
+        return None
+
+    socket_path = get_socket_path(config)
+    if not os.path.exists(socket_path):
+        return None
+
+    client = InferenceClient(socket_path)
+    if client.ping():
+        return client
+    return None
@@ -0,0 +1,317 @@
+"""
+Static token-vector embedding backend distilled from a transformer model
+
+Every vocabulary token is run through the configured model once and its
+output vector is stored in a float16 table. Documents are then embedded as
+a weighted average of their tokens' vectors, which needs no forward pass and
+is orders of magnitude faster than running the transformer.
+
+Usage:
+    python -m magic_folder.static_embeddings distill [--config CONFIG] [--output DIR]
+    python -m magic_folder.static_embeddings compare [--config CONFIG] [--limit N]
+"""
+
+import os
+import json
+import time
+import argparse
+from types import SimpleNamespace
+import numpy as np
+from magic_folder.utils import log_activity, load_sample_texts
+
+# Only distilling runs the transformer; embedding with a distilled model
+# needs the tokenizer alone, so torch stays optional at runtime
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+    torch = None
+
+try:
+    from transformers import AutoTokenizer, AutoModel
+    TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    TRANSFORMERS_AVAILABLE = False
+    AutoTokenizer = None
+    AutoModel = None
+
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+    SentenceTransformer = None
+
+VECTORS_FILE = "token_vectors.npy"
+WEIGHTS_FILE = "token_weights.npy"
+METADATA_FILE = "static_model.json"
+
+# Smoothing constant of the SIF token weights a / (a + p(token))
+SIF_SMOOTHING = 1e-3
+
+
+def get_static_dir(config):
+    """
+    Get the directory holding the distilled static model
+
+    Args:
+        config (Config): The application configuration
+
+    Returns:
+        str: Path to the static model directory
+    """
+    return config.static_model_dir or os.path.join(config.base_dir, "static_embeddings")
+
+
+class StaticEmbeddingModel:
+    """Embeds text as a weighted average of precomputed token vectors"""
+
+    def __init__(self, model_dir):
+        """
+        Load a distilled static model
+
+        Args:
+            model_dir (str): Directory written by ``distill``
+        """
+        if not TRANSFORMERS_AVAILABLE:
+            raise ImportError("transformers is required for the static embedding tokenizer")
+
+        with open(os.path.join(model_dir, METADATA_FILE), 'r', encoding='utf-8') as f:
+            self.metadata = json.load(f)
+
+        # Memory-mapped so processes share the table and startup is instant
+        self.vectors = np.load(os.path.join(model_dir, VECTORS_FILE), mmap_mode='r')
+        self.weights = np.load(os.path.join(model_dir, WEIGHTS_FILE))
+        self._tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.source_model = self.metadata.get('source_model')
+
+    def _embed(self, text):
+        """Embed a single text"""
+        token_ids = np.asarray(
+            self._tokenizer(text, add_special_tokens=False, truncation=False, verbose=False)['input_ids'],
+            dtype=np.int64
+        )
+        if len(token_ids) == 0:
+            return np.zeros(self.vectors.shape[1], dtype=np.float32)
+
+        weights = self.weights[token_ids]
+        total = weights.sum()
+        if total <= 0:
+            return np.zeros(self.vectors.shape[1], dtype=np.float32)
+        return (weights @ self.vectors[token_ids].astype(np.float32)) / total
+
+    def encode(self, texts):
+        """
+        Embed one text or a list of texts
+
+        Args:
+            texts (str or list): Text(s) to embed
+
+        Returns:
+            np.ndarray: Embedding of shape (dim,) or (n, dim)
+        """
+        if isinstance(texts, str):
+            return self._embed(texts)
+        return np.stack([self._embed(text) for text in texts])
+
+
+def _load_reference_model(model_name):
+    """
+    Load the transformer to distill from
+
+    Args:
+        model_name (str): Name of the configured model
+
+    Returns:
+        tuple: (tokenizer, embed) where embed maps a padded batch to numpy vectors
+    """
+    if SENTENCE_TRANSFORMERS_AVAILABLE:
+        model = SentenceTransformer(model_name, device='cpu')
+        model.eval()
+
+        def embed(batch):
+            return model(dict(batch))['sentence_embedding'].numpy()
+        return model.tokenizer, embed
+
+    if not TRANSFORMERS_AVAILABLE:
+        raise ImportError("transformers or sentence-transformers is required to distill a static model")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+
+    def embed(batch):
+        hidden = model(**batch).last_hidden_state
+        mask = batch['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+        return ((hidden * mask).sum(dim=1) / mask.sum(dim=1)).numpy()
+    return tokenizer, embed
+
+
+def _token_weights(tokenizer, corpus):
+    """
+    Compute SIF weights from token frequencies in a corpus
+
+    Args:
+        tokenizer: The model tokenizer
+        corpus (list): Sample texts (may be empty)
+
+    Returns:
+        np.ndarray: Weight per vocabulary id
+    """
+    vocab_size = len(tokenizer)
+    counts = np.zeros(vocab_size, dtype=np.float64)
+    for text in corpus:
+        ids = tokenizer(text, add_special_tokens=False, truncation=False, verbose=False)['input_ids']
+        np.add.at(counts, np.asarray(ids, dtype=np.int64), 1)
+
+    if counts.sum() > 0:
+        weights = SIF_SMOOTHING / (SIF_SMOOTHING + counts / counts.sum())
+    else:
+        weights = np.ones(vocab_size)
+
+    # Special tokens never appear in encoded text but keep them neutral anyway
+    weights[tokenizer.all_special_ids] = 0.0
+    return weights.astype(np.float32)
+
+
+def distill(model_name, output_dir, corpus=(), batch_size=512):
+    """
+    Precompute a float16 vector for every vocabulary token
+
+    Args:
+        model_name (str): Name of the transformer model to distill
+        output_dir (str): Directory to write the static model to
+        corpus (list): Sample texts used to estimate token frequencies for weighting
+        batch_size (int): Number of tokens embedded per forward pass
+    """
+    if not TORCH_AVAILABLE:
+        raise ImportError("PyTorch is required to distill a static model")
+
+    tokenizer, embed = _load_reference_model(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    vocab_size = len(tokenizer)
+    table = None
+    start_time = time.time()
+
+    with torch.no_grad():
+        for start in range(0, vocab_size, batch_size):
+            ids = range(start, min(start + batch_size, vocab_size))
+            batch = tokenizer.pad(
+                {'input_ids': [tokenizer.build_inputs_with_special_tokens([token_id]) for token_id in ids]},
+                return_tensors="pt"
+            )
+            vectors = embed(batch)
+            if table is None:
+                table = np.lib.format.open_memmap(
+                    os.path.join(output_dir, VECTORS_FILE), mode='w+',
+                    dtype=np.float16, shape=(vocab_size, vectors.shape[1])
+                )
+            table[start:start + len(vectors)] = vectors.astype(np.float16)
+
+    table.flush()
+    np.save(os.path.join(output_dir, WEIGHTS_FILE), _token_weights(tokenizer, corpus))
+    tokenizer.save_pretrained(output_dir)
+
+    with open(os.path.join(output_dir, METADATA_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'source_model': model_name,
+            'vocab_size': vocab_size,
+            'dimension': int(table.shape[1]),
+            'corpus_documents': len(corpus)
+        }, f, indent=4)
+
+    log_activity(f"Distilled {vocab_size} token vectors from {model_name} in {time.time() - start_time:.0f}s")
+
+
+def compare_backends(reference_model, static_model, texts, categories, category_keywords):
+    """
+    Compare category decisions and throughput of two embedding backends
+
+    Args:
+        reference_model: Model with ``encode`` to compare against
+        static_model: Model with ``encode`` under test
+        texts (list): Sample documents
+        categories (list): Category names
+        category_keywords (dict): Keywords per category
+
+    Returns:
+        dict: Agreement rate, mean cosine similarity and documents per second
+    """
+    category_texts = [f"{c}: " + ", ".join(category_keywords.get(c, [])) for c in categories
+                      if category_keywords.get(c)]
+    labels = [c for c in categories if category_keywords.get(c)]
+
+    def run(model):
+        start = time.perf_counter()
+        documents = np.stack([np.asarray(model.encode(text), dtype=np.float32) for text in texts])
+        elapsed = time.perf_counter() - start
+        prototypes = np.stack([np.asarray(model.encode(text), dtype=np.float32) for text in category_texts])
+        documents /= np.maximum(np.linalg.norm(documents, axis=1, keepdims=True), 1e-12)
+        prototypes /= np.maximum(np.linalg.norm(prototypes, axis=1, keepdims=True), 1e-12)
+        return documents, np.argmax(documents @ prototypes.T, axis=1), elapsed
+
+    reference_vectors, reference_labels, reference_time = run(reference_model)
+    static_vectors, static_labels, static_time = run(static_model)
+
+    return {
+        'documents': len(texts),
+        'agreement': float(np.mean(reference_labels == static_labels)),
+        'mean_cosine': float(np.mean(np.sum(reference_vectors * static_vectors, axis=1))),
+        'reference_docs_per_second': len(texts) / max(reference_time, 1e-9),
+        'static_docs_per_second': len(texts) / max(static_time, 1e-9),
+        'disagreements': [
+            (texts[i][:60], labels[reference_labels[i]], labels[static_labels[i]])
+            for i in np.flatnonzero(reference_labels != static_labels)[:10]
+        ]
+    }
+
+
+def main():
+    """Command line entry point for distilling and evaluating static models"""
+    from magic_folder.config import Config
+    from magic_folder.analyzer import AIAnalyzer
+
+    parser = argparse.ArgumentParser(description="Magic Folder static embedding backend")
+    parser.add_argument("command", choices=["distill", "compare"])
+    parser.add_argument("--config", type=str, default=None, help="Path to custom configuration file")
+    parser.add_argument("--output", type=str, default=None, help="Static model directory (overrides config setting)")
+    parser.add_argument("--limit", type=int, default=500, help="Maximum number of sample documents")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    output_dir = args.output or get_static_dir(config)
+    texts = load_sample_texts(config, args.limit)
+
+    if args.command == "distill":
+        print(f"Distilling {config.model_name} into {output_dir} ({len(texts)} sample documents for weighting)")
+        distill(config.model_name, output_dir, corpus=texts)
+        return
+
+    if not texts:
+        print("No extracted documents found in the content cache to compare on.")
+        return
+
+    config.embedding_backend = "transformer"
+    reference = AIAnalyzer(config)
+    if not reference.model_available:
+        print("Reference model could not be loaded.")
+        return
+
+    # Wrap the analyzer so plain AutoModel backends are compared the same way
+    reference_model = SimpleNamespace(encode=reference._encode_text)
+    report = compare_backends(reference_model, StaticEmbeddingModel(output_dir),
+                              texts, config.categories, reference.category_keywords)
+
+    print(f"Documents compared:      {report['documents']}")
+    print(f"Category agreement:      {report['agreement'] * 100:.1f}%")
+    print(f"Mean cosine similarity:  {report['mean_cosine']:.3f}")
+    print(f"Transformer throughput:  {report['reference_docs_per_second']:.1f} docs/s")
+    print(f"Static throughput:       {report['static_docs_per_second']:.1f} docs/s")
+    for text, expected, got in report['disagreements']:
+        print(f"- {text!r}: {expected} -> {got}")
+
+
+if __name__ == "__main__":
+    main()
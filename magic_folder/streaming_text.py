@@ -0,0 +1,451 @@
+"""
+Bounded streaming text extraction for structured formats
+
+JSON, XML and HTML files are read in chunks and turned into text only until
+the sample budget is reached, so memory use follows the sample size rather
+than the file size and the rest of a large export is never read. Word,
+PowerPoint and EPUB files are zip archives of XML parts, which are streamed
+straight from the archive in reading order the same way.
+"""
+
+import io
+import re
+import zipfile
+import posixpath
+from urllib.parse import unquote
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+
+# Characters read per chunk
+CHUNK_SIZE = 64 * 1024
+
+# Longest JSON string or number kept in full; longer tokens are shortened
+MAX_JSON_TOKEN = 2048
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[\s{}\[\]:,"]')
+
+# HTML elements whose content is never shown as text
+HTML_SKIPPED_TAGS = ('script', 'style', 'noscript', 'template')
+
+# Slide parts of a presentation, numbered in creation order
+_SLIDE_PART = re.compile(r'^ppt/slides/slide(\d+)\.xml$')
+
+# Namespaces of the EPUB container and package documents
+EPUB_CONTAINER_NS = '{urn:oasis:names:tc:opendocument:xmlns:container}'
+EPUB_OPF_NS = '{http://www.idpf.org/2007/opf}'
+
+
+def iter_json_tokens(f, chunk_size=CHUNK_SIZE, max_token=MAX_JSON_TOKEN):
+    """
+    Split JSON text into tokens without parsing the whole document
+
+    Args:
+        f: Text file object
+        chunk_size (int): Characters read at a time
+        max_token (int): Longest string or scalar returned in full
+
+    Yields:
+        str: Structural characters, quoted strings (as written in the file)
+            and scalars such as numbers, true, false and null
+    """
+    chunk = f.read(chunk_size)
+    pos = 0
+    while chunk:
+        if pos >= len(chunk):
+            chunk = f.read(chunk_size)
+            pos = 0
+            continue
+
+        char = chunk[pos]
+        if char.isspace():
+            pos += 1
+        elif char in '{}[]:,':
+            pos += 1
+            yield char
+        elif char == '"':
+            # Scan to the closing quote, skipping escaped characters
+            parts = ['"']
+            length = 1
+            escaped = False
+            pos += 1
+            while True:
+                if pos >= len(chunk):
+                    chunk = f.read(chunk_size)
+                    pos = 0
+                    if not chunk:
+                        break
+                closing = False
+                if escaped:
+                    end = pos + 1
+                    escaped = False
+                else:
+                    match = _STRING_SPECIAL.search(chunk, pos)
+                    end = match.end() if match else len(chunk)
+                    if match:
+                        closing = match.group() == '"'
+                        escaped = not closing
+                piece = chunk[pos:end]
+                pos = end
+                if length < max_token:
+                    parts.append(piece[:max_token - length])
+                length += len(piece)
+                if closing:
+                    break
+            if length > max_token:
+                parts.append('..."')
+            yield ''.join(parts)
+        else:
+            parts = []
+            length = 0
+            while True:
+                match = _SCALAR_END.search(chunk, pos)
+                end = match.start() if match else len(chunk)
+                if length < max_token:
+                    parts.append(chunk[pos:end][:max_token - length])
+                length += end - pos
+                pos = end
+                if match:
+                    break
+                chunk = f.read(chunk_size)
+                pos = 0
+                if not chunk:
+                    break
+            yield ''.join(parts)
+
+
+def sample_json(f, max_chars, indent=2):
+    """
+    Pretty-print the beginning of a JSON document
+
+    The output matches ``json.dumps(data, indent=2)`` for the part that is
+    read, except that strings are kept as written in the file.
+
+    Args:
+        f: Text file object
+        max_chars (int): Length of the sample
+        indent (int): Spaces per nesting level
+
+    Returns:
+        str: At most ``max_chars`` characters of indented JSON
+    """
+    parts = []
+    length = 0
+    depth = 0
+    after_open = False
+
+    for token in iter_json_tokens(f):
+        if token in '}]':
+            depth = max(0, depth - 1)
+            # Empty containers stay on one line
+            text = token if after_open else '\n' + ' ' * (indent * depth) + token
+            after_open = False
+        else:
+            prefix = '\n' + ' ' * (indent * depth) if after_open else ''
+            after_open = False
+            if token in '{[':
+                text = prefix + token
+                depth += 1
+                after_open = True
+            elif token == ',':
+                text = ',\n' + ' ' * (indent * depth)
+            elif token == ':':
+                text = ': '
+            else:
+                text = prefix + token
+
+        parts.append(text)
+        length += len(text)
+        if length >= max_chars:
+            break
+
+    return ''.join(parts)[:max_chars]
+
+
+class _TextCollector:
+    """Collects element text in document order until the budget is reached"""
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.parts = []
+        self.length = 0
+
+    @property
+    def full(self):
+        return self.length >= self.max_chars
+
+    def add(self, data):
+        text = ' '.join(data.split())
+        if text and not self.full:
+            self.parts.append(text)
+            self.length += len(text) + 1
+
+    def text(self):
+        return '\n'.join(self.parts)[:self.max_chars]
+
+
+class _XMLTextTarget(_TextCollector):
+    """ElementTree parser target that keeps only text, never building a tree"""
+
+    def start(self, tag, attrib):
+        pass
+
+    def end(self, tag):
+        pass
+
+    def data(self, data):
+        self.add(data)
+
+    def close(self):
+        return self.text()
+
+
+class _OoxmlTextTarget(_TextCollector):
+    """Parser target that joins the text runs of Word and DrawingML paragraphs"""
+
+    def __init__(self, max_chars):
+        super().__init__(max_chars)
+        self.paragraph = []
+        self.in_text = False
+
+    def start(self, tag, attrib):
+        # Word (w:) and slide (a:) markup share the local names
+        name = tag.rpartition('}')[2]
+        if name == 't':
+            self.in_text = True
+        elif name in ('tab', 'br'):
+            self.paragraph.append(' ')
+
+    def end(self, tag):
+        name = tag.rpartition('}')[2]
+        if name == 't':
+            self.in_text = False
+        elif name == 'p':
+            self.add(''.join(self.paragraph))
+            self.paragraph = []
+
+    def data(self, data):
+        if self.in_text:
+            self.paragraph.append(data)
+
+    def close(self):
+        return self.text()
+
+
+class _HTMLTextParser(HTMLParser):
+    """HTML parser that keeps visible text"""
+
+    def __init__(self, collector, skipped_tags=HTML_SKIPPED_TAGS):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+        self.skipped_tags = skipped_tags
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.skipped_tags:
+            self.skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.skipped_tags and self.skipping:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.collector.add(data)
+
+
+def sample_xml(f, max_chars, chunk_size=CHUNK_SIZE):
+    """
+    Collect the text content of an XML document until the budget is reached
+
+    Args:
+        f: Binary file object (the parser honours the declared encoding)
+        max_chars (int): Length of the sample
+        chunk_size (int): Bytes fed to the parser at a time
+
+    Returns:
+        str: Text of the elements in document order, one piece per line
+
+    Raises:
+        ElementTree.ParseError: If the document is malformed before any text was found
+    """
+    target = _XMLTextTarget(max_chars)
+    try:
+        _feed(ElementTree.XMLParser(target=target), f, target, chunk_size)
+    except ElementTree.ParseError:
+        if not target.parts:
+            raise
+    return target.text()
+
+
+def sample_html(f, max_chars, chunk_size=CHUNK_SIZE):
+    """
+    Collect the visible text of an HTML document until the budget is reached
+
+    Args:
+        f: Text file object
+        max_chars (int): Length of the sample
+        chunk_size (int): Characters fed to the parser at a time
+
+    Returns:
+        str: Visible text in document order, one piece per line
+    """
+    collector = _TextCollector(max_chars)
+    _feed(_HTMLTextParser(collector), f, collector, chunk_size)
+    return collector.text()
+
+
+def _feed(parser, f, collector, chunk_size):
+    """Feed a file to a parser in chunks until the collector is full"""
+    while not collector.full:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        parser.feed(chunk)
+
+
+def _sample_ooxml_parts(archive, names, max_chars, chunk_size):
+    """Collect paragraph text from XML parts of an Office archive in order"""
+    target = _OoxmlTextTarget(max_chars)
+    for name in names:
+        if target.full:
+            break
+        with archive.open(name) as f:
+            _feed(ElementTree.XMLParser(target=target), f, target, chunk_size)
+    return target.text()
+
+
+def sample_docx(file_path, max_chars, chunk_size=CHUNK_SIZE):
+    """
+    Collect the paragraphs of a Word document until the budget is reached
+
+    Args:
+        file_path (str): Path to the .docx file
+        max_chars (int): Length of the sample
+        chunk_size (int): Bytes of word/document.xml fed to the parser at a time
+
+    Returns:
+        str: Paragraph text in reading order, one paragraph per line
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        return _sample_ooxml_parts(archive, ['word/document.xml'], max_chars, chunk_size)
+
+
+def slide_parts(archive):
+    """
+    List the slide parts of a presentation in slide number order
+
+    Args:
+        archive (zipfile.ZipFile): The open .pptx archive
+
+    Returns:
+        list: Part names such as 'ppt/slides/slide1.xml'
+    """
+    slides = []
+    for name in archive.namelist():
+        match = _SLIDE_PART.match(name)
+        if match:
+            slides.append((int(match.group(1)), name))
+    return [name for _, name in sorted(slides)]
+
+
+def sample_pptx(file_path, max_chars, chunk_size=CHUNK_SIZE):
+    """
+    Collect the text of the first slides of a presentation until the budget is reached
+
+    Args:
+        file_path (str): Path to the .pptx file
+        max_chars (int): Length of the sample
+        chunk_size (int): Bytes of slide XML fed to the parser at a time
+
+    Returns:
+        str: Slide paragraphs in order, one paragraph per line
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        return _sample_ooxml_parts(archive, slide_parts(archive), max_chars, chunk_size)
+
+
+def epub_spine(archive):
+    """
+    List the content documents of an EPUB in reading order
+
+    Args:
+        archive (zipfile.ZipFile): The open .epub archive
+
+    Returns:
+        list: Archive member names of the linear spine items
+    """
+    container = ElementTree.fromstring(archive.read('META-INF/container.xml'))
+    rootfile = container.find(f'.//{EPUB_CONTAINER_NS}rootfile')
+    if rootfile is None or not rootfile.get('full-path'):
+        return []
+
+    package_path = rootfile.get('full-path')
+    package = ElementTree.fromstring(archive.read(package_path))
+    base = posixpath.dirname(package_path)
+    manifest = {item.get('id'): item.get('href') for item in package.iter(f'{EPUB_OPF_NS}item')}
+    members = set(archive.namelist())
+
+    spine = []
+    for itemref in package.iter(f'{EPUB_OPF_NS}itemref'):
+        href = manifest.get(itemref.get('idref'))
+        if not href or itemref.get('linear') == 'no':
+            continue
+        name = posixpath.normpath(posixpath.join(base, unquote(href)))
+        if name in members:
+            spine.append(name)
+    return spine
+
+
+def _sample_chapters(archive, spine, start, max_chars, chunk_size):
+    """Collect chapter text from a spine position on; returns the text and the last chapter read"""
+    collector = _TextCollector(max_chars)
+    index = start
+    for index in range(start, len(spine)):
+        with archive.open(spine[index]) as f:
+            text = io.TextIOWrapper(f, encoding='utf-8', errors='ignore')
+            # The head only repeats the book title in every chapter
+            parser = _HTMLTextParser(collector, HTML_SKIPPED_TAGS + ('head',))
+            _feed(parser, text, collector, chunk_size)
+        if collector.full:
+            break
+    return collector.text(), index
+
+
+def sample_epub(file_path, max_chars, chunk_size=CHUNK_SIZE):
+    """
+    Sample the beginning and the middle of an EPUB book
+
+    Chapters are read from the archive in spine order until half the budget
+    is filled. The middle sample starts at the chapter holding the middle of
+    the book by size, so the chapters in between are never read.
+
+    Args:
+        file_path (str): Path to the .epub file
+        max_chars (int): Combined length of both samples
+        chunk_size (int): Characters fed to the parser at a time
+
+    Returns:
+        dict: 'beginning' and 'middle' text; 'middle' is empty if the
+            beginning already reached the middle of the book
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        spine = epub_spine(archive)
+        if not spine:
+            return {'beginning': "", 'middle': ""}
+
+        budget = max_chars // 2
+        beginning, last_read = _sample_chapters(archive, spine, 0, budget, chunk_size)
+
+        sizes = [archive.getinfo(name).file_size for name in spine]
+        halfway = sum(sizes) / 2
+        running = 0
+        for middle_index, size in enumerate(sizes):
+            running += size
+            if running >= halfway:
+                break
+
+        middle = ""
+        if middle_index > last_read:
+            middle, _ = _sample_chapters(archive, spine, middle_index, budget, chunk_size)
+    return {'beginning': beginning, 'middle': middle}
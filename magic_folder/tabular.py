@@ -0,0 +1,139 @@
+"""
+Constant-memory sampling of tabular files
+
+Classification only needs a header and a handful of rows, so CSV files are
+read line by line up to the rows needed, with optional extra rows picked by
+seeking to random byte offsets instead of parsing the whole file. Excel
+workbooks are opened once in openpyxl's read-only mode, which streams rows
+from the sheet XML without loading the workbook.
+"""
+
+import os
+import csv
+import random
+from itertools import islice
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+    openpyxl = None
+
+# Workbook formats openpyxl can stream
+OPENPYXL_EXTENSIONS = ('.xlsx', '.xlsm')
+
+# Bytes inspected to detect the CSV dialect
+SNIFF_BYTES = 64 * 1024
+
+# Delimiters the dialect sniffer may choose from
+CSV_DELIMITERS = ',;\t|'
+
+
+def sniff_dialect(sample):
+    """
+    Detect the dialect of a CSV sample
+
+    Args:
+        sample (str): The beginning of the file
+
+    Returns:
+        csv.Dialect: The detected dialect, or the Excel dialect if detection fails
+    """
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+    except csv.Error:
+        return csv.excel
+
+
+def _decoded_lines(binary_file):
+    """Yield decoded lines while keeping the binary file position usable"""
+    for line in iter(binary_file.readline, b''):
+        yield line.decode('utf-8', errors='ignore')
+
+
+def sample_csv(file_path, head_rows=10, spread_rows=0):
+    """
+    Read the header, the first rows and optionally rows from across a CSV file
+
+    Args:
+        file_path (str): Path to the CSV file
+        head_rows (int): Data rows to read after the header
+        spread_rows (int): Extra rows read from random offsets in the rest of the file
+
+    Returns:
+        dict: 'header' (list), 'rows' (list of lists), 'spread' (list of lists)
+            and 'delimiter' (str)
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(SNIFF_BYTES).decode('utf-8', errors='ignore')
+        dialect = sniff_dialect(sample)
+        f.seek(0)
+
+        reader = csv.reader(_decoded_lines(f), dialect)
+        header = next(reader, [])
+        rows = list(islice(reader, head_rows))
+        head_end = f.tell()
+
+        spread = []
+        size = os.fstat(f.fileno()).st_size
+        if spread_rows > 0 and size > head_end:
+            # Seeded by size so the same file always yields the same sample
+            generator = random.Random(size)
+            offsets = sorted(generator.randrange(head_end, size) for _ in range(spread_rows))
+            seen = set()
+            for offset in offsets:
+                f.seek(offset)
+                f.readline()  # Skip the partial line the offset landed in
+                start = f.tell()
+                line = f.readline()
+                if not line.strip() or start in seen:
+                    continue
+                seen.add(start)
+                spread.extend(csv.reader([line.decode('utf-8', errors='ignore')], dialect))
+
+    return {'header': header, 'rows': rows, 'spread': spread, 'delimiter': dialect.delimiter}
+
+
+def _cell_text(value):
+    """Format a cell value for the text sample"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def sample_workbook(file_path, max_sheets=3, max_rows=6):
+    """
+    Read the sheet names and the first rows of the first sheets of a workbook
+
+    Args:
+        file_path (str): Path to the .xlsx or .xlsm file
+        max_sheets (int): Number of sheets to sample
+        max_rows (int): Rows read per sheet, including any header row
+
+    Returns:
+        dict: 'sheets' (all sheet names) and 'samples', a list of
+            (sheet name, rows) tuples where each row is a list of strings
+    """
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        samples = []
+        for sheet in workbook.worksheets[:max_sheets]:
+            if not hasattr(sheet, 'iter_rows'):
+                # Chart sheets have no cells
+                continue
+            rows = []
+            for values in sheet.iter_rows(max_row=max_rows, values_only=True):
+                row = [_cell_text(value) for value in values]
+                # Read-only sheets pad rows to the sheet width
+                while row and not row[-1]:
+                    row.pop()
+                if row:
+                    rows.append(row)
+            samples.append((sheet.title, rows))
+        return {'sheets': list(workbook.sheetnames), 'samples': samples}
+    finally:
+        # Read-only workbooks keep the archive open until closed
+        workbook.close()
@@ -0,0 +1,85 @@
+"""
+Persistent store of extracted document texts for Magic Folder
+
+The in-memory content cache only keeps the most recent extractions, so the
+text of every organized file is also kept here, keyed by the file's content
+hash. Re-sorting the organized tree then rescores files without extracting
+(or OCRing) them again.
+"""
+
+import os
+import zlib
+import sqlite3
+from magic_folder.utils import log_activity
+
+class DocumentTextStore:
+    """Compressed extracted texts in a SQLite database, keyed by file hash"""
+
+    def __init__(self, config):
+        """
+        Initialize the text store
+
+        Args:
+            config (Config): The application configuration
+        """
+        self.db_path = os.path.join(config.base_dir, "document_texts.db")
+        self._init_database()
+
+    def _init_database(self):
+        """Initialize the database for storing document texts"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS document_texts (
+                    hash TEXT PRIMARY KEY,
+                    text BLOB
+                )
+            ''')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            log_activity(f"Error initializing document text store: {e}")
+
+    def get(self, file_hash):
+        """
+        Look up the extracted text of a file
+
+        Args:
+            file_hash (str): Content hash of the file
+
+        Returns:
+            str: The stored text, or None if the file was never extracted
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                row = conn.execute("SELECT text FROM document_texts WHERE hash = ?", (file_hash,)).fetchone()
+            finally:
+                conn.close()
+        except Exception as e:
+            log_activity(f"Error reading document text store: {e}")
+            return None
+        if row is None:
+            return None
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def put(self, file_hash, text):
+        """
+        Store the extracted text of a file
+
+        Args:
+            file_hash (str): Content hash of the file
+            text (str): The extracted text
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO document_texts (hash, text) VALUES (?, ?)",
+                    (file_hash, zlib.compress(text.encode('utf-8'), 1))
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            log_activity(f"Error writing document text store: {e}")
@@ -3,6 +3,8 @@ Utility functions for Magic Folder
 """
 
 import os
+import pickle
+import functools
 from datetime import datetime
 import logging
 
@@ -84,6 +86,22 @@ def log_activity(message):
         log_entry = f"[{timestamp}] {message}"
         print(log_entry)
 
+def synchronized(method):
+    """
+    Run a method while holding its instance's ``lock``
+    
+    Args:
+        method (callable): The method to guard
+        
+    Returns:
+        callable: The wrapped method
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 def get_file_size_str(size_bytes):
     """
     Convert file size in bytes to a human-readable string
@@ -103,6 +121,25 @@ def get_file_size_str(size_bytes):
         size_bytes /= 1024.0
     return f"{size_bytes:.2f} PB"
 
+def load_sample_texts(config, limit):
+    """
+    Load previously extracted document texts from the content cache
+    
+    Args:
+        config (Config): The application configuration
+        limit (int): Maximum number of texts to return
+        
+    Returns:
+        list: Extracted document texts
+    """
+    cache_file = os.path.join(config.base_dir, "content_cache.pkl")
+    if not os.path.exists(cache_file):
+        return []
+    with open(cache_file, 'rb') as f:
+        cache = pickle.load(f)
+    texts = [text for text in cache.values() if isinstance(text, str) and text.strip()]
+    return texts[:limit]
+
 def is_temp_file(filename, excluded_extensions, excluded_files):
     """
     Check if a file is a temporary file
@@ -151,6 +188,45 @@ def validate_config_values(config):
     if config.sample_length <= 0:
         errors.append("Sample length must be positive")
     
+    if config.max_document_tokens <= 0:
+        errors.append("Maximum document tokens must be positive")
+    
+    if config.chunk_pooling not in ("mean", "max", "attention"):
+        errors.append("Chunk pooling must be one of: mean, max, attention")
+    
+    if config.embedding_backend not in ("transformer", "static"):
+        errors.append("Embedding backend must be one of: transformer, static")
+    
+    if config.inference_replicas < 1:
+        errors.append("Inference replicas must be at least 1")
+    
+    if config.inference_threads < 0 or config.inference_interop_threads < 0:
+        errors.append("Inference thread counts cannot be negative")
+    
+    if config.pdf_backend not in ("auto", "pypdfium2", "pdftotext", "pypdf2"):
+        errors.append("PDF backend must be one of: auto, pypdfium2, pdftotext, pypdf2")
+    
+    if config.csv_spread_rows < 0:
+        errors.append("CSV spread rows cannot be negative")
+    
+    if not 0 <= config.ocr_text_threshold <= 1:
+        errors.append("OCR text threshold must be between 0 and 1")
+    
+    if config.ocr_target_dpi <= 0:
+        errors.append("OCR target DPI must be positive")
+    
+    if config.ocr_workers < 1:
+        errors.append("OCR workers must be at least 1")
+    
+    if config.ocr_pdf_pages < 1:
+        errors.append("OCR PDF pages must be at least 1")
+    
+    if config.ocr_cache_distance < 0:
+        errors.append("OCR cache distance cannot be negative")
+    
+    if config.learned_state_save_interval < 0:
+        errors.append("Learned state save interval cannot be negative")
+    
     # Validate processing settings
     if config.processing_delay < 0:
         errors.append("Processing delay cannot be negative")
@@ -0,0 +1,467 @@
+"""
+Nearest-neighbour index over embeddings of previously classified documents
+"""
+
+import os
+import numpy as np
+from magic_folder.utils import log_activity
+from magic_folder.embedding_store import VECTOR_DTYPE, save_vectors, load_vectors
+
+# Documents needed before a PCA projection is fitted
+PCA_MIN_DOCUMENTS = 1000
+
+# Stored float16 vectors are converted to float32 this many rows at a time
+SCAN_BLOCK = 16384
+
+
+def _normalize(vectors):
+    """Scale vectors to unit length so that dot products are cosine similarities"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorIndex:
+    """
+    Cosine-similarity kNN index backed by a contiguous numpy array
+
+    With IVF partitioning enabled (``nlist > 0``) the vectors are clustered
+    with spherical k-means and stored sorted by cluster, so a query only
+    scans the ``nprobe`` closest clusters as contiguous slices. Vectors added
+    after the last rebuild are assigned to their nearest cluster on arrival
+    and kept in a per-cluster buffer, so a query only scans the buffered
+    vectors of the clusters it probes. The lists are re-sorted once the
+    buffers hold as many vectors as the sorted part, which keeps the cost of
+    re-sorting amortized over the additions.
+
+    Vectors are kept in float16. With ``pca_dims > 0`` they are also
+    projected onto their top principal directions once enough documents
+    have been added.
+    """
+
+    def __init__(self, nlist=0, nprobe=8, pca_dims=0):
+        """
+        Initialize an empty index
+
+        Args:
+            nlist (int): Number of IVF clusters (0 for exact search)
+            nprobe (int): Number of clusters scanned per query
+            pca_dims (int): Dimensions to reduce vectors to (0 keeps them as is)
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pca_dims = pca_dims
+        self.components = None
+        self.keys = []
+        self.labels = []
+        self.key_positions = {}
+        self._vectors = None
+        self._weights = np.empty(0, dtype=np.float32)
+        self._size = 0
+
+        # IVF state
+        self.centroids = None
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._list_offsets = None
+        self._sorted_size = 0
+        # Positions of unsorted vectors, per cluster
+        self._pending = []
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        return key in self.key_positions
+
+    @property
+    def vectors(self):
+        """Stored unit-length vectors (float16, in the reduced space if PCA is active)"""
+        if self._vectors is None:
+            return np.empty((0, 0), dtype=VECTOR_DTYPE)
+        return self._vectors[:self._size]
+
+    def _project(self, vectors):
+        """Map embeddings into the stored space as unit-length vectors"""
+        vectors = _normalize(vectors)
+        if self.components is None:
+            return vectors
+        return _normalize(vectors @ self.components.T)
+
+    def _scores(self, start, end, query):
+        """Cosine similarity of stored rows [start, end) to a projected query"""
+        if end - start <= SCAN_BLOCK:
+            return self._vectors[start:end].astype(np.float32) @ query
+        return np.concatenate([
+            self._vectors[i:min(i + SCAN_BLOCK, end)].astype(np.float32) @ query
+            for i in range(start, end, SCAN_BLOCK)
+        ])
+
+    def get(self, key):
+        """
+        Get the stored unit-length vector of a document
+
+        Args:
+            key (str): Document key
+
+        Returns:
+            np.ndarray: The stored vector in the original embedding space, or
+                None if the key is unknown
+        """
+        position = self.key_positions.get(key)
+        if position is None:
+            return None
+        vector = self._vectors[position].astype(np.float32)
+        if self.components is not None:
+            # Approximate reconstruction from the principal directions
+            vector = _normalize(vector @ self.components)
+        return vector
+
+    def entry(self, key):
+        """
+        Get the label and vote weight stored for a document
+
+        Args:
+            key (str): Document key
+
+        Returns:
+            tuple: (label, weight), or None if the key is unknown
+        """
+        position = self.key_positions.get(key)
+        if position is None:
+            return None
+        return self.labels[position], float(self._weights[position])
+
+    def _reserve(self, dim, count):
+        """Grow the backing arrays so ``count`` more vectors fit"""
+        needed = self._size + count
+        if self._vectors is None:
+            capacity = max(1024, needed)
+            self._vectors = np.empty((capacity, dim), dtype=VECTOR_DTYPE)
+            self._weights = np.empty(capacity, dtype=np.float32)
+            self._assignments = np.zeros(capacity, dtype=np.int32)
+        elif needed > len(self._vectors):
+            capacity = max(needed, len(self._vectors) * 2)
+            for name in ('_vectors', '_weights', '_assignments'):
+                old = getattr(self, name)
+                grown = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+                grown[:self._size] = old[:self._size]
+                setattr(self, name, grown)
+
+    def add(self, key, vector, label, weight=1.0):
+        """
+        Add a document embedding, or relabel it if the key is already stored
+
+        Args:
+            key (str): Unique document key
+            vector (np.ndarray): Document embedding
+            label (str): Category of the document
+            weight (float): Vote weight (e.g. higher for user corrections)
+        """
+        position = self.key_positions.get(key)
+        if position is not None:
+            self.labels[position] = label
+            self._weights[position] = max(self._weights[position], weight)
+            return
+
+        vector = self._project(vector).ravel()
+        if self._vectors is not None and vector.shape[0] != self._vectors.shape[1]:
+            raise ValueError(f"Vector dimension {vector.shape[0]} does not match index dimension {self._vectors.shape[1]}")
+
+        self._reserve(vector.shape[0], 1)
+        self._vectors[self._size] = vector
+        self._weights[self._size] = weight
+        self.keys.append(key)
+        self.labels.append(label)
+        self.key_positions[key] = self._size
+        self._size += 1
+
+        if self.pca_dims > 0 and self.components is None and self._size >= max(PCA_MIN_DOCUMENTS, 4 * self.pca_dims):
+            self.reduce_dimensions()
+
+        if self.nlist > 0:
+            if self.centroids is None:
+                # Enough points per cluster for k-means to be meaningful
+                if self._size >= 39 * self.nlist:
+                    self.train()
+            elif self._sorted_size == self._size:
+                # Already placed when reduce_dimensions re-clustered the index
+                return
+            elif self._size - self._sorted_size > max(1000, self._sorted_size):
+                self._rebuild_lists()
+            else:
+                position = self._size - 1
+                list_id = int(np.argmax(self.centroids @ self._vectors[position].astype(np.float32)))
+                self._assignments[position] = list_id
+                self._pending[list_id].append(position)
+
+    def reduce_dimensions(self, sample_size=20000, seed=0):
+        """
+        Project all stored vectors onto their top ``pca_dims`` principal directions
+
+        The projection is uncentered so that dot products, and therefore the
+        cosine ranking, are preserved as far as possible.
+
+        Args:
+            sample_size (int): Maximum number of vectors used to fit the projection
+            seed (int): Random seed for sampling
+        """
+        dim = self._vectors.shape[1]
+        if self.pca_dims <= 0 or self.pca_dims >= dim or self.components is not None:
+            return
+
+        rng = np.random.default_rng(seed)
+        sample = self.vectors[rng.choice(self._size, min(self._size, sample_size), replace=False)]
+        _, _, components = np.linalg.svd(sample.astype(np.float32), full_matrices=False)
+        self.components = components[:self.pca_dims].astype(np.float32)
+
+        reduced = np.empty((len(self._vectors), self.pca_dims), dtype=VECTOR_DTYPE)
+        for start in range(0, self._size, SCAN_BLOCK):
+            end = min(start + SCAN_BLOCK, self._size)
+            reduced[start:end] = _normalize(self._vectors[start:end].astype(np.float32) @ self.components.T)
+        self._vectors = reduced
+
+        # Cluster centroids lived in the old space
+        if self.centroids is not None:
+            self.centroids = None
+            self._sorted_size = 0
+            self.train()
+        log_activity(f"Reduced document index from {dim} to {self.pca_dims} dimensions")
+
+    def train(self, iterations=8, seed=0):
+        """
+        Cluster the stored vectors into IVF lists with spherical k-means
+
+        Args:
+            iterations (int): Number of k-means iterations
+            seed (int): Random seed for sampling and initialization
+        """
+        if self.nlist <= 0 or self._size < self.nlist:
+            return
+
+        rng = np.random.default_rng(seed)
+        vectors = self.vectors
+        sample_size = min(self._size, 64 * self.nlist)
+        sample = vectors[rng.choice(self._size, sample_size, replace=False)].astype(np.float32)
+        centroids = sample[rng.choice(sample_size, self.nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            empty = np.bincount(assignments, minlength=self.nlist) == 0
+            # Re-seed empty clusters so every list stays usable
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        self.centroids = centroids
+        self._sorted_size = 0
+        self._rebuild_lists()
+        log_activity(f"Built IVF index with {self.nlist} lists over {self._size} documents")
+
+    def _assign(self, vectors, batch_size=65536):
+        """Find the nearest centroid of each vector"""
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch_size):
+            batch = vectors[start:start + batch_size].astype(np.float32)
+            assignments[start:start + batch_size] = np.argmax(batch @ self.centroids.T, axis=1)
+        return assignments
+
+    def _rebuild_lists(self):
+        """Assign the unsorted tail to clusters and re-sort all vectors by cluster"""
+        size = self._size
+        tail = slice(self._sorted_size, size)
+        self._assignments[tail] = self._assign(self._vectors[tail])
+
+        order = np.argsort(self._assignments[:size], kind='stable')
+        self._vectors[:size] = self._vectors[order]
+        self._weights[:size] = self._weights[order]
+        self._assignments[:size] = self._assignments[order]
+        self.keys = [self.keys[i] for i in order]
+        self.labels = [self.labels[i] for i in order]
+        self.key_positions = {key: i for i, key in enumerate(self.keys)}
+
+        self._list_offsets = np.searchsorted(self._assignments[:size], np.arange(self.nlist + 1))
+        self._sorted_size = size
+        self._pending = [[] for _ in range(self.nlist)]
+
+    def _index_pending(self):
+        """Assign the unsorted tail to clusters and fill the per-cluster buffers"""
+        tail = slice(self._sorted_size, self._size)
+        self._assignments[tail] = self._assign(self._vectors[tail])
+        self._pending = [[] for _ in range(self.nlist)]
+        for position in range(self._sorted_size, self._size):
+            self._pending[self._assignments[position]].append(position)
+
+    def search(self, vector, k=5):
+        """
+        Find the stored documents most similar to a vector
+
+        Args:
+            vector (np.ndarray): Query embedding
+            k (int): Number of neighbours to return
+
+        Returns:
+            list: (key, label, similarity) tuples, most similar first
+        """
+        if self._size == 0:
+            return []
+
+        query = self._project(vector).ravel()
+
+        if self.centroids is None:
+            candidates = np.arange(self._size)
+            scores = self._scores(0, self._size, query)
+        else:
+            probe = min(self.nprobe, self.nlist)
+            nearest_lists = np.argpartition(-(self.centroids @ query), probe - 1)[:probe]
+            id_parts, score_parts = [], []
+            for list_id in nearest_lists:
+                start, end = self._list_offsets[list_id], self._list_offsets[list_id + 1]
+                if end > start:
+                    id_parts.append(np.arange(start, end))
+                    score_parts.append(self._scores(start, end, query))
+                if self._pending[list_id]:
+                    positions = np.array(self._pending[list_id])
+                    id_parts.append(positions)
+                    score_parts.append(self._vectors[positions].astype(np.float32) @ query)
+            if not id_parts:
+                return []
+            candidates = np.concatenate(id_parts)
+            scores = np.concatenate(score_parts)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.keys[candidates[i]], self.labels[candidates[i]], float(scores[i])) for i in top]
+
+    def vote(self, vector, k=5):
+        """
+        Classify a vector by a similarity-weighted vote of its neighbours
+
+        Args:
+            vector (np.ndarray): Query embedding
+            k (int): Number of neighbours that vote
+
+        Returns:
+            tuple: (label, agreement) where agreement is the winning share of
+                the vote in [0, 1], or (None, 0.0) if the index is empty
+        """
+        votes = {}
+        for key, label, similarity in self.search(vector, k):
+            weight = self._weights[self.key_positions[key]] * max(similarity, 0.0)
+            votes[label] = votes.get(label, 0.0) + weight
+
+        total = sum(votes.values())
+        if not votes or total <= 0:
+            return None, 0.0
+        label, weight = max(votes.items(), key=lambda x: x[1])
+        return label, weight / total
+
+    @staticmethod
+    def vectors_path(path):
+        """Path of the float16 vector file that belongs to an index file"""
+        return os.path.splitext(path)[0] + ".vectors.npy"
+
+    def snapshot(self):
+        """
+        Copy the state that ``write`` stores
+
+        Taking a snapshot is a memory copy, so the slow disk write can happen
+        while the index keeps changing.
+
+        Returns:
+            dict: Arrays to pass to ``write``
+        """
+        if os.name == 'nt' and isinstance(self._vectors, np.memmap):
+            # Windows cannot replace a file that is still mapped
+            self._vectors = np.array(self._vectors)
+
+        label_names = sorted(set(self.labels))
+        label_codes = {label: i for i, label in enumerate(label_names)}
+        return {
+            'vectors': np.array(self.vectors),
+            'weights': self._weights[:self._size].copy(),
+            'assignments': self._assignments[:self._size].copy(),
+            'keys': np.array(self.keys, dtype=bytes),
+            'label_names': np.array(label_names, dtype=str),
+            'label_codes': np.array([label_codes[label] for label in self.labels], dtype=np.int32),
+            # Centroids and components are replaced, never updated in place
+            'centroids': self.centroids if self.centroids is not None else np.empty((0, 0), dtype=np.float32),
+            'components': self.components if self.components is not None else np.empty((0, 0), dtype=np.float32),
+            'sorted_size': np.array(self._sorted_size)
+        }
+
+    @classmethod
+    def write(cls, state, path):
+        """
+        Write a snapshot to disk
+
+        The vectors go to a float16 .npy file next to ``path``; keys, labels
+        and clustering state go to ``path`` itself.
+
+        Args:
+            state (dict): State returned by ``snapshot``
+            path (str): Path to the .npz index file
+        """
+        arrays = dict(state)
+        save_vectors(cls.vectors_path(path), arrays.pop('vectors'))
+        temp_path = path + ".tmp.npz"
+        np.savez(temp_path, **arrays)
+        os.replace(temp_path, path)
+
+    def save(self, path):
+        """
+        Save the index to disk
+
+        Args:
+            path (str): Path to the .npz index file
+        """
+        self.write(self.snapshot(), path)
+
+    @classmethod
+    def load(cls, path, nlist=0, nprobe=8, pca_dims=0):
+        """
+        Load an index from disk
+
+        Args:
+            path (str): Path to the .npz index file
+            nlist (int): Number of IVF clusters (0 for exact search)
+            nprobe (int): Number of clusters scanned per query
+            pca_dims (int): Dimensions to reduce vectors to (0 keeps them as is)
+
+        Returns:
+            VectorIndex: The loaded index
+        """
+        index = cls(nlist=nlist, nprobe=nprobe, pca_dims=pca_dims)
+        with np.load(path) as data:
+            size = len(data['keys'])
+            if size == 0:
+                return index
+            if 'vectors' in data:
+                # Indexes saved before vectors moved to their own float16 file
+                index._vectors = data['vectors'].astype(VECTOR_DTYPE)
+                index.labels = data['labels'].tolist()
+            else:
+                index._vectors = load_vectors(cls.vectors_path(path))
+                label_names = data['label_names'].tolist()
+                index.labels = [label_names[code] for code in data['label_codes']]
+            index._weights = data['weights'].astype(np.float32)
+            index._assignments = data['assignments'].astype(np.int32)
+            index.keys = [key.decode('ascii') if isinstance(key, bytes) else key for key in data['keys'].tolist()]
+            index._size = size
+            if 'components' in data and data['components'].size:
+                # Stored vectors are already in the reduced space
+                index.components = data['components'].astype(np.float32)
+            centroids = data['centroids']
+            if nlist > 0 and centroids.shape[0] == nlist and centroids.shape[1] == index._vectors.shape[1]:
+                index.centroids = centroids.astype(np.float32)
+                index._sorted_size = int(data['sorted_size'])
+                index._list_offsets = np.searchsorted(index._assignments[:index._sorted_size], np.arange(nlist + 1))
+                index._index_pending()
+
+        index.key_positions = {key: i for i, key in enumerate(index.keys)}
+        if pca_dims > 0 and index.components is None and size >= max(PCA_MIN_DOCUMENTS, 4 * pca_dims):
+            index.reduce_dimensions()
+        if nlist > 0 and index.centroids is None and size >= 39 * nlist:
+            index.train()
+        return index
@@ -19,6 +19,9 @@ from werkzeug.utils import secure_filename
 from magic_folder.config import Config
 from magic_folder.analyzer import AIAnalyzer
 from magic_folder.file_handler import FileHandler
+from magic_folder.service import connect_to_service, RemoteAnalyzer
+from magic_folder.content_extractor import ContentExtractor
+from magic_folder.reclassify import ReclassifyJob
 from magic_folder.utils import log_activity, set_log_file, validate_config_values
 
 # File upload settings
@@ -36,6 +39,10 @@ file_registry = {}
 file_id_counter = 0
 file_registry_lock = threading.Lock()
 
+# Background reclassification jobs by id
+reclassify_jobs = {}
+reclassify_jobs_lock = threading.Lock()
+
 def generate_file_id(file_path):
     """Generate a secure file ID for operations"""
     global file_id_counter
@@ -114,12 +121,22 @@ stats = {
 }
 scheduler = BackgroundScheduler()
 
-def setup_app(config_path=None):
-    """Initialize the Magic Folder configuration and modules"""
+def setup_app(config_path=None, shared_analyzer=None, shared_file_handler=None):
+    """
+    Initialize the Magic Folder configuration and modules
+    
+    Args:
+        config_path (str, optional): Path to configuration file
+        shared_analyzer (AIAnalyzer, optional): Analyzer already loaded by the watcher process
+        shared_file_handler (FileHandler, optional): File handler already running in the watcher process
+    """
     global config, analyzer, file_handler, stats
     
-    # Initialize configuration
-    config = Config(config_path)
+    # Initialize configuration (reuse the watcher's so command line overrides apply)
+    if shared_analyzer is not None:
+        config = shared_analyzer.config
+    else:
+        config = Config(config_path)
     
     # Validate configuration
     config_errors = validate_config_values(config)
@@ -154,11 +171,23 @@ def setup_app(config_path=None):
     # Initialize logging system with the config's log file
     set_log_file(config.log_file)
     
-    # Initialize AI analyzer
-    analyzer = AIAnalyzer(config)
-    
-    # Initialize file handler
-    file_handler = FileHandler(config, analyzer)
+    if shared_analyzer is not None:
+        # Running inside the watcher process
+        analyzer = shared_analyzer
+        file_handler = shared_file_handler
+    else:
+        client = connect_to_service(config)
+        if client is not None:
+            # The watcher process owns the model and the processing pipeline
+            log_activity("Connected to running inference service")
+            analyzer = RemoteAnalyzer(config, client)
+            file_handler = None
+        else:
+            # Initialize AI analyzer
+            analyzer = AIAnalyzer(config)
+            
+            # Initialize file handler
+            file_handler = FileHandler(config, analyzer)
     
     # Collect initial statistics
     update_statistics()
@@ -495,9 +524,47 @@ def api_stats():
     return jsonify({
         'categories': stats['category_breakdown'],
         'file_types': dict(stats['file_types']),
+        'classification_tiers': analyzer.get_cascade_stats() if analyzer else {},
         'last_updated': stats['last_updated'].isoformat()
     })
 
+@app.route('/api/reclassify', methods=['GET', 'POST'])
+def api_reclassify():
+    """
+    API endpoint for re-sorting organized files in the background
+    
+    GET starts a job that previews the plan, POST starts one that applies it.
+    Poll /api/reclassify/<job> for the status and result.
+    """
+    if not hasattr(analyzer, 'reclassify_contents'):
+        return jsonify({'error': 'Reclassification needs the model loaded in this process'}), 503
+    
+    with reclassify_jobs_lock:
+        running = [job for job in reclassify_jobs.values() if job.running]
+        if running:
+            return jsonify(running[0].to_dict()), 409
+        
+        content_extractor = file_handler.content_extractor if file_handler else ContentExtractor(config)
+        dedup_manager = file_handler.dedup_manager if file_handler else None
+        job = ReclassifyJob(config, analyzer, content_extractor,
+                            apply=request.method == 'POST', dedup_manager=dedup_manager)
+        reclassify_jobs.clear()  # Only the latest job is kept
+        reclassify_jobs[job.id] = job
+        job.start()
+    
+    response = job.to_dict()
+    response['status_url'] = url_for('api_reclassify_status', job_id=job.id)
+    return jsonify(response), 202
+
+@app.route('/api/reclassify/<job_id>')
+def api_reclassify_status(job_id):
+    """API endpoint for the status and result of a reclassification job"""
+    with reclassify_jobs_lock:
+        job = reclassify_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown reclassification job'}), 404
+    return jsonify(job.to_dict())
+
 @app.route('/api/log')
 def api_log():
     """API endpoint for getting the activity log"""
@@ -630,7 +697,7 @@ def generate_weekly_report():
     
     return report
 
-def run_web_interface(config_path=None, host='0.0.0.0', port=5000, debug=False):
+def run_web_interface(config_path=None, host='0.0.0.0', port=5000, debug=False, analyzer=None, file_handler=None):
     """
     Run the Magic Folder web interface
     
@@ -639,8 +706,10 @@ def run_web_interface(config_path=None, host='0.0.0.0', port=5000, debug=False):
         host (str): Host to run the server on
         port (int): Port to run the server on
         debug (bool): Whether to run in debug mode
+        analyzer (AIAnalyzer, optional): Analyzer to share instead of loading a new model
+        file_handler (FileHandler, optional): File handler to share with the analyzer
     """
-    setup_app(config_path)
+    setup_app(config_path, shared_analyzer=analyzer, shared_file_handler=file_handler)
     app.run(host=host, port=port, debug=debug)
 
 if __name__ == '__main__':
@@ -38,6 +38,56 @@ def run_tests():
         'test_security_improvements.TestSecurityImprovements.test_graceful_shutdown',
         'test_security_improvements.TestSecurityImprovements.test_file_size_limits',
         'test_security_improvements.TestSecurityImprovements.test_file_hash_calculation_memory_efficient',
+        
+        # Embedding helper tests
+        'test_embeddings.TestEmbeddingHelpers',
+        
+        # Keyword matcher tests
+        'test_keyword_matcher.TestKeywordMatcher',
+        
+        # Inference service tests
+        'test_service.TestInferenceService',
+        
+        # Document index tests
+        'test_vector_index.TestVectorIndex',
+        
+        # Linear classifier tests
+        'test_linear_classifier.TestOnlineTextClassifier',
+        
+        # Inference threading tests
+        'test_inference.TestInferenceExecutor',
+        
+        # Model bundle tests
+        'test_model_bundle.TestModelBundle',
+        
+        # OCR tests
+        'test_ocr.TestOcrLanguages',
+        'test_ocr.TestTextPresence',
+        'test_ocr.TestOcrPreprocessing',
+        'test_ocr.TestOcrWorkerPool',
+        'test_ocr.TestScannedPdfOcr',
+        'test_ocr.TestOcrCache',
+        
+        # PDF text tests
+        'test_pdf_text.TestPdfText',
+        
+        # Tabular sampling tests
+        'test_tabular.TestCsvSampler',
+        'test_tabular.TestWorkbookSampler',
+        
+        # Streaming text tests
+        'test_streaming_text.TestStreamingJson',
+        'test_streaming_text.TestStreamingMarkup',
+        'test_streaming_text.TestStreamingOffice',
+        
+        # Reclassification tests
+        'test_reclassify.TestReclassify',
+        
+        # Document view tests
+        'test_document.TestDocument',
+        
+        # Analyzer tests
+        'test_analyzer.TestAnalyzer',
     ]
     
     # Load and run specific tests
@@ -0,0 +1,283 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from magic_folder.config import Config
+from magic_folder.analyzer import AIAnalyzer
+from magic_folder.vector_index import VectorIndex
+
+class FakeEmbeddingModel:
+    """Bag-of-words stand-in for a SentenceTransformer model"""
+
+    VOCABULARY = ["bank", "statement", "doctor", "patient", "invoice", "contract"]
+
+    def encode(self, text):
+        words = text.lower().replace(',', ' ').replace(':', ' ').split()
+        vector = np.array([words.count(term) for term in self.VOCABULARY], dtype=np.float32)
+        return vector + 0.01
+
+class TestAnalyzer(unittest.TestCase):
+    """Tests for the AIAnalyzer classification logic"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.config = Config()
+        self.config.base_dir = self.temp_dir
+        self.config.categories = ["financial", "medical", "other"]
+        self.config.category_keywords = {
+            "financial": ["bank", "statement"],
+            "medical": ["doctor", "patient"],
+            "other": []
+        }
+        self.config.update_paths()
+
+        self.analyzer = AIAnalyzer(self.config, offline_mode=True)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+
+    def _enable_fake_model(self):
+        self.analyzer.embedding_model = FakeEmbeddingModel()
+        self.analyzer.model_available = True
+        self.analyzer._generate_category_embeddings()
+        self.analyzer._load_document_index()
+
+    def test_keyword_fallback(self):
+        """Test keyword classification without a model"""
+        category, new_name = self.analyzer.analyze_content("Monthly bank statement", "scan.pdf")
+
+        self.assertEqual(category, "financial")
+        self.assertTrue(new_name.endswith(".pdf"))
+
+    def test_correction_updates_prototype_incrementally(self):
+        """Test that a correction moves the category prototype without re-embedding keywords"""
+        self._enable_fake_model()
+        before = self.analyzer._get_category_prototypes()["medical"].copy()
+        keyword_embedding = self.analyzer.category_embeddings["medical"].copy()
+
+        self.analyzer.record_correction("invoice invoice invoice", "medical")
+
+        after = self.analyzer._get_category_prototypes()["medical"]
+        self.assertEqual(self.analyzer.category_centroids["medical"]["count"], 1)
+        self.assertFalse(np.allclose(before, after))
+        # The keyword prior itself is left untouched
+        np.testing.assert_allclose(self.analyzer.category_embeddings["medical"], keyword_embedding)
+        # The corrected document is now in the neighbour index
+        self.assertEqual(len(self.analyzer.document_index), 1)
+
+    def test_correction_invalidates_cached_decision(self):
+        """Test that corrected content is not answered from the analysis cache"""
+        self._enable_fake_model()
+        content = "bank statement for the doctor"
+        self.analyzer.analyze_content(content, "a.pdf")
+        key = self.analyzer._content_key(content)
+        self.assertIn(key, self.analyzer.content_cache)
+
+        self.analyzer.record_correction(content, "medical")
+
+        self.assertNotIn(key, self.analyzer.content_cache)
+
+    def test_cascade_keyword_tier_skips_model(self):
+        """Test that decisive keyword evidence never reaches the embedding model"""
+        self._enable_fake_model()
+        self.config.category_keywords["financial"] += ["account", "balance"]
+
+        category, _ = self.analyzer.analyze_content("Bank statement: account balance", "s.pdf")
+
+        self.assertEqual(category, "financial")
+        self.assertEqual(self.analyzer.tier_counts["keyword"], 1)
+        self.assertEqual(len(self.analyzer.document_index), 0)
+
+    def test_cascade_ambiguous_uses_model(self):
+        """Test that ambiguous keyword evidence falls through to the embedding model"""
+        self._enable_fake_model()
+
+        self.analyzer.analyze_content("patient doctor doctor doctor bank", "a.txt")
+
+        self.assertEqual(self.analyzer.tier_counts["transformer"], 1)
+        stats = self.analyzer.get_cascade_stats()
+        self.assertEqual(stats["transformer"]["percentage"], 100.0)
+
+    def test_removed_category_prototype_is_ignored(self):
+        """Test that a stored prototype of a category no longer configured is never chosen"""
+        self._enable_fake_model()
+        model = self.analyzer.embedding_model
+        self.analyzer.category_centroids["legal"] = {'sum': model.encode("invoice contract"), 'count': 1}
+
+        category, _ = self.analyzer.analyze_content("invoice contract contract doctor", "a.txt")
+
+        self.assertEqual(self.analyzer.tier_counts["transformer"], 1)
+        self.assertIn(category, self.config.categories)
+
+    def test_cascade_linear_tier(self):
+        """Test that a confident linear classifier short-circuits the model"""
+        self._enable_fake_model()
+
+        class StubClassifier:
+            def predict_proba(self, text):
+                return {"financial": 0.1, "medical": 0.85, "other": 0.05}
+
+        self.analyzer.linear_classifier = StubClassifier()
+        category, _ = self.analyzer.analyze_content("bank doctor", "a.txt")
+
+        self.assertEqual(category, "medical")
+        self.assertEqual(self.analyzer.tier_counts["linear"], 1)
+
+    def test_offline_learns_from_corrections(self):
+        """Test that corrections train the linear classifier used in offline mode"""
+        self.config.linear_min_examples = 4
+        analyzer = AIAnalyzer(self.config, offline_mode=True)
+        for _ in range(3):
+            analyzer.record_correction("quarterly tax return invoice", "financial")
+            analyzer.record_correction("vaccination record and lab results", "medical")
+
+        category, _ = analyzer.analyze_content("lab results attached", "r.txt")
+
+        self.assertEqual(category, "medical")
+        self.assertEqual(analyzer.tier_counts["linear"], 1)
+        # Saved at shutdown, not while classifying
+        self.assertFalse(os.path.exists(analyzer.linear_model_file))
+        analyzer.save_learned_state()
+        self.assertTrue(os.path.exists(analyzer.linear_model_file))
+
+    def test_learned_state_is_saved_in_the_background(self):
+        """Test that training schedules one background save instead of saving inline"""
+        self.config.learned_state_save_interval = 0.1
+        analyzer = AIAnalyzer(self.config, offline_mode=True)
+        analyzer.record_correction("quarterly tax return invoice", "financial")
+        analyzer.record_correction("vaccination record and lab results", "medical")
+        timer = analyzer._save_timer
+
+        self.assertIsNotNone(timer)
+        timer.join(5)
+        self.assertTrue(os.path.exists(analyzer.linear_model_file))
+        self.assertEqual(analyzer._unsaved_linear_updates, 0)
+        self.assertIsNone(analyzer._save_timer)
+
+    def test_document_index_is_saved_in_the_background(self):
+        """Test that classified documents reach the index file through the save timer"""
+        self.config.learned_state_save_interval = 0.1
+        self._enable_fake_model()
+
+        self.analyzer.analyze_content("patient doctor doctor doctor bank", "a.txt")
+
+        self.assertFalse(os.path.exists(self.analyzer.index_file))
+        self.analyzer._save_timer.join(5)
+        self.assertEqual(len(VectorIndex.load(self.analyzer.index_file)), 1)
+
+    def test_reclassify_after_keyword_change(self):
+        """Test that stored documents are rescored against changed category keywords"""
+        self._enable_fake_model()
+        contents = ["invoice invoice", "contract contract invoice"]
+        for content in contents:
+            self.analyzer._remember_document(self.analyzer._content_key(content),
+                                             self.analyzer._embed_document(content), "other")
+
+        self.config.category_keywords["financial"] = ["invoice"]
+        self.config.category_keywords["medical"] = ["contract"]
+        categories = self.analyzer.reclassify_contents(contents)
+
+        self.assertEqual(categories, ["financial", "medical"])
+        self.assertEqual(self.analyzer.document_index.entry(self.analyzer._content_key(contents[0]))[0], "financial")
+
+    def test_reclassify_keeps_user_corrections(self):
+        """Test that a corrected document keeps the category the user chose"""
+        self._enable_fake_model()
+        self.analyzer.record_correction("bank statement", "medical")
+
+        self.assertEqual(self.analyzer.reclassify_contents(["bank statement"]), ["medical"])
+
+    def test_cache_from_other_backend_is_discarded(self):
+        """Test that category vectors from a different embedding backend are not reused"""
+        self._enable_fake_model()
+        self.assertTrue(self.analyzer.category_embeddings)
+
+        self.config.embedding_backend = "static"
+        reloaded = AIAnalyzer(self.config, offline_mode=True)
+        reloaded._load_cached_embeddings()
+
+        self.assertEqual(reloaded.category_embeddings, {})
+        self.assertTrue(reloaded._embeddings_outdated)
+
+    def test_decisive_metadata_classifies_file(self):
+        """Test that metadata with a clear keyword lead is enough to classify"""
+        self.config.keyword_margin = 2
+        metadata = "PDF Metadata:\n/Title: May Bank Statement\n/Producer: Bank statement generator\n"
+
+        category, new_name = self.analyzer.analyze_metadata(metadata, "scan.pdf")
+
+        self.assertEqual(category, "financial")
+        self.assertTrue(new_name.startswith("May_Bank_Statement_"))
+        self.assertEqual(self.analyzer.tier_counts["metadata"], 1)
+
+    def test_metadata_needs_the_cascade(self):
+        """Test that metadata never short-circuits classification with the cascade disabled"""
+        self.config.keyword_margin = 2
+        self.config.enable_cascade = False
+        metadata = "PDF Metadata:\n/Title: May Bank Statement\n/Producer: Bank statement generator\n"
+
+        self.assertIsNone(self.analyzer.analyze_metadata(metadata, "scan.pdf"))
+        self.assertEqual(self.analyzer.tier_counts["metadata"], 0)
+
+    def test_weak_metadata_defers_to_content(self):
+        """Test that indecisive metadata leaves classification to the full content"""
+        metadata = "Document Properties:\nTitle: Scan 0042\nApplication: Microsoft Office Word\n"
+
+        self.assertIsNone(self.analyzer.analyze_metadata(metadata, "scan.docx"))
+        self.assertIsNone(self.analyzer.analyze_metadata("", "scan.docx"))
+
+    def test_entry_points_wait_for_the_analyzer_lock(self):
+        """Test that classification, corrections and stats are serialized on one lock"""
+        calls = [
+            lambda: self.analyzer.analyze_content("Monthly bank statement", "scan.pdf"),
+            lambda: self.analyzer.record_correction("Doctor visit", "medical"),
+            self.analyzer.get_cascade_stats
+        ]
+        with self.analyzer.lock:
+            threads = [threading.Thread(target=call) for call in calls]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(0.2)
+            self.assertTrue(all(thread.is_alive() for thread in threads))
+
+        for thread in threads:
+            thread.join(5)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(sum(self.analyzer.tier_counts.values()), 1)
+
+    def test_embedding_runs_outside_the_analyzer_lock(self):
+        """Test that other threads can use the analyzer while a document is embedded"""
+        self._enable_fake_model()
+        model = self.analyzer.embedding_model
+        lock = self.analyzer.lock
+        lock_free = []
+
+        def probe():
+            acquired = lock.acquire(timeout=1)
+            if acquired:
+                lock.release()
+            lock_free.append(acquired)
+
+        class ProbingModel:
+            def encode(self, text):
+                thread = threading.Thread(target=probe)
+                thread.start()
+                thread.join()
+                return model.encode(text)
+
+        self.analyzer.embedding_model = ProbingModel()
+        category, _ = self.analyzer.analyze_content("patient doctor doctor doctor bank", "a.txt")
+
+        self.assertEqual(category, "medical")
+        self.assertEqual(lock_free, [True])
+        self.assertEqual(self.analyzer.tier_counts["transformer"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
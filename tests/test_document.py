@@ -0,0 +1,36 @@
+import unittest
+
+from magic_folder.document import Document, content_key
+from magic_folder.analyzer import AIAnalyzer
+
+class TestDocument(unittest.TestCase):
+    """Tests for the shared document view"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.document = Document("Quarterly Report\nRevenue grew 12%\n\nNext steps\nHire staff")
+
+    def test_views_are_computed_once(self):
+        """Test that derived views are cached and shared"""
+        self.assertIs(self.document.lower, self.document.lower)
+        self.assertIs(self.document.token_spans, self.document.token_spans)
+        self.assertIs(self.document.sample(10), self.document.sample(10))
+
+    def test_head_lines(self):
+        """Test that only the requested leading lines are returned"""
+        self.assertEqual(self.document.head_lines(2), ["Quarterly Report", "Revenue grew 12%"])
+        self.assertEqual(len(Document("one line").head_lines(5)), 1)
+
+    def test_words(self):
+        """Test that words come from the lowercased text"""
+        self.assertEqual(list(self.document.words())[:4], ["quarterly", "report", "revenue", "grew"])
+
+    def test_wrap_and_key(self):
+        """Test wrapping and that keys match the analyzer's cache keys"""
+        self.assertIs(Document.wrap(self.document), self.document)
+        self.assertFalse(Document.wrap(None))
+        self.assertEqual(self.document.key, content_key(self.document.text))
+        self.assertEqual(self.document.key, AIAnalyzer._content_key(self.document.text))
+
+if __name__ == '__main__':
+    unittest.main()
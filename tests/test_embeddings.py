@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+from magic_folder.embeddings import chunk_token_ids, pool_embeddings, sample_for_token_budget
+
+class TestEmbeddingHelpers(unittest.TestCase):
+    """Tests for document chunking and pooling helpers"""
+
+    def test_chunk_token_ids_respects_window_and_budget(self):
+        """Test that chunks fit the model window and the token budget"""
+        chunks = chunk_token_ids(list(range(25)), window=10, max_tokens=22)
+
+        self.assertEqual([len(c) for c in chunks], [10, 10, 2])
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][-1], 21)
+
+    def test_chunk_token_ids_empty(self):
+        """Test chunking an empty document"""
+        self.assertEqual(chunk_token_ids([], window=10, max_tokens=100), [])
+
+    def test_sample_for_token_budget(self):
+        """Test that only text that can fit in the budget is kept"""
+        text = "x" * 100000
+        self.assertLess(len(sample_for_token_budget(text, 100)), len(text))
+
+    def test_pool_methods(self):
+        """Test mean, max and attention pooling"""
+        chunks = np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 0.2]])
+
+        mean = pool_embeddings(chunks, "mean")
+        np.testing.assert_allclose(mean, chunks.mean(axis=0), rtol=1e-6)
+
+        weighted = pool_embeddings(chunks, "mean", weights=[2, 1, 1])
+        np.testing.assert_allclose(weighted, [0.75, 0.3], rtol=1e-6)
+
+        np.testing.assert_allclose(pool_embeddings(chunks, "max"), [1.0, 1.0])
+
+        # The off-topic chunk should get less weight than under plain averaging
+        attention = pool_embeddings(chunks, "attention")
+        self.assertGreater(attention[0], mean[0])
+
+        with self.assertRaises(ValueError):
+            pool_embeddings(chunks, "median")
+
+    def test_single_chunk_passthrough(self):
+        """Test that a single chunk is returned unchanged"""
+        vector = np.array([[0.5, 0.5]])
+        np.testing.assert_allclose(pool_embeddings(vector, "attention"), [0.5, 0.5])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import threading
+import unittest
+
+from magic_folder.inference import InferenceExecutor, plan_threads, candidate_splits, benchmark_split
+
+COUNTER_LOCK = threading.Lock()
+
+class FakeModel:
+    """Model stand-in that records how many callers use it at once"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+
+class TestInferenceExecutor(unittest.TestCase):
+    """Tests for inference threading control"""
+
+    def _hammer(self, executor, callers=4, calls=20):
+        def worker():
+            for _ in range(calls):
+                with executor.acquire() as (model, _):
+                    with COUNTER_LOCK:
+                        model.active += 1
+                        model.max_active = max(model.max_active, model.active)
+                    with COUNTER_LOCK:
+                        model.active -= 1
+
+        threads = [threading.Thread(target=worker) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_single_replica_serializes_callers(self):
+        """Test that one replica is never used by two callers at once"""
+        model = FakeModel()
+        executor = InferenceExecutor(model, replicas=1)
+
+        self._hammer(executor)
+
+        self.assertEqual(model.max_active, 1)
+
+    def test_replicas_are_independent_copies(self):
+        """Test that each replica is a separate model object"""
+        model = FakeModel()
+        executor = InferenceExecutor(model, replicas=3)
+
+        with executor.acquire() as (first, _), executor.acquire() as (second, _):
+            self.assertIsNot(first, second)
+        self._hammer(executor)
+
+    def test_thread_planning(self):
+        """Test splitting cores between replicas"""
+        self.assertEqual(plan_threads(2, cores=8), 4)
+        self.assertEqual(plan_threads(16, cores=8), 1)
+        self.assertEqual(plan_threads(2, intra_op_threads=3, cores=8), 3)
+        self.assertEqual(candidate_splits(6), [(1, 6), (2, 3), (3, 2), (6, 1)])
+
+    def test_benchmark_processes_every_text(self):
+        """Test that the benchmark embeds each sample exactly once"""
+        seen = []
+        lock = threading.Lock()
+
+        def encode(text):
+            with lock:
+                seen.append(text)
+
+        docs_per_second = benchmark_split(encode, [str(i) for i in range(50)], replicas=4)
+
+        self.assertEqual(sorted(seen, key=int), [str(i) for i in range(50)])
+        self.assertGreater(docs_per_second, 0)
+
+if __name__ == '__main__':
+    unittest.main()
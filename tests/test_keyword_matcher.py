@@ -0,0 +1,59 @@
+import unittest
+
+from magic_folder.keyword_matcher import KeywordMatcher
+
+class TestKeywordMatcher(unittest.TestCase):
+    """Tests for the Aho-Corasick keyword matcher"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.keywords = {
+            "identity": ["id", "passport", "social security"],
+            "financial": ["bank", "statement", "transaction"],
+            "receipts": ["receipt", "transaction", "total"],
+            "other": []
+        }
+        self.matcher = KeywordMatcher(self.keywords)
+
+    def test_whole_word_matching(self):
+        """Test that keywords inside longer words are not matched"""
+        counts = self.matcher.count_matches("please provide the bank statement")
+
+        self.assertEqual(counts["identity"], 0)  # "id" inside "provide"
+        self.assertEqual(counts["financial"], 2)
+
+    def test_multi_word_and_punctuation(self):
+        """Test multi-word keywords and punctuation boundaries"""
+        counts = self.matcher.count_matches("your social security number (id): 123")
+
+        self.assertEqual(counts["identity"], 2)
+
+    def test_keywords_counted_once(self):
+        """Test that repeated keywords count once per category"""
+        counts = self.matcher.count_matches("bank bank bank")
+
+        self.assertEqual(counts["financial"], 1)
+
+    def test_shared_keyword(self):
+        """Test that a keyword owned by several categories counts for each"""
+        counts = self.matcher.count_matches("transaction complete")
+
+        self.assertEqual(counts["financial"], 1)
+        self.assertEqual(counts["receipts"], 1)
+
+    def test_overlapping_keywords(self):
+        """Test keywords that are suffixes of each other"""
+        matcher = KeywordMatcher({"a": ["tax return", "return"], "b": ["ax"]})
+        counts = matcher.count_matches("filed tax return today")
+
+        self.assertEqual(counts["a"], 2)
+        self.assertEqual(counts["b"], 0)
+
+    def test_category_filter(self):
+        """Test that only requested categories are compiled"""
+        matcher = KeywordMatcher(self.keywords, categories=["financial"])
+
+        self.assertEqual(matcher.count_matches("receipt from the bank"), {"financial": 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from magic_folder.linear_classifier import OnlineTextClassifier
+
+class TestOnlineTextClassifier(unittest.TestCase):
+    """Tests for the online hashed-feature classifier"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.categories = ["financial", "medical", "other"]
+        self.examples = [
+            ("bank statement account balance transfer", "financial"),
+            ("invoice payment due amount tax", "financial"),
+            ("doctor patient diagnosis prescription", "medical"),
+            ("hospital clinic appointment treatment", "medical"),
+        ]
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+
+    def _train(self, classifier, rounds=5):
+        for _ in range(rounds):
+            for text, category in self.examples:
+                classifier.partial_fit(text, category)
+
+    def test_untrained_returns_empty(self):
+        """Test that the classifier abstains until it has enough examples"""
+        classifier = OnlineTextClassifier(self.categories, min_examples=10)
+        classifier.partial_fit("bank statement", "financial")
+
+        self.assertEqual(classifier.predict_proba("bank statement"), {})
+
+    def test_learns_online(self):
+        """Test that partial_fit updates produce sensible predictions"""
+        classifier = OnlineTextClassifier(self.categories, min_examples=4)
+        self._train(classifier)
+
+        probabilities = classifier.predict_proba("monthly bank statement")
+        self.assertEqual(max(probabilities, key=probabilities.get), "financial")
+        self.assertAlmostEqual(sum(probabilities.values()), 1.0, places=5)
+
+        probabilities = classifier.predict_proba("patient diagnosis from the doctor")
+        self.assertEqual(max(probabilities, key=probabilities.get), "medical")
+
+    def test_save_and_load(self):
+        """Test persistence and reset when the categories change"""
+        path = os.path.join(self.temp_dir, "linear_model.pkl.gz")
+        classifier = OnlineTextClassifier(self.categories, min_examples=4)
+        self._train(classifier)
+        classifier.save(path)
+
+        loaded = OnlineTextClassifier.load(path, self.categories, min_examples=4)
+        self.assertEqual(loaded.examples, classifier.examples)
+        expected = classifier.predict_proba("bank statement")
+        for category, probability in loaded.predict_proba("bank statement").items():
+            self.assertAlmostEqual(probability, expected[category], places=5)
+        # Training continues on the restored weights
+        loaded.partial_fit("doctor visit", "medical")
+        self.assertEqual(loaded.examples, classifier.examples + 1)
+
+        changed = OnlineTextClassifier.load(path, self.categories + ["legal"], min_examples=4)
+        self.assertEqual(changed.examples, 0)
+
+    def test_snapshot_keeps_only_weighted_features(self):
+        """Test that saved weights drop the hashed features no document used"""
+        classifier = OnlineTextClassifier(self.categories, min_examples=4)
+        self._train(classifier)
+
+        state = classifier.snapshot()
+
+        used = (classifier.model.coef_ != 0).any(axis=0).sum()
+        self.assertEqual(state['coef_values'].shape, (len(self.categories), used))
+        self.assertLess(used, classifier.model.coef_.shape[1] // 100)
+        self.assertEqual(str(state['coef_values'].dtype), "float32")
+        # The live model keeps its dense weights
+        self.assertIsNotNone(classifier.model.coef_)
+
+if __name__ == '__main__':
+    unittest.main()
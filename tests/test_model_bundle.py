@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from magic_folder.model_bundle import write_safetensors, read_safetensors, keyword_signature
+
+class TestModelBundle(unittest.TestCase):
+    """Tests for model bundle storage"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_safetensors_round_trip(self):
+        """Test that tensors are mapped back with their dtype and shape"""
+        path = os.path.join(self.temp_dir, "model.safetensors")
+        tensors = {
+            'embeddings.weight': np.arange(12, dtype=np.float32).reshape(3, 4),
+            'layer.bias': np.array([0.5, -1.5], dtype=np.float16),
+            'position_ids': np.arange(5, dtype=np.int64),
+        }
+        write_safetensors(path, tensors)
+
+        loaded = read_safetensors(path)
+        self.assertEqual(set(loaded), set(tensors))
+        for name, array in tensors.items():
+            self.assertEqual(loaded[name].dtype, array.dtype)
+            np.testing.assert_array_equal(loaded[name], array)
+        self.assertIsInstance(loaded['embeddings.weight'].base, np.memmap)
+
+    def test_mapped_weights_are_copy_on_write(self):
+        """Test that writing to a mapped tensor leaves the file untouched"""
+        path = os.path.join(self.temp_dir, "model.safetensors")
+        write_safetensors(path, {'w': np.ones(4, dtype=np.float32)})
+
+        loaded = read_safetensors(path)
+        loaded['w'][:] = 7
+
+        np.testing.assert_array_equal(read_safetensors(path)['w'], np.ones(4))
+
+    def test_keyword_signature(self):
+        """Test that the signature changes with the category keywords"""
+        keywords = {"financial": ["bank"], "medical": ["doctor"]}
+        signature = keyword_signature(["financial", "medical"], keywords)
+
+        self.assertEqual(signature, keyword_signature(["financial", "medical"], dict(keywords)))
+        self.assertNotEqual(signature, keyword_signature(["financial", "medical"], {"financial": ["bank", "loan"], "medical": ["doctor"]}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,388 @@
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from magic_folder import ocr
+from magic_folder.config import Config
+from magic_folder.content_extractor import ContentExtractor
+from magic_folder.ocr import (
+    LanguageSelector, TextPresenceDetector, OcrTimings, OcrWorkerPool, select_languages, text_likelihood,
+    preprocess_for_ocr, decode_preview, binarize, estimate_dpi, dhash, hamming_distance, BKTree, OcrCache
+)
+
+class TestOcrLanguages(unittest.TestCase):
+    """Tests for OCR language selection"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.languages = ["eng", "deu", "fra", "rus", "chi_sim"]
+        self.image = Image.new('L', (64, 64), 255)
+
+    def test_select_languages_by_script(self):
+        """Test that every language of the detected script, and only those, is kept"""
+        self.assertEqual(select_languages('Cyrillic', self.languages), ["rus"])
+        self.assertEqual(select_languages('Latin', self.languages), ["eng", "deu", "fra"])
+
+    def test_unknown_script_keeps_all_languages(self):
+        """Test that an unmatched script falls back to every language"""
+        self.assertEqual(select_languages('Arabic', self.languages), self.languages)
+
+    @unittest.skipUnless(ocr.TESSERACT_AVAILABLE, "pytesseract not installed")
+    def test_selector_narrows_on_confident_detection(self):
+        """Test that the selector uses OSD results and ignores weak ones"""
+        selector = LanguageSelector(self.languages)
+        self.assertTrue(selector.enabled)
+
+        with patch.object(ocr, 'detect_script', return_value=('Han', 5.0)), \
+                patch.object(ocr, 'log_activity') as log:
+            self.assertEqual(selector.languages_for(self.image), "chi_sim")
+            self.assertEqual(selector.languages_for(self.image), "chi_sim")
+        # Dropped languages are reported once per script
+        log.assert_called_once()
+        self.assertIn("eng, deu, fra, rus", log.call_args[0][0])
+        with patch.object(ocr, 'detect_script', return_value=('Han', 0.1)):
+            self.assertEqual(selector.languages_for(self.image), "eng+deu+fra+rus+chi_sim")
+
+    def test_selector_skips_detection_when_nothing_to_narrow(self):
+        """Test that OSD is not run when all languages share one script"""
+        selector = LanguageSelector(["eng", "deu", "fra"])
+        self.assertFalse(selector.enabled)
+        self.assertEqual(selector.languages_for(self.image), "eng+deu+fra")
+
+class TestTextPresence(unittest.TestCase):
+    """Tests for the pre-OCR text detector"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.page = Image.new('RGB', (1200, 1600), 'white')
+        draw = ImageDraw.Draw(self.page)
+        font = ImageFont.load_default(size=24)
+        for y in range(50, 400, 40):
+            draw.text((60, y), "Receipt total 12.00 paid by card", fill='black', font=font)
+
+        gradient = np.tile(np.linspace(0, 255, 1600), (1200, 1)).astype(np.uint8)
+        self.photo = Image.fromarray(gradient).convert('RGB')
+        noise = np.random.RandomState(0).randint(0, 256, (800, 800, 3)).astype(np.uint8)
+        self.noise = Image.fromarray(noise)
+
+    def test_text_scores_above_photos(self):
+        """Test that printed text scores higher than images without text"""
+        self.assertGreater(text_likelihood(self.page), 0.003)
+        self.assertLess(text_likelihood(self.photo), 0.003)
+        self.assertLess(text_likelihood(self.noise), 0.003)
+
+    def test_detector_tracks_skip_rate(self):
+        """Test that skipped images are counted"""
+        detector = TextPresenceDetector(threshold=0.003)
+
+        self.assertTrue(detector.should_ocr(self.page))
+        self.assertFalse(detector.should_ocr(self.photo))
+        self.assertEqual(detector.skip_rate, 0.5)
+
+    def test_zero_threshold_always_ocrs(self):
+        """Test that a zero threshold disables the check"""
+        detector = TextPresenceDetector(threshold=0)
+
+        self.assertTrue(detector.should_ocr(self.photo))
+        self.assertEqual(detector.checked, 0)
+
+    def test_photos_are_skipped_before_preprocessing(self):
+        """Test that a photo without text is never resampled for OCR"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = Config()
+            config.base_dir = temp_dir
+            extractor = ContentExtractor(config)
+            extractor.tesseract_available = True
+            for name, image in (('photo.png', self.photo), ('photo.jpg', self.photo.resize((3600, 4800)))):
+                path = os.path.join(temp_dir, name)
+                image.save(path)
+                with patch('magic_folder.content_extractor.preprocess_for_ocr',
+                           side_effect=AssertionError("preprocessed")):
+                    self.assertIn("OCR skipped", extractor._extract_from_image(path))
+
+class TestOcrPreprocessing(unittest.TestCase):
+    """Tests for OCR image normalization"""
+
+    def _jpeg(self, size, dpi=None):
+        buffer = io.BytesIO()
+        pixels = np.random.RandomState(1).randint(0, 256, (size[1], size[0], 3)).astype(np.uint8)
+        options = {'dpi': dpi} if dpi else {}
+        Image.fromarray(pixels).save(buffer, format='JPEG', **options)
+        buffer.seek(0)
+        return Image.open(buffer)
+
+    def test_large_jpeg_is_decoded_small_and_gray(self):
+        """Test that a high-resolution photo is resampled to the target DPI"""
+        image = self._jpeg((4400, 3300), dpi=(600, 600))
+        timings = OcrTimings()
+
+        result = preprocess_for_ocr(image, target_dpi=300, timings=timings)
+
+        self.assertEqual(result.mode, 'L')
+        self.assertEqual(result.size, (2200, 1650))
+        self.assertEqual(list(timings.stages), ['decode', 'grayscale', 'resample'])
+        self.assertIn('total', timings.summary())
+
+    def test_jpeg_preview_is_decoded_at_draft_scale(self):
+        """Test that the text check decodes a large JPEG at reduced size"""
+        preview = decode_preview(self._jpeg((4400, 3300)), size=768)
+
+        self.assertEqual(preview.mode, 'L')
+        self.assertEqual(preview.size, (1100, 825))
+
+    def test_placeholder_dpi_is_estimated(self):
+        """Test that 72 DPI is treated as unknown"""
+        image = self._jpeg((1100, 800), dpi=(72, 72))
+        self.assertAlmostEqual(estimate_dpi(image), 100.0)
+
+        result = preprocess_for_ocr(image, target_dpi=300)
+        self.assertEqual(result.size, (2200, 1600))  # Upscaling is capped at 2x
+
+    def test_binarize(self):
+        """Test that binarization separates dark text from the background"""
+        pixels = np.full((20, 20), 220, dtype=np.uint8)
+        pixels[5:10, 5:15] = 30
+        result = binarize(Image.fromarray(pixels))
+
+        values = np.asarray(result)
+        self.assertEqual(set(np.unique(values)), {0, 255})
+        self.assertEqual(values[7, 7], 0)
+        self.assertEqual(values[0, 0], 255)
+
+FAKE_TESSERACT = """#!{python}
+import os, sys
+with open(os.path.join(os.path.dirname(sys.argv[0]), 'calls.log'), 'a') as log:
+    log.write(' '.join(sys.argv[1:]) + '\\n')
+with open(sys.argv[1]) as pages:
+    for line in pages:
+        if line.strip():
+            sys.stdout.write('text of ' + os.path.basename(line.strip()) + '\\f')
+"""
+
+class TestOcrWorkerPool(unittest.TestCase):
+    """Tests for the batched command-line OCR backend"""
+
+    def setUp(self):
+        """Set up a stand-in tesseract executable"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.command = os.path.join(self.temp_dir, 'tesseract')
+        with open(self.command, 'w') as f:
+            f.write(FAKE_TESSERACT.format(python=sys.executable))
+        os.chmod(self.command, 0o755)
+        self.pool = OcrWorkerPool(workers=2, dpi=300, tesseract_cmd=self.command)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+
+    @unittest.skipIf(os.name == 'nt', "shebang scripts need a POSIX system")
+    def test_batch_uses_one_process(self):
+        """Test that a batch of pages is OCRed by one call and split per page"""
+        pages = [Image.new('L', (40, 40), 255) for _ in range(3)]
+
+        texts = self.pool.recognize(pages, "eng+deu")
+
+        self.assertEqual(texts, ["text of page_0000.pnm", "text of page_0001.pnm", "text of page_0002.pnm"])
+        with open(os.path.join(self.temp_dir, 'calls.log')) as f:
+            calls = f.read().splitlines()
+        self.assertEqual(len(calls), 1)
+        self.assertIn("-l eng+deu --dpi 300", calls[0])
+
+    def test_empty_batch(self):
+        """Test that no process is started for an empty batch"""
+        self.assertEqual(self.pool.recognize([], "eng"), [])
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'calls.log')))
+
+FAKE_PDFTOPPM = """#!{python}
+import sys
+from PIL import Image
+first, last = int(sys.argv[sys.argv.index('-f') + 1]), int(sys.argv[sys.argv.index('-l') + 1])
+for number in range(first, last + 1):
+    Image.new('L', (40, 40), 255).save('%s-%02d.pgm' % (sys.argv[-1], number))
+"""
+
+@unittest.skipIf(os.name == 'nt', "shebang scripts need a POSIX system")
+class TestScannedPdfOcr(unittest.TestCase):
+    """Tests for multi-page scanned PDF OCR"""
+
+    def setUp(self):
+        """Set up stand-in pdftoppm and tesseract executables"""
+        self.temp_dir = tempfile.mkdtemp()
+        for name, script in (('pdftoppm', FAKE_PDFTOPPM), ('tesseract', FAKE_TESSERACT)):
+            path = os.path.join(self.temp_dir, name)
+            with open(path, 'w') as f:
+                f.write(script.format(python=sys.executable))
+            os.chmod(path, 0o755)
+
+        config = Config()
+        config.base_dir = self.temp_dir
+        config.ocr_workers = 1
+        config.ocr_pdf_pages = 5
+        self.extractor = ContentExtractor(config)
+        self.extractor.ocr_pool = OcrWorkerPool(workers=1, tesseract_cmd=os.path.join(self.temp_dir, 'tesseract'))
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+
+    def _ocr(self):
+        path = os.environ['PATH']
+        with patch.dict(os.environ, {'PATH': self.temp_dir + os.pathsep + path}):
+            return self.extractor._ocr_scanned_pdf(os.path.join(self.temp_dir, 'scan.pdf'))
+
+    def _calls(self):
+        with open(os.path.join(self.temp_dir, 'calls.log')) as f:
+            return f.read().splitlines()
+
+    def _distinct_pages(self, count):
+        pages = []
+        for number in range(count):
+            page = Image.new('L', (60, 60), 255)
+            ImageDraw.Draw(page).rectangle((number * 10, 0, number * 10 + 8, 59), fill=0)
+            pages.append(page)
+        return pages
+
+    def test_pages_share_one_tesseract_call_per_worker(self):
+        """Test that a batch of pages is split into one tesseract invocation per worker"""
+        texts = self.extractor._ocr_pages(self._distinct_pages(3))
+
+        self.assertEqual(texts, ["text of page_0000.pnm", "text of page_0001.pnm", "text of page_0002.pnm"])
+        self.assertEqual(len(self._calls()), 1)
+
+        self.extractor.ocr_pool = OcrWorkerPool(workers=2, tesseract_cmd=os.path.join(self.temp_dir, 'tesseract'))
+        texts = self.extractor._ocr_pages(self._distinct_pages(5)[1:] + [Image.new('L', (60, 60), 0)])
+
+        self.assertEqual(len(texts), 5)
+        self.assertEqual(len(self._calls()), 3)
+
+    def test_all_pages_are_ocred_in_order(self):
+        """Test that every rendered page is OCRed and kept in page order"""
+        text = self._ocr()
+
+        for number in range(1, 6):
+            self.assertIn(f"--- Page {number} ---", text)
+        self.assertLess(text.index("Page 1 ---"), text.index("Page 5 ---"))
+
+    def test_pdf_pages_are_ocred_in_batches(self):
+        """Test that rendered pages share tesseract invocations instead of one each"""
+        self.extractor.ocr_cache = None
+
+        text = self._ocr()
+
+        self.assertIn("--- Page 5 ---\ntext of page_0000.pnm", text)
+        self.assertEqual(len(self._calls()), 3)
+
+    def test_stops_once_sample_is_collected(self):
+        """Test that remaining pages are skipped once enough text is recognized"""
+        self.extractor.sample_length = 30
+
+        text = self._ocr()
+
+        self.assertIn("--- Page 2 ---", text)
+        self.assertNotIn("--- Page 5 ---", text)
+
+    def test_repeated_scan_uses_ocr_cache(self):
+        """Test that a second identical scan is not OCRed again"""
+        first = self._ocr()
+        second = self._ocr()
+
+        self.assertEqual(first, second)
+        with open(os.path.join(self.temp_dir, 'calls.log')) as f:
+            self.assertEqual(len(f.read().splitlines()), 1)  # Identical blank pages share one result
+
+    def test_missing_renderer(self):
+        """Test that a failing pdftoppm yields no OCR text"""
+        os.remove(os.path.join(self.temp_dir, 'pdftoppm'))
+        with patch.dict(os.environ, {'PATH': self.temp_dir}):
+            self.assertEqual(self.extractor._ocr_scanned_pdf('scan.pdf'), "")
+
+class TestOcrCache(unittest.TestCase):
+    """Tests for the perceptual-hash OCR cache"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+
+    def _page(self, lines):
+        page = Image.new('L', (850, 1100), 255)
+        draw = ImageDraw.Draw(page)
+        font = ImageFont.load_default(size=28)
+        for number, line in enumerate(lines):
+            draw.text((60, 80 + number * 60), line, fill=0, font=font)
+        return page
+
+    def _rescan(self, page):
+        buffer = io.BytesIO()
+        page.resize((820, 1060)).save(buffer, format='JPEG', quality=60)
+        buffer.seek(0)
+        return Image.open(buffer)
+
+    def test_rescans_hash_close(self):
+        """Test that a recompressed, rescaled copy hashes close to the original"""
+        page = self._page(["Lease agreement", "Tenant: Jane Doe"] * 6)
+        other = self._page(["Blood test results", "Patient record"] * 4)
+
+        self.assertLessEqual(hamming_distance(dhash(page), dhash(self._rescan(page))), 10)
+        self.assertGreater(hamming_distance(dhash(page), dhash(other)), 10)
+
+    def test_bk_tree_matches_brute_force(self):
+        """Test that BK-tree lookups find the closest hash within the radius"""
+        random = np.random.RandomState(2)
+        keys = [int(random.randint(0, 2 ** 16)) for _ in range(300)]
+        tree = BKTree()
+        for key in keys:
+            tree.add(key, key)
+
+        for query in [int(random.randint(0, 2 ** 16)) for _ in range(50)]:
+            best = min(hamming_distance(query, key) for key in keys)
+            match = tree.nearest(query, 2)
+            if best > 2:
+                self.assertIsNone(match)
+            else:
+                self.assertEqual(match[0], best)
+                self.assertEqual(hamming_distance(query, match[1]), best)
+
+    def test_cache_persists_per_language_set(self):
+        """Test that results are saved and only reused for the same languages"""
+        path = os.path.join(self.temp_dir, 'ocr_cache.pkl')
+        cache = OcrCache(path, max_distance=4)
+        cache.add(0b1011, "eng", "cached text")
+        cache.save()
+
+        reloaded = OcrCache(path, max_distance=4)
+        self.assertEqual(reloaded.lookup(0b1001, "eng"), "cached text")
+        self.assertIsNone(reloaded.lookup(0b1011, "eng+rus"))
+
+    def test_oldest_entries_are_dropped(self):
+        """Test that the cache keeps at most max_entries results"""
+        cache = OcrCache(os.path.join(self.temp_dir, 'ocr_cache.pkl'), max_distance=0, max_entries=2)
+        for key in (1, 2, 4):
+            cache.add(key, "eng", str(key))
+
+        self.assertIsNone(cache.lookup(1, "eng"))
+        self.assertEqual(cache.lookup(4, "eng"), "4")
+
+    def test_full_cache_trims_in_chunks(self):
+        """Test that a full cache is not reindexed on every insert"""
+        cache = OcrCache(os.path.join(self.temp_dir, 'ocr_cache.pkl'), max_distance=0, max_entries=100)
+        with patch.object(cache, '_rebuild', wraps=cache._rebuild) as rebuild:
+            for key in range(1, 151):
+                cache.add(key, "eng", str(key))
+
+        self.assertLessEqual(rebuild.call_count, 5)
+        self.assertLessEqual(len(cache.entries), 100)
+        self.assertEqual(cache.lookup(150, "eng"), "150")
+
+if __name__ == '__main__':
+    unittest.main()
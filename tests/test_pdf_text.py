@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import docx
+from PyPDF2 import PdfWriter, PageObject
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from magic_folder.config import Config
+from magic_folder.content_extractor import ContentExtractor
+from magic_folder.pdf_text import iter_pdf_pages, read_pdf_metadata, select_backend
+
+def make_pdf(path, pages, metadata=None):
+    """Write a PDF with one line of text per page"""
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica')
+    })
+    for text in pages:
+        page = PageObject.create_blank_page(width=612, height=792)
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode())
+        page[NameObject('/Contents')] = stream
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font})
+        })
+        writer.add_page(page)
+    if metadata:
+        writer.add_metadata(metadata)
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+FAKE_PDFTOTEXT = """#!{python}
+import sys, time
+sys.stdout.write('first page\\f')
+sys.stdout.flush()
+time.sleep(30)
+sys.stdout.write('second page\\f')
+"""
+
+class TestPdfText(unittest.TestCase):
+    """Tests for PDF text backends"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.pdf_path = os.path.join(self.temp_dir, 'statement.pdf')
+        make_pdf(self.pdf_path, [f"Page number {n} of the statement" for n in range(1, 6)],
+                 {'/Title': 'Monthly Statement'})
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_pages_in_order(self):
+        """Test that the fallback backend yields pages in order"""
+        pages = list(iter_pdf_pages(self.pdf_path, 3, backend="pypdf2"))
+
+        self.assertEqual(len(pages), 3)
+        self.assertIn("Page number 1", pages[0])
+        self.assertIn("Page number 3", pages[2])
+
+    def test_metadata(self):
+        """Test that document information is read without page text"""
+        self.assertEqual(read_pdf_metadata(self.pdf_path)['/Title'], 'Monthly Statement')
+
+    def test_unknown_backend_falls_back(self):
+        """Test that an unavailable backend is replaced by an available one"""
+        with patch('magic_folder.pdf_text.PDFIUM_AVAILABLE', False), \
+                patch('magic_folder.pdf_text.shutil.which', return_value=None):
+            self.assertEqual(select_backend("pypdfium2"), "pypdf2")
+
+    def test_extraction_stops_at_sample_length(self):
+        """Test that later pages are not parsed once the sample is full"""
+        config = Config()
+        config.base_dir = self.temp_dir
+        config.sample_length = 120
+        config.pdf_backend = "pypdf2"
+        extractor = ContentExtractor(config)
+
+        text = extractor._extract_from_pdf(self.pdf_path)
+
+        self.assertIn("Title: Monthly Statement", text)
+        self.assertIn("Page number 1", text)
+        self.assertNotIn("Page number 4", text)
+
+    def test_metadata_only_extraction(self):
+        """Test that metadata is read for PDFs and Office files without their body"""
+        config = Config()
+        config.base_dir = self.temp_dir
+        extractor = ContentExtractor(config)
+
+        docx_path = os.path.join(self.temp_dir, 'letter.docx')
+        document = docx.Document()
+        document.add_paragraph("Body text that is not needed")
+        document.core_properties.title = "Tenancy Agreement"
+        document.core_properties.subject = "Lease"
+        document.save(docx_path)
+
+        pdf_metadata = extractor.extract_metadata(self.pdf_path)
+        office_metadata = extractor.extract_metadata(docx_path)
+
+        self.assertIn("/Title: Monthly Statement", pdf_metadata)
+        self.assertNotIn("Page number", pdf_metadata)
+        self.assertIn("Title: Tenancy Agreement", office_metadata)
+        self.assertIn("Subject: Lease", office_metadata)
+        self.assertNotIn("Body text", office_metadata)
+        self.assertEqual(extractor.extract_metadata(os.path.join(self.temp_dir, 'notes.txt')), "")
+
+    @unittest.skipIf(os.name == 'nt', "shebang scripts need a POSIX system")
+    def test_pdftotext_stream_is_stopped_early(self):
+        """Test that closing the page iterator stops pdftotext"""
+        command = os.path.join(self.temp_dir, 'pdftotext')
+        with open(command, 'w') as f:
+            f.write(FAKE_PDFTOTEXT.format(python=sys.executable))
+        os.chmod(command, 0o755)
+
+        with patch.dict(os.environ, {'PATH': self.temp_dir + os.pathsep + os.environ['PATH']}):
+            start = time.time()
+            pages = iter_pdf_pages(self.pdf_path, 5, backend="pdftotext")
+            self.assertEqual(next(pages), "first page")
+            pages.close()
+
+        self.assertLess(time.time() - start, 10)
+
+if __name__ == '__main__':
+    unittest.main()
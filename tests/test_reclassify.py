@@ -0,0 +1,94 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from magic_folder.config import Config
+from magic_folder.content_extractor import ContentExtractor
+from magic_folder.deduplication import DeduplicationManager
+from magic_folder.reclassify import ReclassifyJob, apply_plan
+
+class TestReclassify(unittest.TestCase):
+    """Tests for re-sorting the organized folder"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.config = Config()
+        self.config.base_dir = self.temp_dir
+        self.config.categories = ["financial", "medical", "other"]
+        self.config.update_paths()
+
+        self.source = os.path.join(self.config.organized_dir, "other", "statement.pdf")
+        os.makedirs(os.path.dirname(self.source))
+        with open(self.source, 'w') as f:
+            f.write("Bank statement")
+
+        self.recent_dir = os.path.join(self.config.feedback_dir, "recent")
+        os.makedirs(self.recent_dir, exist_ok=True)
+        os.symlink(self.source, os.path.join(self.recent_dir, "other--statement.pdf"))
+
+        self.dedup_manager = DeduplicationManager(self.config)
+        self.dedup_manager.add_file_record("abc123", self.source, "other")
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+
+    def _record(self):
+        conn = sqlite3.connect(self.dedup_manager.db_path)
+        try:
+            return conn.execute("SELECT file_path, category FROM file_hashes WHERE hash = ?", ("abc123",)).fetchone()
+        finally:
+            conn.close()
+
+    def test_moved_file_bookkeeping(self):
+        """Test that dedup records and feedback links follow a moved file"""
+        destination = os.path.join(self.config.organized_dir, "financial", "statement.pdf")
+        plan = {'scanned': 1, 'moves': [{'source': self.source, 'from': "other", 'to': "financial"}]}
+
+        self.assertEqual(apply_plan(self.config, plan, self.dedup_manager), 1)
+
+        self.assertTrue(os.path.exists(destination))
+        self.assertEqual(self._record(), (destination, "financial"))
+        self.assertEqual(os.listdir(self.recent_dir), ["financial--statement.pdf"])
+        self.assertEqual(os.readlink(os.path.join(self.recent_dir, "financial--statement.pdf")), destination)
+
+    def test_job_locks_only_to_classify_and_move(self):
+        """Test that a job reads texts meanwhile but waits for the analyzer to classify and move"""
+        analyzer = MagicMock()
+        analyzer.lock = threading.RLock()
+        analyzer.reclassify_contents.return_value = ["financial"]
+        extractor = MagicMock()
+        extractor.extract_text.return_value = "Bank statement"
+
+        job = ReclassifyJob(self.config, analyzer, extractor, apply=True, dedup_manager=self.dedup_manager)
+        with analyzer.lock:
+            job.start()
+            job.thread.join(0.2)
+            self.assertTrue(job.running)
+            self.assertTrue(extractor.extract_text.called)
+            self.assertFalse(analyzer.reclassify_contents.called)
+            self.assertTrue(os.path.exists(self.source))
+        job.thread.join(5)
+
+        self.assertEqual(job.status, "finished")
+        self.assertEqual(job.result['moved'], 1)
+        self.assertEqual(job.to_dict()['result']['moves'],
+                         [{'file': os.path.join("other", "statement.pdf"), 'from': "other", 'to': "financial"}])
+        self.assertEqual(self._record()[1], "financial")
+
+    def test_organized_files_are_not_extracted_again(self):
+        """Test that a file's text is read from the text store once the content cache forgot it"""
+        extractor = ContentExtractor(self.config)
+        self.assertEqual(extractor.extract_text(self.source), "Bank statement")
+        extractor.content_cache.clear()
+
+        with patch.object(extractor, '_extract_from_text', side_effect=AssertionError("extracted again")):
+            self.assertEqual(extractor.extract_text(self.source), "Bank statement")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from magic_folder.service import (
+    SERVICE_AVAILABLE, InferenceServer, RemoteAnalyzer, connect_to_service, get_socket_path
+)
+
+@unittest.skipUnless(SERVICE_AVAILABLE, "Unix domain sockets not available")
+class TestInferenceService(unittest.TestCase):
+    """Tests for the shared inference service"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+
+        self.mock_config = MagicMock()
+        self.mock_config.base_dir = self.temp_dir
+        self.mock_config.service_socket_name = "inference.sock"
+        self.mock_config.enable_inference_service = True
+        self.mock_config.categories = ["financial", "other"]
+        self.mock_config.category_keywords = {}
+
+        self.analyzer = MagicMock()
+        self.analyzer.model_available = True
+        self.analyzer.analyze_content.return_value = ("financial", "statement_20240101.pdf")
+
+        self.extractor = MagicMock()
+        self.extractor.extract_text.return_value = "Bank statement"
+
+        self.server = InferenceServer(self.mock_config, self.analyzer, self.extractor)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.server.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_no_service_running(self):
+        """Test that clients fall back when nothing is listening"""
+        self.assertIsNone(connect_to_service(self.mock_config))
+
+    def test_remote_analysis(self):
+        """Test that analysis requests are served by the owning process"""
+        self.assertTrue(self.server.start())
+
+        client = connect_to_service(self.mock_config)
+        self.assertIsNotNone(client)
+
+        remote = RemoteAnalyzer(self.mock_config, client)
+        self.assertTrue(remote.model_available)
+
+        result = remote.analyze_content("Bank statement", "/drop/scan.pdf")
+        self.assertEqual(result, ("financial", "statement_20240101.pdf"))
+        self.analyzer.analyze_content.assert_called_once_with("Bank statement", "/drop/scan.pdf")
+
+        self.assertEqual(client.call('extract', file_path="/drop/scan.pdf"), "Bank statement")
+
+        with self.assertRaises(RuntimeError):
+            client.call('unknown')
+        client.close()
+
+    def test_stale_socket_is_replaced(self):
+        """Test that a leftover socket file does not block startup"""
+        open(get_socket_path(self.mock_config), 'w').close()
+
+        self.assertTrue(self.server.start())
+
+    def test_second_server_does_not_start(self):
+        """Test that only one service owns the socket"""
+        self.assertTrue(self.server.start())
+
+        second = InferenceServer(self.mock_config, self.analyzer, self.extractor)
+        self.assertFalse(second.start())
+        self.assertTrue(os.path.exists(get_socket_path(self.mock_config)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+import zipfile
+import unittest
+from xml.etree import ElementTree
+
+import docx
+
+from magic_folder.config import Config
+from magic_folder.content_extractor import ContentExtractor
+from magic_folder.streaming_text import (
+    iter_json_tokens, sample_json, sample_xml, sample_html, sample_docx, sample_pptx, sample_epub, epub_spine
+)
+
+class CountingReader(io.StringIO):
+    """Text stream that records how many characters were read"""
+
+    def __init__(self, text):
+        super().__init__(text)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.consumed += len(data)
+        return data
+
+class TestStreamingJson(unittest.TestCase):
+    """Tests for chunked JSON sampling"""
+
+    def test_matches_json_dumps(self):
+        """Test that the sample is the same as pretty-printing the parsed document"""
+        data = {
+            "name": "Invoice",
+            "lines": [{"item": "Paper", "qty": 2, "price": 4.5}, {"item": "Ink", "qty": 1, "price": None}],
+            "empty": {},
+            "tags": [],
+            "paid": False,
+            "note": "quote \" and backslash \\\\ inside"
+        }
+        text = json.dumps(data)
+
+        self.assertEqual(sample_json(io.StringIO(text), 10000), json.dumps(data, indent=2))
+
+    def test_tokens_across_chunk_boundaries(self):
+        """Test that strings, escapes and numbers split between chunks stay whole"""
+        text = '{"key": "a\\"b\\\\", "number": -12.5e3, "flag": true}'
+
+        tokens = list(iter_json_tokens(io.StringIO(text), chunk_size=3))
+
+        self.assertEqual(tokens, ['{', '"key"', ':', '"a\\"b\\\\"', ',', '"number"', ':', '-12.5e3', ',',
+                                  '"flag"', ':', 'true', '}'])
+
+    def test_long_strings_are_shortened(self):
+        """Test that a huge string value is cut instead of being kept whole"""
+        text = json.dumps({"blob": "x" * 100000})
+
+        tokens = list(iter_json_tokens(io.StringIO(text), chunk_size=1024, max_token=50))
+
+        self.assertEqual(tokens[3], '"' + 'x' * 49 + '..."')
+        self.assertEqual(tokens[4], '}')
+
+    def test_stops_at_budget(self):
+        """Test that only the beginning of a large document is read"""
+        text = json.dumps([{"id": number, "value": f"row {number}"} for number in range(100000)])
+        reader = CountingReader(text)
+
+        sample = sample_json(reader, 500)
+
+        self.assertEqual(len(sample), 500)
+        self.assertTrue(sample.startswith('[\n  {\n    "id": 0,'))
+        self.assertLess(reader.consumed, len(text) // 10)
+
+class TestStreamingMarkup(unittest.TestCase):
+    """Tests for streaming XML and HTML sampling"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_xml_text_in_document_order(self):
+        """Test that element text and tails come out in document order"""
+        xml = b'<?xml version="1.0"?><doc><p>Hello <b>bold</b> world</p><p>Second</p></doc>'
+
+        self.assertEqual(sample_xml(io.BytesIO(xml), 1000), "Hello\nbold\nworld\nSecond")
+
+    def test_xml_stops_at_budget(self):
+        """Test that a large XML export is not read past the sample"""
+        xml = b'<rows>' + b''.join(b'<row>Entry %d</row>' % n for n in range(200000)) + b'</rows>'
+        reader = io.BytesIO(xml)
+
+        sample = sample_xml(reader, 200, chunk_size=4096)
+
+        self.assertEqual(len(sample), 200)
+        self.assertTrue(sample.startswith("Entry 0\nEntry 1\n"))
+        self.assertLess(reader.tell(), len(xml) // 10)
+
+    def test_malformed_xml(self):
+        """Test that text before a syntax error is kept and an empty result raises"""
+        self.assertEqual(sample_xml(io.BytesIO(b'<a>Kept</a><b>'), 100), "Kept")
+        with self.assertRaises(ElementTree.ParseError):
+            sample_xml(io.BytesIO(b'<<not xml'), 100)
+
+    def test_html_skips_scripts(self):
+        """Test that scripts and styles are dropped from HTML text"""
+        html = ("<html><head><title>Report</title><style>p {color: red}</style></head>"
+                "<body><script>var x = 1;</script><p>Quarterly &amp; annual<br>figures</p></body></html>")
+
+        self.assertEqual(sample_html(io.StringIO(html), 1000), "Report\nQuarterly & annual\nfigures")
+
+    def test_extractor_uses_streaming_samplers(self):
+        """Test the text produced by the content extractor for each format"""
+        config = Config()
+        config.base_dir = self.temp_dir
+        extractor = ContentExtractor(config)
+        paths = {}
+        for name, content in (('data.json', '{"title": "Lease"}'),
+                              ('page.html', '<p>Lease agreement</p>'),
+                              ('feed.xml', '<feed><title>Lease news</title></feed>'),
+                              ('broken.xml', '<<not xml')):
+            paths[name] = os.path.join(self.temp_dir, name)
+            with open(paths[name], 'w') as f:
+                f.write(content)
+
+        self.assertEqual(extractor._extract_from_text(paths['data.json'], 'application/json'),
+                         '{\n  "title": "Lease"\n}')
+        self.assertEqual(extractor._extract_from_text(paths['page.html'], 'text/html'), "Lease agreement")
+        self.assertEqual(extractor._extract_from_text(paths['feed.xml'], 'text/xml'), "Lease news")
+        self.assertEqual(extractor._extract_from_text(paths['broken.xml'], 'text/xml'), "<<not xml")
+
+SLIDE_XML = (
+    '<p:sld xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" '
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"><p:cSld><p:spTree><p:sp><p:txBody>'
+    '<a:p><a:r><a:t>{title}</a:t></a:r></a:p><a:p><a:r><a:t>Point </a:t></a:r><a:r><a:t>one</a:t></a:r></a:p>'
+    '</p:txBody></p:sp></p:spTree></p:cSld></p:sld>'
+)
+
+CONTAINER_XML = (
+    '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+    '<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+    '</rootfiles></container>'
+)
+
+class TestStreamingOffice(unittest.TestCase):
+    """Tests for zip-level Word, PowerPoint and EPUB sampling"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+
+    def make_epub(self, chapters, extra_spine=""):
+        """Write an EPUB whose spine lists the chapters in the given order"""
+        path = os.path.join(self.temp_dir, 'book.epub')
+        manifest = ''.join(f'<item id="c{n}" href="text/ch%20{n}.xhtml" media-type="application/xhtml+xml"/>'
+                           for n in range(len(chapters)))
+        spine = ''.join(f'<itemref idref="c{n}"/>' for n in range(len(chapters)))
+        package = (f'<package xmlns="http://www.idpf.org/2007/opf" version="3.0"><manifest>{manifest}'
+                   f'<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml"/></manifest>'
+                   f'<spine>{extra_spine}{spine}</spine></package>')
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('mimetype', 'application/epub+zip')
+            archive.writestr('META-INF/container.xml', CONTAINER_XML)
+            archive.writestr('OEBPS/content.opf', package)
+            archive.writestr('OEBPS/nav.xhtml', '<html><body><p>Contents</p></body></html>')
+            for n, body in enumerate(chapters):
+                archive.writestr(f'OEBPS/text/ch {n}.xhtml',
+                                 f'<html><head><title>Book</title></head><body>{body}</body></html>')
+        return path
+
+    def test_docx_paragraphs(self):
+        """Test that Word paragraphs are read in order and stop at the budget"""
+        path = os.path.join(self.temp_dir, 'letter.docx')
+        document = docx.Document()
+        document.add_paragraph("Dear tenant,")
+        paragraph = document.add_paragraph("The rent is ")
+        paragraph.add_run("due").bold = True
+        paragraph.add_run(" monthly.")
+        for number in range(2000):
+            document.add_paragraph(f"Clause {number}")
+        document.save(path)
+
+        self.assertTrue(sample_docx(path, 1000).startswith("Dear tenant,\nThe rent is due monthly.\nClause 0"))
+        self.assertEqual(len(sample_docx(path, 100)), 100)
+
+    def test_pptx_slides_in_number_order(self):
+        """Test that slides are read by number, not archive order"""
+        path = os.path.join(self.temp_dir, 'deck.pptx')
+        with zipfile.ZipFile(path, 'w') as archive:
+            for number in (10, 2, 1):
+                archive.writestr(f'ppt/slides/slide{number}.xml', SLIDE_XML.format(title=f"Slide {number}"))
+            archive.writestr('ppt/slideLayouts/slideLayout1.xml', SLIDE_XML.format(title="Layout"))
+
+        self.assertEqual(sample_pptx(path, 1000),
+                         "Slide 1\nPoint one\nSlide 2\nPoint one\nSlide 10\nPoint one")
+
+    def test_epub_spine_order(self):
+        """Test that the spine is resolved through the container and package documents"""
+        path = self.make_epub(["<p>One</p>", "<p>Two</p>"], extra_spine='<itemref idref="nav" linear="no"/>')
+
+        with zipfile.ZipFile(path) as archive:
+            self.assertEqual(epub_spine(archive), ['OEBPS/text/ch 0.xhtml', 'OEBPS/text/ch 1.xhtml'])
+        self.assertEqual(sample_epub(path, 1000), {'beginning': "One\nTwo", 'middle': ""})
+
+    def test_epub_middle_chapter(self):
+        """Test that the middle sample starts at the middle chapter"""
+        chapters = [f"<p>Chapter {n}</p>" + "<p>Filler text.</p>" * 200 for n in range(9)]
+        path = self.make_epub(chapters)
+
+        sample = sample_epub(path, 200)
+
+        self.assertTrue(sample['beginning'].startswith("Chapter 0\nFiller text."))
+        self.assertNotIn("Book", sample['beginning'])
+        self.assertTrue(sample['middle'].startswith("Chapter 4\n"))
+        self.assertEqual(len(sample['middle']), 100)
+
+    def test_extractor_epub_text(self):
+        """Test the EPUB text produced by the content extractor"""
+        chapters = [f"<p>Chapter {n}</p>" + "<p>Filler text.</p>" * 200 for n in range(3)]
+        path = self.make_epub(chapters)
+        config = Config()
+        config.base_dir = self.temp_dir
+
+        text = ContentExtractor(config)._extract_from_ebook(path, '.epub')
+
+        self.assertTrue(text.startswith("EPUB Content (beginning):\nChapter 0"))
+        self.assertIn("EPUB Content (middle sample):\nChapter 1", text)
+
+if __name__ == '__main__':
+    unittest.main()
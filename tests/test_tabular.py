@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import openpyxl
+
+from magic_folder.config import Config
+from magic_folder.content_extractor import ContentExtractor
+from magic_folder.tabular import sample_csv, sample_workbook
+
+class TestCsvSampler(unittest.TestCase):
+    """Tests for streaming CSV sampling"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.temp_dir, 'export.csv')
+        with open(self.csv_path, 'w', newline='') as f:
+            f.write("date;description;amount\n")
+            f.write('2024-01-01;"Rent, January\nflat 2";-900\n')
+            for number in range(2, 5000):
+                f.write(f"2024-01-02;Transaction {number};{number}.00\n")
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_header_and_first_rows(self):
+        """Test that the dialect is sniffed and only the first rows are returned"""
+        sample = sample_csv(self.csv_path, head_rows=3)
+
+        self.assertEqual(sample['delimiter'], ';')
+        self.assertEqual(sample['header'], ["date", "description", "amount"])
+        self.assertEqual(len(sample['rows']), 3)
+        self.assertEqual(sample['rows'][0][1], "Rent, January\nflat 2")
+        self.assertEqual(sample['spread'], [])
+
+    def test_spread_rows_come_from_later_in_the_file(self):
+        """Test that spread rows are whole rows from past the first rows"""
+        sample = sample_csv(self.csv_path, head_rows=3, spread_rows=5)
+
+        self.assertTrue(1 <= len(sample['spread']) <= 5)
+        for row in sample['spread']:
+            self.assertEqual(len(row), 3)
+            self.assertGreater(int(row[1].split()[1]), 3)
+        self.assertEqual(sample, sample_csv(self.csv_path, head_rows=3, spread_rows=5))
+
+    def test_empty_file(self):
+        """Test that an empty file yields an empty sample"""
+        empty_path = os.path.join(self.temp_dir, 'empty.csv')
+        open(empty_path, 'w').close()
+
+        sample = sample_csv(empty_path, spread_rows=3)
+
+        self.assertEqual(sample['header'], [])
+        self.assertEqual(sample['rows'], [])
+
+class TestWorkbookSampler(unittest.TestCase):
+    """Tests for read-only Excel sampling"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.xlsx_path = os.path.join(self.temp_dir, 'budget.xlsx')
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = "Expenses"
+        sheet.append(["Item", "Cost", "Notes"])
+        for number in range(1, 2000):
+            sheet.append([f"Item {number}", number * 1.0, None])
+        workbook.create_sheet("Income").append(["Salary", 3000])
+        workbook.create_sheet("Archive").append(["Old"])
+        workbook.create_sheet("Unused").append(["Never read"])
+        workbook.save(self.xlsx_path)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_first_rows_of_first_sheets(self):
+        """Test that only the first rows of the first sheets are read"""
+        workbook = sample_workbook(self.xlsx_path, max_sheets=2, max_rows=3)
+
+        self.assertEqual(workbook['sheets'], ["Expenses", "Income", "Archive", "Unused"])
+        self.assertEqual([name for name, _ in workbook['samples']], ["Expenses", "Income"])
+        expenses = workbook['samples'][0][1]
+        self.assertEqual(expenses, [["Item", "Cost", "Notes"], ["Item 1", "1"], ["Item 2", "2"]])
+
+    def test_extractor_summary(self):
+        """Test the spreadsheet text produced by the content extractor"""
+        config = Config()
+        config.base_dir = self.temp_dir
+        text = ContentExtractor(config)._extract_from_spreadsheet(self.xlsx_path)
+
+        self.assertIn("Sheets: Expenses, Income, Archive, Unused", text)
+        self.assertIn("Item | Cost | Notes", text)
+        self.assertIn("Salary | 3000", text)
+        self.assertNotIn("Item 6", text)
+        self.assertNotIn("Never read", text)
+
+    def test_macro_workbook_is_streamed(self):
+        """Test that .xlsm workbooks are routed to the read-only sampler"""
+        xlsm_path = os.path.join(self.temp_dir, 'budget.xlsm')
+        shutil.copy(self.xlsx_path, xlsm_path)
+        config = Config()
+        config.base_dir = self.temp_dir
+
+        with patch('magic_folder.content_extractor.sample_workbook', wraps=sample_workbook) as sampler:
+            text = ContentExtractor(config)._extract_from_office(xlsm_path, '.xlsm')
+
+        sampler.assert_called_once()
+        self.assertIn("Sheets: Expenses, Income, Archive, Unused", text)
+        self.assertIn("Item | Cost | Notes", text)
+
+if __name__ == '__main__':
+    unittest.main()
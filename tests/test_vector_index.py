@@ -0,0 +1,191 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from magic_folder.vector_index import VectorIndex
+
+class TestVectorIndex(unittest.TestCase):
+    """Tests for the nearest-neighbour document index"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(42)
+
+        # Two well separated clusters of documents
+        self.dim = 16
+        self.center_a = rng.normal(size=self.dim)
+        self.center_b = rng.normal(size=self.dim)
+        self.docs_a = self.center_a + 0.1 * rng.normal(size=(50, self.dim))
+        self.docs_b = self.center_b + 0.1 * rng.normal(size=(50, self.dim))
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+
+    def _fill(self, index):
+        for i, vector in enumerate(self.docs_a):
+            index.add(f"a{i}", vector, "financial")
+        for i, vector in enumerate(self.docs_b):
+            index.add(f"b{i}", vector, "medical")
+
+    def test_search_and_vote(self):
+        """Test exact search returns neighbours from the right cluster"""
+        index = VectorIndex()
+        self._fill(index)
+
+        self.assertEqual(len(index), 100)
+        results = index.search(self.center_a, k=5)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(label == "financial" for _, label, _ in results))
+        self.assertGreaterEqual(results[0][2], results[-1][2])
+
+        label, agreement = index.vote(self.center_b, k=7)
+        self.assertEqual(label, "medical")
+        self.assertAlmostEqual(agreement, 1.0)
+
+    def test_relabel_existing_key(self):
+        """Test that adding an existing key updates its label and weight"""
+        index = VectorIndex()
+        index.add("doc", self.docs_a[0], "financial")
+        index.add("doc", None, "legal", weight=3.0)
+
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.search(self.docs_a[0], k=1)[0][1], "legal")
+
+    def test_empty_index(self):
+        """Test queries against an empty index"""
+        index = VectorIndex()
+
+        self.assertEqual(index.search(self.center_a), [])
+        self.assertEqual(index.vote(self.center_a), (None, 0.0))
+
+    def test_ivf_matches_exact_search(self):
+        """Test that IVF partitioning finds the same neighbours on clustered data"""
+        exact = VectorIndex()
+        ivf = VectorIndex(nlist=2, nprobe=1)
+        self._fill(exact)
+        self._fill(ivf)
+
+        self.assertIsNotNone(ivf.centroids)
+        # Documents added after training go to a cluster buffer and are still found
+        ivf.add("late", self.center_b, "medical")
+        exact.add("late", self.center_b, "medical")
+
+        for query in (self.center_a, self.center_b):
+            exact_keys = [key for key, _, _ in exact.search(query, k=5)]
+            ivf_keys = [key for key, _, _ in ivf.search(query, k=5)]
+            self.assertEqual(exact_keys, ivf_keys)
+
+    def test_new_vectors_are_buffered_per_cluster(self):
+        """Test that a query only scans the buffered vectors of the clusters it probes"""
+        ivf = VectorIndex(nlist=2, nprobe=1)
+        self._fill(ivf)
+        sorted_size = ivf._sorted_size
+        buffered = [len(pending) for pending in ivf._pending]
+
+        for i in range(5):
+            ivf.add(f"late_a{i}", self.center_a, "financial")
+            ivf.add(f"late_b{i}", self.center_b, "medical")
+
+        self.assertEqual(ivf._sorted_size, sorted_size)
+        self.assertEqual([len(pending) - before for pending, before in zip(ivf._pending, buffered)], [5, 5])
+        scanned = []
+        original_scores = ivf._scores
+        ivf._scores = lambda start, end, query: scanned.append(end - start) or original_scores(start, end, query)
+        results = ivf.search(self.center_b, k=10)
+        # Only the sorted slice of the probed cluster is scanned
+        self.assertEqual(len(scanned), 1)
+        self.assertLess(scanned[0], sorted_size)
+        self.assertTrue(all(label == "medical" for _, label, _ in results))
+        self.assertIn("late_b0", [key for key, _, _ in results])
+        self.assertNotIn("late_a0", [key for key, _, _ in results])
+
+    def test_save_and_load(self):
+        """Test that the index survives a save/load round trip"""
+        path = os.path.join(self.temp_dir, "document_index.npz")
+        index = VectorIndex(nlist=2, nprobe=1)
+        self._fill(index)
+        index.add("late", self.center_a, "financial")
+        index.save(path)
+
+        loaded = VectorIndex.load(path, nlist=2, nprobe=1)
+        self.assertEqual(len(loaded), len(index))
+        self.assertIn("late", loaded)
+        self.assertEqual(
+            [key for key, _, _ in loaded.search(self.center_a, k=3)],
+            [key for key, _, _ in index.search(self.center_a, k=3)]
+        )
+
+    def test_float16_storage_preserves_ranking(self):
+        """Test that float16 vectors rank neighbours like exact float32 cosine"""
+        rng = np.random.default_rng(7)
+        docs = rng.normal(size=(300, 64))
+        index = VectorIndex()
+        for i, vector in enumerate(docs):
+            index.add(f"d{i}", vector, "other")
+
+        self.assertEqual(index.vectors.dtype, np.float16)
+        unit = docs / np.linalg.norm(docs, axis=1, keepdims=True)
+        for query in rng.normal(size=(5, 64)):
+            exact = unit @ (query / np.linalg.norm(query))
+            results = index.search(query, k=5)
+            for key, _, score in results:
+                self.assertAlmostEqual(score, exact[int(key[1:])], places=2)
+            self.assertEqual(results[0][0], f"d{int(np.argmax(exact))}")
+
+    def test_vectors_are_memory_mapped_on_load(self):
+        """Test that a saved index maps its vector file instead of reading it"""
+        path = os.path.join(self.temp_dir, "document_index.npz")
+        index = VectorIndex()
+        self._fill(index)
+        index.save(path)
+
+        loaded = VectorIndex.load(path)
+        self.assertIsInstance(loaded._vectors, np.memmap)
+        self.assertEqual(os.path.getsize(VectorIndex.vectors_path(path)), 128 + 100 * self.dim * 2)
+        # Adding to a mapped index must not write through to the file
+        loaded.add("late", self.center_a, "financial")
+        self.assertEqual(len(VectorIndex.load(path)), 100)
+
+    def test_pca_reduction(self):
+        """Test that PCA-reduced vectors keep the nearest neighbours"""
+        rng = np.random.default_rng(3)
+        # Vectors that mostly live in an 8-dimensional subspace
+        basis = rng.normal(size=(8, 32))
+        docs = rng.normal(size=(200, 8)) @ basis + 0.01 * rng.normal(size=(200, 32))
+        exact = VectorIndex()
+        reduced = VectorIndex(pca_dims=8)
+        for i, vector in enumerate(docs):
+            exact.add(f"d{i}", vector, "other")
+            reduced.add(f"d{i}", vector, "other")
+        reduced.reduce_dimensions()
+
+        self.assertEqual(reduced.vectors.shape, (200, 8))
+        for query in docs[:5]:
+            self.assertEqual(
+                [key for key, _, _ in reduced.search(query, k=3)],
+                [key for key, _, _ in exact.search(query, k=3)]
+            )
+        # Stored vectors are reconstructed in the original space
+        self.assertEqual(reduced.get("d0").shape, (32,))
+
+    def test_pca_reduction_of_a_clustered_index(self):
+        """Test that the vector that triggers PCA on an IVF index is stored once"""
+        rng = np.random.default_rng(5)
+        docs = rng.normal(size=(1000, 64))
+        index = VectorIndex(nlist=10, nprobe=10, pca_dims=32)
+        for i, vector in enumerate(docs):
+            index.add(str(i), vector, "other")
+
+        self.assertIsNotNone(index.components)
+        self.assertEqual(sum(len(pending) for pending in index._pending) + index._sorted_size, len(index))
+        for query in docs[980:]:
+            keys = [key for key, _, _ in index.search(query, k=20)]
+            self.assertEqual(len(keys), len(set(keys)))
+
+if __name__ == '__main__':
+    unittest.main()